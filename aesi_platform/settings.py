@@ -53,6 +53,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.performance.PerformanceMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,6 +62,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
+    'participation.middleware.OTPFlagLogoutMiddleware',
 ]
 
 ROOT_URLCONF = 'aesi_platform.urls'
@@ -187,8 +189,22 @@ CACHES = {
 #     }
 # }
 
+# LocMemCache lives in each worker process: what every worker must see
+# (sessions, invalidations) only relies on the cache when it is shared
+CACHE_IS_SHARED = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
 # Session configuration
-SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+# cached_db (shared cache only): reads are served from the cache, writes go
+# through to the database, so sessions survive worker restarts and
+# non-sticky load balancing. With a per-process cache a logout would leave
+# the session alive in the other workers' caches, so plain db is used.
+SESSION_ENGINE = (
+    'django.contrib.sessions.backends.cached_db' if CACHE_IS_SHARED
+    else 'django.contrib.sessions.backends.db'
+)
 SESSION_CACHE_ALIAS = 'default'
 SESSION_COOKIE_AGE = 86400  # 24 hours
 SESSION_COOKIE_SECURE = config('SESSION_COOKIE_SECURE', default=False, cast=bool)
@@ -221,13 +237,54 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
+# Run tasks in-process when no broker is available (development)
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=DEBUG, cast=bool)
+CELERY_BEAT_SCHEDULE = {
+    'clear-expired-sessions': {
+        'task': 'core.tasks.clear_expired_sessions',
+        'schedule': 60 * 60,  # hourly
+    },
+    # Safety net for changes made outside the signals (bulk updates, shell)
+    'recompute-participation-stats': {
+        'task': 'participation.tasks.refresh_participation_stats',
+        'schedule': 60 * 60 * 24,  # daily
+    },
+    'flush-form-counters': {
+        'task': 'participation.tasks.flush_form_counters',
+        'schedule': 60,  # every minute
+    },
+    'purge-export-jobs': {
+        'task': 'core.tasks.purge_export_jobs',
+        'schedule': 60 * 60 * 24,  # daily
+    },
+    # Month-end balances; also rebuilds closings invalidated by backdated edits
+    'close-monthly-balances': {
+        'task': 'finances.tasks.close_monthly_balances',
+        'schedule': 60 * 60 * 24,  # daily
+    },
+    'collect-blobs': {
+        'task': 'core.tasks.collect_unreferenced_blobs',
+        'schedule': 60 * 60 * 24,  # daily
+    },
+}
+
+# Exports (core.exports): rows read per database round trip, size above
+# which an export is written by a background job instead of streamed, and
+# how long generated files are kept
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_STREAMING_MAX_ROWS = config('EXPORT_STREAMING_MAX_ROWS', default=50000, cast=int)
+EXPORT_RETENTION_DAYS = 7
+
+# Deduplicated uploads (core.storage): hours an unreferenced file is kept
+# before being deleted
+BLOB_GRACE_HOURS = 24
 
 
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -255,6 +312,8 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'UPDATE_LAST_LOGIN': True,
+    # Role and executive club as signed claims (see users.authentication)
+    'TOKEN_OBTAIN_SERIALIZER': 'users.authentication.ClubTokenObtainPairSerializer',
 }
 
 
@@ -289,6 +348,28 @@ CRISPY_TEMPLATE_PACK = "tailwind"
 
 # OTP Settings
 OTP_VALIDITY_MINUTES = config('OTP_VALIDITY_MINUTES', default=180, cast=int)
+# Where the "OTP verified" flag is kept: 'cookie' (signed cookie, no server
+# state) or 'session'
+OTP_FLAG_STORAGE = config('OTP_FLAG_STORAGE', default='cookie')
+# Route the OTP check-in views to their async versions (ASGI deployments)
+PARTICIPATION_ASYNC_VIEWS = config('PARTICIPATION_ASYNC_VIEWS', default=False, cast=bool)
+# QR code check-in: signed tokens, checked without cache or database access.
+# Keys are comma separated, the first one signs and the others are only
+# accepted (rotation); empty means SECRET_KEY / SECRET_KEY_FALLBACKS.
+CHECKIN_TOKEN_KEYS = config('CHECKIN_TOKEN_KEYS', default='', cast=Csv())
+CHECKIN_TOKEN_VALIDITY_MINUTES = config('CHECKIN_TOKEN_VALIDITY_MINUTES', default=15, cast=int)
+# Buffer form access/submission counters in the cache and flush them every
+# minute (only with a cache shared by all workers, i.e. Redis); otherwise each
+# event is an atomic F() update
+FORM_COUNTERS_BUFFERED = CACHE_IS_SHARED and config('FORM_COUNTERS_BUFFERED', default=False, cast=bool)
+# Pub/sub feeding the live participant counters: 'memory' (single process)
+# or 'redis' (several ASGI workers)
+PUBSUB_BACKEND = config('PUBSUB_BACKEND', default='memory')
+PUBSUB_REDIS_URL = config('PUBSUB_REDIS_URL', default='redis://localhost:6379/1')
+# Send the SQL, cache and template timings of each request in a Server-Timing
+# header (core.performance); they are always logged and kept for the staff
+# "slowest views" page
+PERFORMANCE_SERVER_TIMING = config('PERFORMANCE_SERVER_TIMING', default=DEBUG, cast=bool)
 
 
 # Logging Configuration
@@ -304,6 +385,11 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        # The messages of aesi_platform.performance are JSON objects
+        'json': {
+            'format': '{message}',
+            'style': '{',
+        },
     },
     'handlers': {
         'console': {
@@ -317,6 +403,13 @@ LOGGING = {
             'backupCount': 10,
             'formatter': 'verbose',
         },
+        'performance_file': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': BASE_DIR / 'logs' / 'performance.log',
+            'maxBytes': 1024 * 1024 * 15,  # 15MB
+            'backupCount': 5,
+            'formatter': 'json',
+        },
     },
     'root': {
         'handlers': ['console', 'file'],
@@ -333,6 +426,11 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': False,
         },
+        'aesi_platform.performance': {
+            'handlers': ['performance_file'],
+            'level': config('PERFORMANCE_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
     },
 }
 
@@ -0,0 +1,56 @@
+"""
+Exports of clubs app (see core.exports)
+"""
+from core.exports import Column, ExportDefinition, register_export
+from participation.exports import participant_columns
+from .models import Club
+
+
+@register_export('club_expenses')
+def club_expenses(params):
+    """Expenses of a club"""
+    from finances.models import Transaction
+    
+    expenses = Transaction.objects.filter(
+        club__slug=params['club'],
+        transaction_type='EXPENSE'
+    )
+    if params.get('year'):
+        expenses = expenses.filter(transaction_date__year=params['year'])
+    expenses = expenses.select_related('activity').order_by('-transaction_date')
+    
+    columns = [
+        Column('date', 'Date', lambda t: t.transaction_date.strftime('%d/%m/%Y')),
+        Column('type', 'Type', lambda t: 'Dépense'),
+        Column('category', 'Catégorie', 'category'),
+        Column('description', 'Description', 'description'),
+        Column('amount', 'Montant (FCFA)', lambda t: float(t.amount)),
+        Column('activity', 'Activité', lambda t: t.activity.title if t.activity else '-'),
+        Column('notes', 'Notes', lambda t: t.notes or '-'),
+    ]
+    return ExportDefinition(expenses, columns, f"depenses_{params['club']}")
+
+
+@register_export('club_participants')
+def club_participants(params):
+    """Verified participations in the activities of a club"""
+    from participation.models import Participation
+    from users.models import User
+    
+    participations = Participation.objects.filter(
+        activity__club__slug=params['club'],
+        otp_verified=True
+    )
+    if params.get('year'):
+        participations = participations.filter(activity__date__year=params['year'])
+    participations = participations.select_related('user', 'activity').order_by('-created_at')
+    
+    # Attendance over the same activities, computed once for all the rows
+    club = Club.objects.get(slug=params['club'])
+    attendance = User.objects.attendance(participations.values('user_id'), club=club, year=params.get('year'))
+    
+    return ExportDefinition(
+        participations,
+        participant_columns(with_activity=True, attendance=attendance),
+        f"participants_{params['club']}"
+    )
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:29
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0005_activity_club_status_date_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activityphoto',
+            name='image',
+            field=models.ImageField(storage=core.storage.BlobStorage(), upload_to='activities/photos/', verbose_name='image'),
+        ),
+        migrations.AlterField(
+            model_name='activityresource',
+            name='file',
+            field=models.FileField(help_text='PDF, Word, Excel, PowerPoint, ZIP, etc.', storage=core.storage.BlobStorage(), upload_to='activities/resources/', verbose_name='fichier'),
+        ),
+    ]
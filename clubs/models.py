@@ -5,6 +5,22 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 from core.models import TimeStampedModel, AuditModel
+from core.storage import blob_storage
+
+
+class ClubQuerySet(models.QuerySet):
+    """QuerySet for clubs"""
+    
+    def with_execution_rate(self):
+        """Annotate the task counts of each club (task_total, task_completed) in the same query"""
+        queryset = self.annotate(
+            task_total=models.Count('action_plans__tasks'),
+            task_completed=models.Count('action_plans__tasks', filter=models.Q(action_plans__tasks__is_completed=True))
+        )
+        # Meta.ordering is not applied to grouped queries
+        if not self.query.order_by:
+            queryset = queryset.order_by(*self.model._meta.ordering)
+        return queryset
 
 
 class Club(TimeStampedModel):
@@ -35,6 +51,8 @@ class Club(TimeStampedModel):
     
     is_active = models.BooleanField(_('actif'), default=True)
     
+    objects = ClubQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('club')
         verbose_name_plural = _('clubs')
@@ -45,19 +63,18 @@ class Club(TimeStampedModel):
     
     @property
     def execution_rate(self):
-        """Calculate execution rate based on completed tasks"""
-        total_tasks = self.action_plans.aggregate(
-            total=models.Count('tasks')
-        )['total'] or 0
+        """Calculate execution rate based on completed tasks (annotated by Club.objects.with_execution_rate())"""
+        if not hasattr(self, 'task_total'):
+            counts = self.action_plans.aggregate(
+                total=models.Count('tasks'),
+                completed=models.Count('tasks', filter=models.Q(tasks__is_completed=True))
+            )
+            self.task_total, self.task_completed = counts['total'] or 0, counts['completed'] or 0
         
-        if total_tasks == 0:
+        if self.task_total == 0:
             return 0
         
-        completed_tasks = self.action_plans.aggregate(
-            completed=models.Count('tasks', filter=models.Q(tasks__is_completed=True))
-        )['completed'] or 0
-        
-        return round((completed_tasks / total_tasks) * 100, 2)
+        return round((self.task_completed / self.task_total) * 100, 2)
 
 
 class ClubMember(AuditModel):
@@ -70,6 +87,8 @@ class ClubMember(AuditModel):
         ('COMMUNICATION', 'Organisateur(trice)'),
         ('MEMBER', 'Membre'),
     ]
+    # Positions giving access to the management of the club
+    EXECUTIVE_POSITIONS = ['PRESIDENT', 'VICE_PRESIDENT', 'SECRETARY', 'TREASURER', 'COMMUNICATION']
     
     club = models.ForeignKey(
         Club,
@@ -107,6 +126,21 @@ class ClubMember(AuditModel):
         return f"{self.user.get_full_name()} - {self.club.name} ({self.get_position_display()})"
 
 
+class ActionPlanQuerySet(models.QuerySet):
+    """QuerySet for action plans"""
+    
+    def with_progress(self):
+        """Annotate the task counts of each plan (task_total, task_completed) in the same query"""
+        queryset = self.annotate(
+            task_total=models.Count('tasks'),
+            task_completed=models.Count('tasks', filter=models.Q(tasks__is_completed=True))
+        )
+        # Meta.ordering is not applied to grouped queries
+        if not self.query.order_by:
+            queryset = queryset.order_by(*self.model._meta.ordering)
+        return queryset
+
+
 class ActionPlan(AuditModel):
     """Model for club action plans"""
     
@@ -121,6 +155,8 @@ class ActionPlan(AuditModel):
     start_date = models.DateField(_('date de début'))
     end_date = models.DateField(_('date de fin'))
     
+    objects = ActionPlanQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('programme d\'action')
         verbose_name_plural = _('programmes d\'action')
@@ -131,12 +167,13 @@ class ActionPlan(AuditModel):
     
     @property
     def completion_rate(self):
-        """Calculate completion rate"""
-        total = self.tasks.count()
-        if total == 0:
+        """Calculate completion rate (annotated by ActionPlan.objects.with_progress())"""
+        if not hasattr(self, 'task_total'):
+            self.task_total = self.tasks.count()
+            self.task_completed = self.tasks.filter(is_completed=True).count() if self.task_total else 0
+        if self.task_total == 0:
             return 0
-        completed = self.tasks.filter(is_completed=True).count()
-        return round((completed / total) * 100, 2)
+        return round((self.task_completed / self.task_total) * 100, 2)
 
 
 class Task(AuditModel):
@@ -229,6 +266,9 @@ class Activity(AuditModel):
         verbose_name = _('activité')
         verbose_name_plural = _('activités')
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['club', 'status', 'date'], name='activity_club_status_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.club.name} - {self.title}"
@@ -248,7 +288,7 @@ class ActivityPhoto(TimeStampedModel):
         related_name='photos',
         verbose_name=_('activité')
     )
-    image = models.ImageField(_('image'), upload_to='activities/photos/')
+    image = models.ImageField(_('image'), upload_to='activities/photos/', storage=blob_storage)
     caption = models.CharField(_('légende'), max_length=200, blank=True)
     uploaded_by = models.ForeignKey(
         'users.User',
@@ -341,6 +381,7 @@ class ActivityResource(TimeStampedModel):
     file = models.FileField(
         _('fichier'),
         upload_to='activities/resources/',
+        storage=blob_storage,
         help_text=_('PDF, Word, Excel, PowerPoint, ZIP, etc.')
     )
     resource_type = models.CharField(
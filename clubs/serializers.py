@@ -7,16 +7,18 @@ from .models import (
     ActivityPhoto, Competition, Winner, MemberAttendance
 )
 from users.serializers import UserMinimalSerializer
+from core.serializers import ImageRenditionsField
 
 
 class ClubSerializer(serializers.ModelSerializer):
     """Serializer for Club model"""
     execution_rate = serializers.ReadOnlyField()
+    logo_renditions = ImageRenditionsField(source='logo')
     
     class Meta:
         model = Club
         fields = [
-            'id', 'name', 'slug', 'type', 'description', 'logo',
+            'id', 'name', 'slug', 'type', 'description', 'logo', 'logo_renditions',
             'cover_image', 'email', 'phone', 'facebook_url',
             'twitter_url', 'instagram_url', 'is_active',
             'execution_rate', 'created_at'
@@ -74,10 +76,11 @@ class ActionPlanSerializer(serializers.ModelSerializer):
 class ActivityPhotoSerializer(serializers.ModelSerializer):
     """Serializer for ActivityPhoto model"""
     uploaded_by = UserMinimalSerializer(read_only=True)
+    image_renditions = ImageRenditionsField(source='image')
     
     class Meta:
         model = ActivityPhoto
-        fields = ['id', 'activity', 'image', 'caption', 'uploaded_by', 'created_at']
+        fields = ['id', 'activity', 'image', 'image_renditions', 'caption', 'uploaded_by', 'created_at']
         read_only_fields = ['id', 'created_at']
 
 
@@ -111,13 +114,14 @@ class ActivitySerializer(serializers.ModelSerializer):
     participants_count = serializers.ReadOnlyField()
     photos = ActivityPhotoSerializer(many=True, read_only=True)
     competitions = CompetitionSerializer(many=True, read_only=True)
+    cover_image_renditions = ImageRenditionsField(source='cover_image')
     
     class Meta:
         model = Activity
         fields = [
             'id', 'club', 'club_name', 'title', 'description',
             'theme', 'date', 'time', 'location', 'status',
-            'otp_enabled', 'difficulties', 'cover_image',
+            'otp_enabled', 'difficulties', 'cover_image', 'cover_image_renditions',
             'participants_count', 'photos', 'competitions', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
@@ -210,10 +210,8 @@ def club_bureau(request, slug):
 @login_required
 def club_budget(request, slug):
     """Club budget page with expense tracking"""
-    from django.db.models import Sum, Count
     from finances.models import Transaction
-    from django.http import HttpResponse
-    import csv
+    from finances.services import club_summary
     import json
     
     club = get_object_or_404(Club, slug=slug)
@@ -235,77 +233,57 @@ def club_budget(request, slug):
         
     # Get year filter from request
     year_filter = request.GET.get('year', '')
+    if not year_filter.isdigit():
+        year_filter = ''
     
     # Get all activities
     activities = club.activities.all()
     
-    # Base queryset for transactions
-    income_qs = Transaction.objects.filter(club=club, transaction_type='INCOME')
-    expense_qs = Transaction.objects.filter(club=club, transaction_type='EXPENSE')
+    # Totals, expenses by activity and available years (cached summary)
+    summary = club_summary(club.id, year_filter)
+    total_income = summary['total_income']
+    total_expenses = summary['total_expenses']
+    balance = summary['balance']
+    available_years = summary['years']
     
-    # Apply year filter if provided
+    # Balances at the start and end of the selected year (monthly closings)
+    opening_balance = closing_balance = None
     if year_filter:
-        income_qs = income_qs.filter(transaction_date__year=year_filter)
-        expense_qs = expense_qs.filter(transaction_date__year=year_filter)
-    
-    # Calculate totals
-    total_income = income_qs.aggregate(total=Sum('amount'))['total'] or 0
-    total_expenses = expense_qs.aggregate(total=Sum('amount'))['total'] or 0
-    balance = total_income - total_expenses
+        from datetime import date
+        from finances.ledger import balance_at
+        opening_balance = balance_at(club.id, date(int(year_filter) - 1, 12, 31))
+        closing_balance = balance_at(club.id, date(int(year_filter), 12, 31))
     
     # Get all expenses with pagination
     from django.core.paginator import Paginator
     
+    expense_qs = Transaction.objects.filter(club=club, transaction_type='EXPENSE')
+    if year_filter:
+        expense_qs = expense_qs.filter(transaction_date__year=year_filter)
+    
     expenses_list = expense_qs.select_related('activity').order_by('-transaction_date')
     expenses_paginator = Paginator(expenses_list, 10)  # 10 expenses per page
     expenses_page_number = request.GET.get('expenses_page', 1)
     expenses = expenses_paginator.get_page(expenses_page_number)
     
-    # Get available years for filter
-    available_years = Transaction.objects.filter(
-        club=club
-    ).dates('transaction_date', 'year', order='DESC')
-    
-    # Export to CSV if requested
-    if request.GET.get('export') == 'csv':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="depenses_{club.slug}_{timezone.now().strftime("%Y%m%d")}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['#', 'Date', 'Type', 'Catégorie', 'Description', 'Montant (FCFA)', 'Activité', 'Notes'])
-        
-        all_transactions = Transaction.objects.filter(club=club, transaction_type='EXPENSE')
-        if year_filter:
-            all_transactions = all_transactions.filter(transaction_date__year=year_filter)
-        all_transactions = all_transactions.select_related('activity').order_by('-transaction_date')
-        
-        for idx, transaction in enumerate(all_transactions, 1):
-            writer.writerow([
-                idx,
-                transaction.transaction_date.strftime('%d/%m/%Y'),
-                'Dépense',
-                transaction.category,
-                transaction.description,
-                float(transaction.amount),
-                transaction.activity.title if transaction.activity else '-',
-                transaction.notes or '-'
-            ])
-        
-        return response
+    # Export (CSV, XLSX or NDJSON) if requested
+    if request.GET.get('export'):
+        from core.exports import export_response
+        return export_response(
+            request, 'club_expenses', {'club': club.slug, 'year': year_filter}, request.GET['export']
+        )
     
-    # Expenses by activity for statistics
-    expense_by_activity = Transaction.objects.filter(
-        club=club,
-        transaction_type='EXPENSE',
-        activity__isnull=False
-    )
-    if year_filter:
-        expense_by_activity = expense_by_activity.filter(transaction_date__year=year_filter)
+    # Burn-rate forecast of the active budgets (one query for all of them)
+    from finances.forecast import forecast_budgets
+    active_budgets = list(club.budgets.filter(is_active=True).order_by('end_date'))
+    forecasts = forecast_budgets(active_budgets)
+    budget_forecasts = [
+        {'budget': budget, 'forecast': forecasts[budget.id]}
+        for budget in active_budgets
+    ]
     
-    expense_by_activity = expense_by_activity.values('activity__title').annotate(
-        total=Sum('amount'),
-        count=Count('id')
-    ).order_by('-total')
+    # Expenses by activity for statistics
+    expense_by_activity = summary['by_activity']
     
     # Prepare data for Plotly chart
     chart_activities = [item['activity__title'] for item in expense_by_activity]
@@ -326,9 +304,12 @@ def club_budget(request, slug):
         'total_income': total_income,
         'total_expenses': total_expenses,
         'balance': balance,
+        'opening_balance': opening_balance,
+        'closing_balance': closing_balance,
         'expenses': expenses,
         'expense_by_activity': expense_by_activity,
         'expense_chart_data': expense_chart_data,
+        'budget_forecasts': budget_forecasts,
         'available_years': available_years,
         'year_filter': year_filter,
     }
@@ -421,10 +402,36 @@ def club_form_generator(request, slug):
         otp_expires_at__gt=timezone.now()
     ).select_related('activity', 'created_by').order_by('-created_at')
     
+    # QR code check-in: short-lived signed link, regenerated on each page load
+    from core.utils import make_checkin_token, make_qr_svg
+    from django.conf import settings
+    from django.urls import reverse
+    from datetime import timedelta
+    
+    token_expiry = timezone.now() + timedelta(minutes=settings.CHECKIN_TOKEN_VALIDITY_MINUTES)
+    active_forms = list(active_forms)
+    
+    # Buffered access/submission counters are written by the periodic
+    # flush_form_counters task: add them without writing anything here
+    from participation.counters import pending_counts
+    pending = pending_counts([dynamic_form.activity_id for dynamic_form in active_forms])
+    
+    for dynamic_form in active_forms:
+        deltas = pending.get(dynamic_form.activity_id, {})
+        dynamic_form.access_count += deltas.get('access', 0)
+        dynamic_form.submission_count += deltas.get('submission', 0)
+        token = make_checkin_token(dynamic_form.activity_id, min(token_expiry, dynamic_form.otp_expires_at))
+        dynamic_form.checkin_url = request.build_absolute_uri(
+            reverse('participation:checkin_token', args=[token])
+        )
+        dynamic_form.checkin_qr = make_qr_svg(dynamic_form.checkin_url)
+    
     context = {
         'club': club,
         'activities': activities,
         'active_forms': active_forms,
+        'checkin_token_minutes': settings.CHECKIN_TOKEN_VALIDITY_MINUTES,
+        'live_updates': settings.PARTICIPATION_ASYNC_VIEWS,
     }
     return render(request, 'clubs/club_form_generator.html', context)
 
@@ -497,9 +504,9 @@ def generate_participation_form(request, slug):
 @login_required
 def club_dashboard(request, slug):
     """Club dashboard with analytics"""
-    from django.db.models import Sum, Count, Q
+    from django.db.models import Count
     from participation.models import Participation
-    from finances.models import Transaction
+    from finances.services import club_summary
     from clubs.models import Winner
     import json
     
@@ -526,17 +533,10 @@ def club_dashboard(request, slug):
     total_activities = activities.count()
     
     # Financial metrics
-    total_income = Transaction.objects.filter(
-        club=club,
-        transaction_type='INCOME'
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    total_expenses = Transaction.objects.filter(
-        club=club,
-        transaction_type='EXPENSE'
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    balance = total_income - total_expenses
+    finance_summary = club_summary(club.id)
+    total_income = finance_summary['total_income']
+    total_expenses = finance_summary['total_expenses']
+    balance = finance_summary['balance']
     
     # Participants by Activity Chart (Bar Chart)
     participants_by_activity = Participation.objects.filter(
@@ -559,23 +559,8 @@ def club_dashboard(request, slug):
     }])
     
     # TOP 10 Participants
-    top_participants_data = Participation.objects.filter(
-        activity__club=club,
-        otp_verified=True
-    ).values('user').annotate(
-        participation_count=Count('id')
-    ).order_by('-participation_count')[:10]
-    
-    top_10_participants = []
-    for item in top_participants_data:
-        from users.models import User
-        user = User.objects.get(id=item['user'])
-        attendance_percentage = round((item['participation_count'] / total_activities * 100), 2) if total_activities > 0 else 0
-        top_10_participants.append({
-            'user': user,
-            'participation_count': item['participation_count'],
-            'attendance_percentage': attendance_percentage
-        })
+    from users.models import User
+    top_10_participants = User.objects.top_attendance(club, limit=10)
     
     # Winners
     winners = Winner.objects.filter(
@@ -585,52 +570,32 @@ def club_dashboard(request, slug):
     # Detailed Analysis Data (by gender, filiere, niveau)
     analysis_data = {'all': {'gender': {}, 'filiere': {}, 'niveau': {}}}
     
-    # Overall analysis
-    all_participations = Participation.objects.filter(
+    # Verified participants of each completed activity by gender, filiere and
+    # niveau: one grouped query instead of one per activity
+    for activity_id in activities.values_list('id', flat=True):
+        analysis_data[str(activity_id)] = {'gender': {}, 'filiere': {}, 'niveau': {}}
+    
+    filieres = dict(User.FILIERE_CHOICES)
+    groups = Participation.objects.filter(
         activity__club=club,
         otp_verified=True
-    ).select_related('user')
-    
-    for p in all_participations:
-        # Gender
-        gender = p.user.gender or 'Non spécifié'
-        analysis_data['all']['gender'][gender] = analysis_data['all']['gender'].get(gender, 0) + 1
-        
-        # Filiere
-        filiere = p.user.get_filiere_display() or 'Non spécifié'
-        analysis_data['all']['filiere'][filiere] = analysis_data['all']['filiere'].get(filiere, 0) + 1
-        
-        # Niveau
-        niveau = p.user.niveau or 'Non spécifié'
-        analysis_data['all']['niveau'][niveau] = analysis_data['all']['niveau'].get(niveau, 0) + 1
-    
-    # Per activity analysis
-    for activity in activities:
-        activity_participations = Participation.objects.filter(
-            activity=activity,
-            otp_verified=True
-        ).select_related('user')
-        
-        analysis_data[str(activity.id)] = {'gender': {}, 'filiere': {}, 'niveau': {}}
-        
-        for p in activity_participations:
-            gender = p.user.gender or 'Non spécifié'
-            analysis_data[str(activity.id)]['gender'][gender] = analysis_data[str(activity.id)]['gender'].get(gender, 0) + 1
-            
-            filiere = p.user.get_filiere_display() or 'Non spécifié'
-            analysis_data[str(activity.id)]['filiere'][filiere] = analysis_data[str(activity.id)]['filiere'].get(filiere, 0) + 1
-            
-            niveau = p.user.niveau or 'Non spécifié'
-            analysis_data[str(activity.id)]['niveau'][niveau] = analysis_data[str(activity.id)]['niveau'].get(niveau, 0) + 1
+    ).values('activity_id', 'user__gender', 'user__filiere', 'user__niveau').annotate(count=Count('id')).order_by()
+    
+    for group in groups:
+        values = {
+            'gender': group['user__gender'] or 'Non spécifié',
+            'filiere': filieres.get(group['user__filiere'], group['user__filiere']) or 'Non spécifié',
+            'niveau': group['user__niveau'] or 'Non spécifié',
+        }
+        targets = [analysis_data['all']]
+        if str(group['activity_id']) in analysis_data:
+            targets.append(analysis_data[str(group['activity_id'])])
+        for target in targets:
+            for key, value in values.items():
+                target[key][value] = target[key].get(value, 0) + group['count']
     
     # Expense Evolution Data
-    expense_by_activity = Transaction.objects.filter(
-        club=club,
-        transaction_type='EXPENSE',
-        activity__isnull=False
-    ).values('activity__title').annotate(
-        total=Sum('amount')
-    ).order_by('activity__date')
+    expense_by_activity = sorted(finance_summary['by_activity'], key=lambda item: item['activity__date'])
     
     expense_activities = [item['activity__title'] for item in expense_by_activity]
     expense_amounts = [float(item['total']) for item in expense_by_activity]
@@ -647,7 +612,7 @@ def club_dashboard(request, slug):
     }])
     
     # Action Plans
-    action_plans = club.action_plans.all().prefetch_related('tasks')
+    action_plans = club.action_plans.with_progress()
     
     context = {
         'club': club,
@@ -670,11 +635,8 @@ def club_dashboard(request, slug):
 def club_participants(request, slug):
     """Club participants page with 3 tables"""
     from django.core.paginator import Paginator
-    from django.db.models import Count, Q
     from participation.models import Participation
     from clubs.models import Winner
-    from django.http import HttpResponse
-    import csv
     
     club = get_object_or_404(Club, slug=slug)
     
@@ -700,51 +662,16 @@ def club_participants(request, slug):
         otp_verified=True
     ).dates('activity__date', 'year', order='DESC')
     
-    # Export to CSV if requested
-    if request.GET.get('export') == 'csv':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="participants_{club.slug}_{timezone.now().strftime("%Y%m%d")}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['#', 'Nom', 'Prénom', 'Email', 'Filière', 'Niveau', 'Sexe', 'Téléphone', 'Activité', 'Date activité', 'Note', 'Date de participation'])
-        
-        export_participations = base_participations.select_related('user', 'activity').order_by('-created_at')
-        
-        for idx, participation in enumerate(export_participations, 1):
-            writer.writerow([
-                idx,
-                participation.user.last_name,
-                participation.user.first_name,
-                participation.user.email,
-                participation.user.get_filiere_display() or '-',
-                participation.user.get_niveau_display() or '-',
-                participation.user.get_gender_display() or '-',
-                participation.user.phone or '-',
-                participation.activity.title,
-                participation.activity.date.strftime('%d/%m/%Y') if participation.activity.date else '-',
-                participation.rating or '-',
-                participation.submitted_at.strftime('%d/%m/%Y %H:%M') if participation.submitted_at else '-'
-            ])
-        
-        return response
+    # Export (CSV, XLSX or NDJSON) if requested
+    if request.GET.get('export'):
+        from core.exports import export_response
+        return export_response(
+            request, 'club_participants', {'club': club.slug, 'year': year_filter}, request.GET['export']
+        )
     
     # Table 1: TOP 10 participants by attendance rate
-    top_participants_data = base_participations.values('user').annotate(
-        participation_count=Count('id')
-    ).order_by('-participation_count')[:10]
-    
-    # Calculate attendance percentage for top participants
-    top_participants = []
-    total_activities = activities.count()
-    for item in top_participants_data:
-        from users.models import User
-        user = User.objects.get(id=item['user'])
-        attendance_percentage = round((item['participation_count'] / total_activities * 100), 2) if total_activities > 0 else 0
-        top_participants.append({
-            'user': user,
-            'participation_count': item['participation_count'],
-            'attendance_percentage': attendance_percentage
-        })
+    from users.models import User
+    top_participants = User.objects.top_attendance(club, year_filter, limit=10)
     
     # Table 2: Competition winners with pagination
     winners_list = Winner.objects.filter(
@@ -1277,7 +1204,7 @@ def add_task(request, slug, plan_id):
 @require_http_methods(["POST"])
 def add_income(request, slug):
     """Add income (entrée de caisse) to club budget"""
-    from finances.models import Transaction, CashBalance
+    from finances.models import Transaction
     from finances.forms import IncomeForm
     
     club = get_object_or_404(Club, slug=slug)
@@ -1304,10 +1231,6 @@ def add_income(request, slug):
         transaction.created_by = request.user
         transaction.save()
         
-        # Update cash balance
-        cash_balance, created = CashBalance.objects.get_or_create(club=club)
-        cash_balance.update_balance()
-        
         messages.success(request, f'Entrée de {transaction.amount} FCFA ajoutée avec succès!')
     else:
         messages.error(request, 'Erreur lors de l\'ajout de l\'entrée. Veuillez vérifier les champs.')
@@ -1318,7 +1241,7 @@ def add_income(request, slug):
 # API ViewSets
 class ClubViewSet(viewsets.ModelViewSet):
     """ViewSet for Club model"""
-    queryset = Club.objects.all()
+    queryset = Club.objects.with_execution_rate()
     serializer_class = ClubSerializer
     lookup_field = 'slug'
     filter_backends = [DjangoFilterBackend]
@@ -1327,7 +1250,9 @@ class ClubViewSet(viewsets.ModelViewSet):
 
 class ActivityViewSet(viewsets.ModelViewSet):
     """ViewSet for Activity model"""
-    queryset = Activity.objects.all()
+    queryset = Activity.objects.select_related('club').prefetch_related(
+        'photos__uploaded_by', 'competitions__winners__participant'
+    )
     serializer_class = ActivitySerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['club', 'status', 'date']
@@ -1335,7 +1260,7 @@ class ActivityViewSet(viewsets.ModelViewSet):
 
 class ActionPlanViewSet(viewsets.ModelViewSet):
     """ViewSet for ActionPlan model"""
-    queryset = ActionPlan.objects.all()
+    queryset = ActionPlan.objects.with_progress().select_related('club').prefetch_related('tasks__assigned_to__user')
     serializer_class = ActionPlanSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['club']
@@ -1343,7 +1268,7 @@ class ActionPlanViewSet(viewsets.ModelViewSet):
 
 class TaskViewSet(viewsets.ModelViewSet):
     """ViewSet for Task model"""
-    queryset = Task.objects.all()
+    queryset = Task.objects.select_related('assigned_to__user')
     serializer_class = TaskSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['action_plan', 'is_completed', 'assigned_to']
@@ -1351,7 +1276,7 @@ class TaskViewSet(viewsets.ModelViewSet):
 
 class CompetitionViewSet(viewsets.ModelViewSet):
     """ViewSet for Competition model"""
-    queryset = Competition.objects.all()
+    queryset = Competition.objects.select_related('activity').prefetch_related('winners__participant')
     serializer_class = CompetitionSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['activity']
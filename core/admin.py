@@ -1,3 +1,29 @@
+"""
+Admin configuration for core app
+"""
 from django.contrib import admin
+from .models import ImageRendition, ExportJob, StoredBlob
 
-# Register your models here.
+
+@admin.register(ImageRendition)
+class ImageRenditionAdmin(admin.ModelAdmin):
+    list_display = ['source', 'format', 'width', 'height', 'source_width', 'source_height', 'created_at']
+    list_filter = ['format', 'width']
+    search_fields = ['source']
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'format', 'user', 'status', 'row_count', 'created_at', 'completed_at']
+    list_filter = ['status', 'format', 'name']
+    search_fields = ['name', 'user__email']
+    readonly_fields = ['created_at', 'updated_at', 'completed_at']
+
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'refcount', 'created_at', 'updated_at']
+    list_filter = ['created_at']
+    search_fields = ['digest', 'name']
+    readonly_fields = ['digest', 'name', 'size', 'refcount', 'created_at', 'updated_at']
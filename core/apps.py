@@ -5,3 +5,11 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     verbose_name = 'Core'
+
+    def ready(self):
+        from django.utils.module_loading import autodiscover_modules
+        from .signals import connect_blob_signals, connect_image_signals
+        connect_image_signals()
+        connect_blob_signals()
+        # Register the exports declared in each app's exports.py
+        autodiscover_modules('exports')
@@ -0,0 +1,29 @@
+"""
+Background task helpers
+
+Celery is optional: the PythonAnywhere deployment does not ship it, in which
+case tasks declared with ``shared_task`` simply run in the calling process.
+"""
+from django.db import transaction
+
+try:
+    from celery import shared_task
+except ImportError:  # Celery not installed
+    def shared_task(*task_args, **task_kwargs):
+        """Fallback decorator giving plain functions a Celery-like API"""
+        def decorator(func):
+            func.delay = func
+            func.apply_async = lambda args=(), kwargs=None, **options: func(*args, **(kwargs or {}))
+            return func
+
+        if len(task_args) == 1 and callable(task_args[0]) and not task_kwargs:
+            return decorator(task_args[0])
+        return decorator
+
+
+def enqueue(task, *args, **kwargs):
+    """
+    Schedule a task once the current database transaction is committed,
+    so the worker never reads rows that are not visible yet
+    """
+    transaction.on_commit(lambda: task.delay(*args, **kwargs))
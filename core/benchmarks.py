@@ -0,0 +1,364 @@
+"""
+View benchmarks with query budgets
+
+seed(scale) creates the volumes of scripts/generate_test_data.py multiplied
+by ``scale``: students, activities, participations, competitions, action
+plans and transactions grow with it, while clubs, their executive boards,
+budgets and cash balances stay one set per club. Rows are written with
+bulk_create, so that 100x takes seconds instead of hours.
+
+Each Scenario is one page or API call (or the steps of a flow) with a query
+budget: the maximum number of SQL queries it may issue, whatever the scale.
+measure() runs a scenario, the first time on a cold cache, and returns its
+timings and query count. They are used by the benchmark_views command
+(report at several scales) and by the test suite (budgets at 1x).
+"""
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+
+BATCH_SIZE = 2000
+
+# Volumes of scripts/generate_test_data.py, per unit of scale
+STUDENTS = 60
+ACTIVITIES_PER_CLUB = (10, 12)
+PARTICIPANTS_PER_ACTIVITY = (25, 60)
+INCOMES_PER_CLUB = (4, 6)
+EXPENSES_PER_ACTIVITY = (2, 4)
+GENERAL_EXPENSES_PER_CLUB = (3, 6)
+ACTION_PLANS_PER_CLUB = (2, 3)
+TASKS_PER_ACTION_PLAN = (8, 15)
+
+EXECUTIVE_POSITIONS = ['PRESIDENT', 'VICE_PRESIDENT', 'SECRETARY', 'TREASURER', 'COMMUNICATION']
+
+
+class Dataset:
+    """Seeded rows the scenarios work on"""
+
+    def __init__(self, scale, club, activity, staff, volumes):
+        self.scale = scale
+        self.club = club
+        # Ongoing activity of the club, target of the check-in flow
+        self.activity = activity
+        self.staff = staff
+        self.volumes = volumes
+        # OTP of the activity, set by the check-in scenario
+        self.otp_code = None
+        self._clients = {}
+
+    def client(self, user):
+        """Test client logged in as user (one per user)"""
+        if user.pk not in self._clients:
+            client = Client()
+            client.force_login(user)
+            self._clients[user.pk] = client
+        return self._clients[user.pk]
+
+
+def _status(rng, today):
+    """Status and date of an activity: 60% completed, 20% ongoing, 15% planned, 5% cancelled"""
+    draw = rng.random()
+    if draw < 0.60:
+        return 'COMPLETED', today - timedelta(days=rng.randint(10, 200))
+    if draw < 0.80:
+        return 'ONGOING', today
+    if draw < 0.95:
+        return 'PLANNED', today + timedelta(days=rng.randint(5, 90))
+    return 'CANCELLED', today - timedelta(days=rng.randint(5, 60))
+
+
+def seed(scale=1, seed=42):
+    """Create a dataset of the given scale; returns a Dataset"""
+    from clubs.models import Club, ClubMember, Activity, ActionPlan, Task, Competition, Winner
+    from finances.models import Budget, CashBalance, Transaction
+    from participation.models import Participation, ParticipationStats
+    from users.models import User
+
+    rng = random.Random(seed)
+    today = timezone.localdate()
+    now = timezone.now()
+    # Unusable password: nothing is hashed
+    password = make_password(None)
+
+    clubs = Club.objects.bulk_create([
+        Club(name=f"Benchmark {label}", slug=f"benchmark-{key.lower()}", type=key, description="Benchmark")
+        for key, label in Club.CLUB_TYPES
+    ])
+
+    staff = User.objects.create(
+        email='benchmark-admin@aesi.local', first_name='Admin', last_name='Benchmark',
+        role='AESI_EXECUTIVE', is_staff=True, password=password
+    )
+    users = User.objects.bulk_create([
+        User(
+            email=f'benchmark-{index}@aesi.local',
+            first_name='Etudiant',
+            last_name=str(index),
+            gender=rng.choice(['M', 'F']),
+            filiere=rng.choice(['IDA', 'ITS', 'TSE', 'TS', 'AT']),
+            niveau=rng.choice(['1', '2', '3', '4']),
+            role='STUDENT',
+            password=password,
+        )
+        for index in range(STUDENTS * scale)
+    ], batch_size=BATCH_SIZE)
+
+    # Executive boards: the first students of the list
+    executives = users[:len(clubs) * len(EXECUTIVE_POSITIONS)]
+    students = users[len(executives):]
+    User.objects.filter(pk__in=[user.pk for user in executives]).update(role='CLUB_EXECUTIVE')
+    ClubMember.objects.bulk_create([
+        ClubMember(
+            club=club,
+            user=executives[index * len(EXECUTIVE_POSITIONS) + rank],
+            position=position,
+            start_date=today - timedelta(days=rng.randint(90, 365)),
+        )
+        for index, club in enumerate(clubs) for rank, position in enumerate(EXECUTIVE_POSITIONS)
+    ])
+
+    activities = []
+    for club in clubs:
+        for index in range(rng.randint(*ACTIVITIES_PER_CLUB) * scale):
+            status, day = ('ONGOING', today) if index == 0 else _status(rng, today)
+            activities.append(Activity(
+                club=club,
+                title=f"Activité {index + 1}",
+                description="Benchmark",
+                theme="Benchmark",
+                date=day,
+                location="Campus",
+                status=status,
+                otp_enabled=True,
+            ))
+    activities = Activity.objects.bulk_create(activities, batch_size=BATCH_SIZE)
+    completed = [activity for activity in activities if activity.status == 'COMPLETED']
+
+    participations, winners = [], []
+    for activity in completed:
+        count = min(rng.randint(*PARTICIPANTS_PER_ACTIVITY), len(students))
+        attended = now - timedelta(days=(today - activity.date).days)
+        verified = []
+        for user in rng.sample(students, count):
+            is_verified = rng.random() < 0.90
+            feedback = is_verified and rng.random() < 0.85
+            participations.append(Participation(
+                activity=activity,
+                user=user,
+                otp_verified=is_verified,
+                otp_verified_at=attended if is_verified else None,
+                rating=rng.randint(3, 5) if feedback else None,
+                appreciation="Très bonne activité" if feedback else '',
+                submitted_at=attended if feedback else None,
+            ))
+            if is_verified:
+                verified.append(user)
+        # A competition with its podium for one completed activity out of four
+        if rng.random() < 0.25 and len(verified) >= 3:
+            winners.append((activity, rng.sample(verified, 3)))
+        if len(participations) >= BATCH_SIZE:
+            Participation.objects.bulk_create(participations, batch_size=BATCH_SIZE)
+            participations = []
+    Participation.objects.bulk_create(participations, batch_size=BATCH_SIZE)
+
+    competitions = Competition.objects.bulk_create([
+        Competition(activity=activity, name="Compétition principale", description="Benchmark")
+        for activity, _ in winners
+    ], batch_size=BATCH_SIZE)
+    Winner.objects.bulk_create([
+        Winner(competition=competition, participant=user, rank=rank, prize=f"Prix {rank}")
+        for competition, (_, podium) in zip(competitions, winners)
+        for rank, user in enumerate(podium, 1)
+    ], batch_size=BATCH_SIZE)
+
+    plans = ActionPlan.objects.bulk_create([
+        ActionPlan(
+            club=club,
+            title=f"Programme {index + 1}",
+            description="Benchmark",
+            start_date=today - timedelta(days=90),
+            end_date=today + timedelta(days=90),
+        )
+        for club in clubs for index in range(rng.randint(*ACTION_PLANS_PER_CLUB) * scale)
+    ], batch_size=BATCH_SIZE)
+    Task.objects.bulk_create([
+        Task(
+            action_plan=plan,
+            title=f"Tâche {index + 1}",
+            due_date=today + timedelta(days=rng.randint(-60, 60)),
+            is_completed=rng.random() < 0.5,
+        )
+        for plan in plans for index in range(rng.randint(*TASKS_PER_ACTION_PLAN))
+    ], batch_size=BATCH_SIZE)
+
+    transactions = []
+    for club in clubs:
+        for _ in range(rng.randint(*INCOMES_PER_CLUB) * scale):
+            transactions.append(Transaction(
+                club=club, transaction_type='INCOME', amount=Decimal(rng.randint(150000, 600000)),
+                description="Subvention AESI", category="Subvention AESI",
+                transaction_date=today - timedelta(days=rng.randint(30, 250)),
+            ))
+        for _ in range(rng.randint(*GENERAL_EXPENSES_PER_CLUB) * scale):
+            transactions.append(Transaction(
+                club=club, transaction_type='EXPENSE', amount=Decimal(rng.randint(10000, 50000)),
+                description="Frais généraux", category="Logistique",
+                transaction_date=today - timedelta(days=rng.randint(10, 200)),
+            ))
+    for activity in completed:
+        for _ in range(rng.randint(*EXPENSES_PER_ACTIVITY)):
+            transactions.append(Transaction(
+                club_id=activity.club_id, activity=activity, transaction_type='EXPENSE',
+                amount=Decimal(rng.randint(15000, 100000)), description=f"Matériel pour {activity.title}",
+                category="Matériel", transaction_date=activity.date - timedelta(days=rng.randint(0, 7)),
+            ))
+    Transaction.objects.bulk_create(transactions, batch_size=BATCH_SIZE)
+
+    Budget.objects.bulk_create([
+        Budget(
+            club=club, title=f"Budget {year}", description="Benchmark",
+            start_date=date(year, 1, 1), end_date=date(year, 12, 31),
+            allocated_amount=Decimal(rng.randint(600000, 1200000)), is_active=year == today.year,
+        )
+        for club in clubs for year in (today.year - 1, today.year)
+    ])
+    for club in clubs:
+        CashBalance.objects.create(club=club).update_balance()
+    ParticipationStats.refresh_for_users()
+
+    club = clubs[0]
+    return Dataset(
+        scale=scale,
+        club=club,
+        activity=Activity.objects.filter(club=club, status='ONGOING').first(),
+        staff=staff,
+        volumes={
+            'clubs': len(clubs),
+            'users': len(users) + 1,
+            'activities': len(activities),
+            'participations': Participation.objects.filter(activity__club__in=clubs).count(),
+            'winners': len(competitions) * 3,
+            'tasks': Task.objects.filter(action_plan__club__in=clubs).count(),
+            'transactions': len(transactions),
+        },
+    )
+
+
+class Scenario:
+    """
+    A page, an API call or a flow, with its query budget
+
+    ``run(client, dataset)`` issues the requests and returns their responses.
+    ``prepare(dataset)`` returns the client to use and runs outside of the
+    measure; by default the client of the staff user.
+    """
+
+    def __init__(self, name, budget, run, prepare=None):
+        self.name = name
+        self.budget = budget
+        self.run = run
+        self.prepare = prepare or (lambda dataset: dataset.client(dataset.staff))
+
+
+def _get(url_name, **kwargs):
+    def run(client, dataset):
+        return [client.get(reverse(url_name, kwargs={key: value(dataset) for key, value in kwargs.items()}))]
+    return run
+
+
+def _club_slug(dataset):
+    return dataset.club.slug
+
+
+def _checkin_student(dataset):
+    """A new student and a fresh OTP for the ongoing activity"""
+    from core.utils import generate_otp, store_otp
+    from users.models import User
+
+    index = User.objects.filter(email__startswith='benchmark-checkin-').count()
+    student = User.objects.create(
+        email=f'benchmark-checkin-{index}@aesi.local', first_name='Etudiant', last_name='Check-in',
+        password=make_password(None)
+    )
+    dataset.otp_code = generate_otp()
+    store_otp(dataset.activity.id, dataset.otp_code)
+    client = Client()
+    client.force_login(student)
+    return client
+
+
+def _checkin(client, dataset):
+    """OTP form, participation form, feedback submission"""
+    activity_id = dataset.activity.id
+    return [
+        client.post(reverse('participation:verify_otp', args=[activity_id]), {'otp_code': dataset.otp_code}),
+        client.get(reverse('participation:participation_form', args=[activity_id])),
+        client.post(
+            reverse('participation:submit_participation', args=[activity_id]),
+            {'rating': 5, 'appreciation': "Très bien", 'suggestion': ''}
+        ),
+    ]
+
+
+# Budgets are the query counts of the views at the time of writing (full
+# pages): lower them when a view gets cheaper, never raise them silently
+SCENARIOS = [
+    # Grouped per-club statistics: constant whatever the number of clubs
+    Scenario('global_dashboard', 20, _get('dashboard:global_dashboard')),
+    # Club pages read the summary version from CashBalance (one query)
+    Scenario('club_dashboard', 29, _get('clubs:club_dashboard', slug=_club_slug)),
+    Scenario('club_participants', 20, _get('clubs:club_participants', slug=_club_slug)),
+    Scenario('club_budget', 18, _get('clubs:club_budget', slug=_club_slug)),
+    # Login required on each step, sessions read from the database (per-process
+    # cache), stored verification flag read before the submission is saved
+    Scenario('otp_checkin', 20, _checkin, prepare=_checkin_student),
+    # DRF list endpoints (first page)
+    Scenario('api_clubs', 4, _get('club-list')),
+    Scenario('api_activities', 28, _get('activity-list')),
+    Scenario('api_action_plans', 5, _get('actionplan-list')),
+    Scenario('api_tasks', 4, _get('task-list')),
+    Scenario('api_competitions', 6, _get('competition-list')),
+    Scenario('api_participations', 4, _get('participation-list')),
+    Scenario('api_transactions', 4, _get('transaction-list')),
+    Scenario('api_budgets', 5, _get('budget-list')),
+    Scenario('api_cash_balances', 4, _get('cashbalance-list')),
+]
+
+
+def measure(scenario, dataset, repeat=5):
+    """
+    Run a scenario ``repeat`` times, the first one on an empty cache; returns
+    the query count (highest of the runs), cold_ms, median_ms and max_ms
+    """
+    timings, queries, statuses = [], 0, set()
+    for index in range(repeat):
+        if index == 0:
+            cache.clear()
+        client = scenario.prepare(dataset)
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            responses = scenario.run(client, dataset)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = max(queries, len(context.captured_queries))
+        statuses.update(response.status_code for response in responses)
+
+    return {
+        'budget': scenario.budget,
+        'queries': queries,
+        'within_budget': queries <= scenario.budget,
+        'statuses': sorted(statuses),
+        'cold_ms': round(timings[0], 2),
+        'median_ms': round(statistics.median(timings), 2),
+        'max_ms': round(max(timings), 2),
+    }
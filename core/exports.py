@@ -0,0 +1,375 @@
+"""
+Streaming exports (CSV, XLSX, NDJSON)
+
+An export is declared once, in the ``exports`` module of an app, by a
+function that builds an ExportDefinition (queryset + columns) from plain
+parameters:
+
+    @register_export('club_expenses')
+    def club_expenses(params):
+        return ExportDefinition(queryset, columns, filename)
+
+Rows are read with ``.iterator(chunk_size=...)`` and written to the client
+chunk by chunk, so memory use does not depend on the number of rows. Exports
+above EXPORT_STREAMING_MAX_ROWS are written to a file by a background job
+(ExportJob) instead of holding a worker for the whole download.
+
+Documents (reports made of several tables, in XLSX or PDF) are registered
+the same way with ``register_document`` and are always generated by a
+background job:
+
+    @register_document('financial_report')
+    def financial_report(params):
+        return Document(title, tables, filename)
+"""
+import csv
+import json
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'ndjson': 'application/x-ndjson',
+    'pdf': 'application/pdf',
+}
+
+EXPORTS = {}
+DOCUMENTS = {}
+
+# Chunks sent to the client / written to the file are about this size
+BUFFER_SIZE = 64 * 1024
+
+
+class Column:
+    """One exported column: key (NDJSON), header (CSV/XLSX) and value getter"""
+
+    def __init__(self, key, header, getter):
+        self.key = key
+        self.header = header
+        self.getter = getter if callable(getter) else (lambda obj, attr=getter: _resolve(obj, attr))
+
+
+class ExportDefinition:
+    """Queryset, columns and file name of an export"""
+
+    def __init__(self, queryset, columns, filename, numbered=True):
+        self.queryset = queryset
+        self.columns = columns
+        self.filename = filename
+        self.numbered = numbered
+
+    @property
+    def keys(self):
+        return (['n'] if self.numbered else []) + [column.key for column in self.columns]
+
+    @property
+    def headers(self):
+        return (['#'] if self.numbered else []) + [column.header for column in self.columns]
+
+    def rows(self):
+        chunk_size = settings.EXPORT_CHUNK_SIZE
+        for index, obj in enumerate(self.queryset.iterator(chunk_size=chunk_size), 1):
+            values = [column.getter(obj) for column in self.columns]
+            yield [index] + values if self.numbered else values
+
+
+class Table:
+    """Titled table of a document"""
+
+    def __init__(self, title, headers, rows):
+        self.title = title
+        self.headers = headers
+        self.rows = rows
+
+
+class Document:
+    """Title, tables and file name of a document"""
+
+    def __init__(self, title, tables, filename):
+        self.title = title
+        self.tables = tables
+        self.filename = filename
+
+
+def register_export(name):
+    """Register an export builder under ``name``"""
+    def decorator(func):
+        EXPORTS[name] = func
+        return func
+    return decorator
+
+
+def get_export(name, params):
+    """Build the registered export ``name`` for the given parameters"""
+    return EXPORTS[name](params)
+
+
+def register_document(name):
+    """Register a document builder under ``name``"""
+    def decorator(func):
+        DOCUMENTS[name] = func
+        return func
+    return decorator
+
+
+def _resolve(obj, attr):
+    for part in attr.split('.'):
+        obj = getattr(obj, part, None)
+        if obj is None:
+            return None
+    return obj
+
+
+def _text(value):
+    if value is None:
+        return ''
+    return str(value)
+
+
+def _buffered(chunks, size=BUFFER_SIZE):
+    """Join small byte chunks into pieces of about ``size`` bytes"""
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+class _Echo:
+    """File-like object returning what is written (for csv.writer)"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(definition):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(definition.headers).encode('utf-8')
+    for row in definition.rows():
+        yield writer.writerow([_text(value) for value in row]).encode('utf-8')
+
+
+def stream_ndjson(definition):
+    keys = definition.keys
+    for row in definition.rows():
+        yield (json.dumps(dict(zip(keys, row)), ensure_ascii=False, default=str) + '\n').encode('utf-8')
+
+
+# XML 1.0 forbids most control characters
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XLSX_STATIC = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        '<cellXfs count="2"><xf/><xf fontId="1" applyFont="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+
+def _xlsx_cell(value, style=''):
+    if isinstance(value, bool) or value is None or not isinstance(value, (int, float, Decimal)):
+        text = escape(_ILLEGAL_XML.sub('', _text(value)))
+        return f'<c t="inlineStr"{style}><is><t xml:space="preserve">{text}</t></is></c>'
+    return f'<c{style}><v>{value}</v></c>'
+
+
+def _xlsx_row(values, style=''):
+    return ('<row>' + ''.join(_xlsx_cell(value, style) for value in values) + '</row>').encode('utf-8')
+
+
+class _ZipStream:
+    """Write-only, unseekable sink: zipfile writes, the generator drains"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def stream_xlsx(definition):
+    """
+    Minimal single-sheet workbook written on the fly: inline strings, no
+    shared string table, so nothing has to be kept until the end
+    """
+    rows = (_xlsx_row(row) for row in definition.rows())
+    return _stream_sheet(_xlsx_row(definition.headers, ' s="1"'), rows)
+
+
+def _document_rows(document):
+    yield _xlsx_row([document.title], ' s="1"')
+    for table in document.tables:
+        yield _xlsx_row([])
+        yield _xlsx_row([table.title], ' s="1"')
+        yield _xlsx_row(table.headers, ' s="1"')
+        for row in table.rows:
+            yield _xlsx_row(row)
+
+
+def document_xlsx(document):
+    """Tables of a document one below the other, in a single sheet"""
+    return _stream_sheet(b'', _document_rows(document))
+
+
+def document_pdf(document):
+    from .pdf import render_tables
+    yield render_tables(document.title, document.tables)
+
+
+def _stream_sheet(header, rows):
+    """Workbook bytes of a sheet made of an encoded header row and row chunks"""
+    sink = _ZipStream()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC.items():
+            archive.writestr(name, content)
+        yield sink.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(header)
+            for chunk in _buffered(rows):
+                sheet.write(chunk)
+                yield sink.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+
+STREAMS = {
+    'csv': stream_csv,
+    'xlsx': stream_xlsx,
+    'ndjson': stream_ndjson,
+}
+
+DOCUMENT_STREAMS = {
+    'xlsx': document_xlsx,
+    'pdf': document_pdf,
+}
+
+
+def stream_export(definition, export_format):
+    """Bytes of the export in the given format, in ~64 KB chunks"""
+    return _buffered(STREAMS[export_format](definition))
+
+
+def stream_document(document, export_format):
+    """Bytes of a document in the given format"""
+    return _buffered(DOCUMENT_STREAMS[export_format](document))
+
+
+def export_filename(definition, export_format):
+    return f"{definition.filename}_{timezone.now().strftime('%Y%m%d')}.{export_format}"
+
+
+def export_response(request, name, params, export_format='csv'):
+    """
+    Stream the export to the client, or hand it to a background job when it
+    has more than EXPORT_STREAMING_MAX_ROWS rows (redirects to its status page)
+    """
+    from django.shortcuts import redirect
+    from .background import enqueue
+    from .models import ExportJob
+    from .tasks import run_export_job
+
+    if export_format not in STREAMS:
+        export_format = 'csv'
+
+    definition = get_export(name, params)
+
+    if definition.queryset.count() > settings.EXPORT_STREAMING_MAX_ROWS:
+        job = ExportJob.objects.create(
+            user=request.user,
+            name=name,
+            params=params,
+            format=export_format,
+        )
+        enqueue(run_export_job, job.id)
+        return redirect('core:export_status', pk=job.pk)
+
+    response = StreamingHttpResponse(
+        stream_export(definition, export_format),
+        content_type=EXPORT_FORMATS[export_format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(definition, export_format)}"'
+    return response
+
+
+def document_response(request, name, params, export_format='pdf'):
+    """Generate a document in a background job and redirect to its status page"""
+    from django.shortcuts import redirect
+    from .background import enqueue
+    from .models import ExportJob
+    from .tasks import run_export_job
+
+    if export_format not in DOCUMENT_STREAMS:
+        export_format = 'pdf'
+
+    job = ExportJob.objects.create(
+        user=request.user,
+        name=name,
+        params=params,
+        format=export_format,
+    )
+    enqueue(run_export_job, job.id)
+    return redirect('core:export_status', pk=job.pk)
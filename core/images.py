@@ -0,0 +1,222 @@
+"""
+Image renditions
+
+Uploaded photos are stored as-is; a background task then generates resized
+JPEG/WebP copies (EXIF stripped, orientation applied) so pages can download
+the smallest image that fits instead of the multi-megabyte original. Images
+uploaded before their field got renditions are processed by the
+generate_renditions command: pages never generate anything, they fall back
+on the original until the renditions exist.
+
+Renditions of blobs (core.storage) are served by core.views.serve_blob_rendition
+with the access rules of their blob, the others from MEDIA_URL.
+"""
+import hashlib
+import logging
+import os
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+
+logger = logging.getLogger('aesi_platform.images')
+
+# Widths (px) generated for every registered image
+RENDITION_WIDTHS = (80, 160, 320, 640, 1280)
+# Images only shown small (avatars, logos): 1x and 2x of 40, 80 and 160 px
+THUMBNAIL_WIDTHS = (40, 80, 160, 320)
+RENDITION_FORMATS = {
+    'JPEG': {'extension': 'jpg', 'options': {'quality': 82, 'optimize': True, 'progressive': True}},
+    'WEBP': {'extension': 'webp', 'options': {'quality': 80, 'method': 4}},
+}
+
+# Image fields that get renditions, by model label
+IMAGE_FIELDS = {
+    'participation.Participation': ('photo1', 'photo2', 'photo3'),
+    'clubs.ActivityPhoto': ('image',),
+    'clubs.Activity': ('cover_image',),
+    'clubs.Club': ('logo', 'cover_image'),
+    'users.User': ('profile_picture',),
+}
+
+# Fields generated at other widths than RENDITION_WIDTHS, by (model label, field name)
+FIELD_WIDTHS = {
+    ('clubs.Club', 'logo'): THUMBNAIL_WIDTHS,
+    ('users.User', 'profile_picture'): THUMBNAIL_WIDTHS,
+}
+
+RENDITION_PREFIX = 'renditions/'
+
+RENDITIONS_CACHE_TIMEOUT = 60 * 60 * 24
+PENDING_CACHE_TIMEOUT = 60
+
+
+def _cache_key(source):
+    return 'renditions_' + hashlib.md5(source.encode('utf-8')).hexdigest()
+
+
+def _pending_key(source):
+    return 'renditions_pending_' + hashlib.md5(source.encode('utf-8')).hexdigest()
+
+
+def rendition_widths(image):
+    """Widths of the renditions of an image field value (FieldFile)"""
+    field = getattr(image, 'field', None)
+    if field is None:
+        return RENDITION_WIDTHS
+    return FIELD_WIDTHS.get((field.model._meta.label, field.name), RENDITION_WIDTHS)
+
+
+def schedule_renditions(source, widths=RENDITION_WIDTHS):
+    """Generate the renditions of an image in the background, once per PENDING_CACHE_TIMEOUT"""
+    from .background import enqueue
+    from .tasks import generate_image_renditions
+
+    if cache.add(_pending_key(source), True, PENDING_CACHE_TIMEOUT):
+        enqueue(generate_image_renditions, source, list(widths))
+
+
+def _flatten(img):
+    """Convert to RGB, painting transparent areas white"""
+    from PIL import Image
+
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        return background
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def _rendition_name(source, width, extension):
+    stem, _ = os.path.splitext(source)
+    return f'{RENDITION_PREFIX}{stem}_{width}w.{extension}'
+
+
+def rendition_url(name):
+    """URL of a rendition file, through the blob access check for the renditions of blobs"""
+    from django.urls import reverse
+    from .storage import BLOB_PREFIX
+
+    blob_prefix = RENDITION_PREFIX + BLOB_PREFIX
+    if name.startswith(blob_prefix):
+        return reverse('core:serve_blob_rendition', args=[name[len(blob_prefix):]])
+    return default_storage.url(name)
+
+
+def generate_renditions(source, widths=RENDITION_WIDTHS):
+    """
+    (Re)generate all renditions of the image stored under ``source``
+
+    Returns the created ImageRendition objects.
+    """
+    from PIL import Image, ImageOps
+    from .models import ImageRendition
+
+    with default_storage.open(source, 'rb') as fh:
+        img = Image.open(fh)
+        img.load()
+
+    # Apply the camera orientation before the EXIF block is dropped
+    img = _flatten(ImageOps.exif_transpose(img))
+    source_width, source_height = img.size
+
+    targets = [w for w in widths if w < source_width]
+    if source_width <= max(widths):
+        targets.append(source_width)
+
+    delete_renditions(source)
+
+    renditions = []
+    for width in targets:
+        height = max(1, round(source_height * width / source_width))
+        resized = img if width == source_width else img.resize((width, height), Image.Resampling.LANCZOS)
+
+        for image_format, spec in RENDITION_FORMATS.items():
+            output = BytesIO()
+            # No exif= argument: metadata (GPS, device...) is not copied
+            resized.save(output, format=image_format, **spec['options'])
+            name = default_storage.save(
+                _rendition_name(source, width, spec['extension']),
+                ContentFile(output.getvalue())
+            )
+            renditions.append(ImageRendition(
+                source=source,
+                source_width=source_width,
+                source_height=source_height,
+                file=name,
+                format=image_format,
+                width=width,
+                height=height,
+            ))
+
+    ImageRendition.objects.bulk_create(renditions)
+    cache.delete(_cache_key(source))
+    return renditions
+
+
+def delete_renditions(source):
+    """Remove the renditions (rows and files) of an image"""
+    from .models import ImageRendition
+
+    existing = ImageRendition.objects.filter(source=source)
+    for rendition in existing:
+        rendition.file.delete(save=False)
+    existing.delete()
+    cache.delete(_cache_key(source))
+
+
+def get_renditions(source):
+    """
+    Renditions of an image as a list of dicts (format, width, height, url),
+    smallest first. Empty until the background task (scheduled on upload, see
+    core.signals) or the generate_renditions command has run: reads never
+    generate anything.
+    """
+    if not source:
+        return []
+
+    key = _cache_key(source)
+    renditions = cache.get(key)
+
+    if renditions is None:
+        from .models import ImageRendition
+        renditions = list(
+            ImageRendition.objects.filter(source=source)
+            .order_by('width')
+            .values('format', 'width', 'height', 'file', 'source_width', 'source_height')
+        )
+        # generate_renditions() clears the key when done
+        cache.set(key, renditions, RENDITIONS_CACHE_TIMEOUT if renditions else PENDING_CACHE_TIMEOUT)
+
+    return [
+        dict(item, url=rendition_url(item['file']))
+        for item in renditions
+    ]
+
+
+def build_srcset(source, image_format='JPEG'):
+    """srcset attribute value ("url 160w, url 320w, ...") for an image"""
+    return ', '.join(
+        f"{item['url']} {item['width']}w"
+        for item in get_renditions(source)
+        if item['format'] == image_format
+    )
+
+
+def pick_rendition(source, min_width, image_format='JPEG'):
+    """
+    Smallest rendition at least ``min_width`` pixels wide (the largest one if
+    none is wide enough), or None when no rendition exists yet
+    """
+    candidates = [item for item in get_renditions(source) if item['format'] == image_format]
+    if not candidates:
+        return None
+    for item in candidates:
+        if item['width'] >= min_width:
+            return item
+    return candidates[-1]
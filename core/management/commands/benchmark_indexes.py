@@ -0,0 +1,202 @@
+"""
+Benchmark the hot filter paths with and without their composite indexes
+
+A synthetic dataset is seeded inside a transaction, every query is timed and
+EXPLAINed with the Meta.indexes of the models, then again after dropping
+them, and the transaction is rolled back: nothing is left in the database
+and the indexes are back in place. Works on SQLite and PostgreSQL.
+
+Usage:
+    python manage.py benchmark_indexes --scale 1 --repeat 5
+"""
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from clubs.models import Club, Activity, Competition, Winner
+from finances.models import Transaction
+from participation.models import Participation
+from users.models import User
+
+
+BATCH_SIZE = 5000
+
+# Rows per unit of --scale
+CLUBS = 10
+ACTIVITIES_PER_CLUB = 100
+USERS = 5000
+PARTICIPATIONS_PER_ACTIVITY = 200
+TRANSACTIONS_PER_CLUB = 5000
+
+INDEXED_MODELS = (Participation, Transaction, Activity)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time and EXPLAIN the hot queries with and without the composite indexes (seeded data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1, help="Dataset size multiplier")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per query (median is reported)")
+        parser.add_argument('--no-plans', action='store_true', help="Only print the timings")
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        self.show_plans = not options['no_plans']
+
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                targets = self._seed(options['scale'])
+                self.stdout.write(f"Jeu de données créé en {time.perf_counter() - started:.1f} s ({connection.vendor})\n")
+
+                queries = self._queries(**targets)
+                with_indexes = self._run(queries, "Avec index")
+                self._drop_indexes()
+                without_indexes = self._run(queries, "Sans index")
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write("\n%-40s %12s %12s %8s" % ("Requête", "sans (ms)", "avec (ms)", "gain"))
+        for label in queries:
+            before, after = without_indexes[label], with_indexes[label]
+            self.stdout.write("%-40s %12.2f %12.2f %7.1fx" % (label, before, after, before / after if after else 0))
+
+    def _seed(self, scale):
+        rng = random.Random(42)
+        today = timezone.localdate()
+        password = make_password(None)
+
+        clubs = Club.objects.bulk_create([
+            Club(name=f"Benchmark {i}", slug=f"benchmark-{i}", type='INFORMATIQUE', description="Benchmark")
+            for i in range(CLUBS * scale)
+        ])
+        users = User.objects.bulk_create([
+            User(email=f"benchmark-{i}@aesi.local", first_name="Bench", last_name=str(i), password=password)
+            for i in range(USERS * scale)
+        ], batch_size=BATCH_SIZE)
+
+        statuses = ['PLANNED', 'ONGOING', 'COMPLETED', 'COMPLETED', 'CANCELLED']
+        activities = Activity.objects.bulk_create([
+            Activity(
+                club=club,
+                title=f"Activité {i}",
+                description="Benchmark",
+                theme="Benchmark",
+                location="Campus",
+                date=today - timedelta(days=rng.randint(0, 1000)),
+                status=rng.choice(statuses),
+            )
+            for club in clubs for i in range(ACTIVITIES_PER_CLUB)
+        ], batch_size=BATCH_SIZE)
+
+        now = timezone.now()
+        participations = []
+        for activity in activities:
+            for user in rng.sample(users, PARTICIPATIONS_PER_ACTIVITY):
+                verified = rng.random() < 0.7
+                participations.append(Participation(
+                    activity=activity,
+                    user=user,
+                    otp_verified=verified,
+                    otp_verified_at=now - timedelta(minutes=rng.randint(0, 10 ** 6)) if verified else None,
+                    rating=rng.randint(1, 5) if verified else None,
+                ))
+            if len(participations) >= BATCH_SIZE:
+                Participation.objects.bulk_create(participations, batch_size=BATCH_SIZE)
+                participations = []
+        Participation.objects.bulk_create(participations, batch_size=BATCH_SIZE)
+
+        Transaction.objects.bulk_create([
+            Transaction(
+                club=club,
+                transaction_type=rng.choice(['INCOME', 'EXPENSE']),
+                amount=rng.randint(1, 100000),
+                description="Benchmark",
+                category="Benchmark",
+                transaction_date=today - timedelta(days=rng.randint(0, 1500)),
+            )
+            for club in clubs for _ in range(TRANSACTIONS_PER_CLUB)
+        ], batch_size=BATCH_SIZE)
+
+        competitions = Competition.objects.bulk_create([
+            Competition(activity=activity, name="Concours") for activity in activities[::4]
+        ], batch_size=BATCH_SIZE)
+        Winner.objects.bulk_create([
+            Winner(competition=competition, participant=rng.choice(users), rank=rank)
+            for competition in competitions for rank in (1, 2, 3)
+        ], batch_size=BATCH_SIZE)
+
+        self._analyze()
+        return {'club': clubs[0], 'activity': activities[len(activities) // 2], 'user': users[len(users) // 2]}
+
+    def _queries(self, club, activity, user):
+        """Querysets of the hot paths, by label"""
+        year_start = date(timezone.localdate().year, 1, 1)
+        month_start = (timezone.localdate() - timedelta(days=180)).replace(day=1)
+        return {
+            "Participants vérifiés d'une activité": Participation.objects.filter(
+                activity=activity, otp_verified=True
+            ).values('activity_id').annotate(count=Count('id')),
+            "Derniers check-ins d'une activité": Participation.objects.filter(
+                activity=activity, otp_verified=True
+            ).order_by('-otp_verified_at')[:10],
+            "Participations vérifiées d'un étudiant": Participation.objects.filter(
+                user=user, otp_verified=True
+            ).values('activity__club__type').annotate(count=Count('id')).order_by(),
+            "Dépenses d'un club sur l'année": Transaction.objects.filter(
+                club=club, transaction_type='EXPENSE', transaction_date__gte=year_start
+            ).values('club_id').annotate(total=Sum('amount')),
+            # balance_at(): transactions since the last monthly closing
+            "Transactions d'un club sur un mois": Transaction.objects.filter(
+                club=club, transaction_date__gte=month_start, transaction_date__lte=month_start + timedelta(days=30)
+            ).values('club_id').annotate(total=Sum('amount')),
+            "Activités terminées d'un club": Activity.objects.filter(
+                club=club, status='COMPLETED'
+            ).order_by('-date').values_list('id', flat=True),
+            "Gagnants d'un club": Winner.objects.filter(
+                competition__activity__club=club
+            ).values_list('id', flat=True),
+        }
+
+    def _run(self, queries, title):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n=== {title} ==="))
+        # Actual row counts and timings on PostgreSQL, estimated plan on SQLite
+        explain_options = {'analyze': True} if connection.vendor == 'postgresql' else {}
+        results = {}
+        for label, queryset in queries.items():
+            list(queryset.all())  # warm-up
+            timings = []
+            for _ in range(self.repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append(time.perf_counter() - started)
+            results[label] = statistics.median(timings) * 1000
+            self.stdout.write(f"{label}: {results[label]:.2f} ms")
+            if self.show_plans:
+                for line in queryset.explain(**explain_options).splitlines():
+                    self.stdout.write(f"    {line}")
+        return results
+
+    def _drop_indexes(self):
+        # Plain DDL: rolled back with the seeded data on SQLite and PostgreSQL
+        with connection.cursor() as cursor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+        self._analyze()
+
+    def _analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
@@ -0,0 +1,147 @@
+"""
+Benchmark the main views at several data scales, with their query budgets
+
+The command runs against an empty test database, created like the one of
+the test suite and destroyed at the end: the query budgets assume that the
+seeded clubs are the only ones. For each scale, the dataset of
+core.benchmarks.seed() is created inside a transaction, every scenario
+(dashboards, club pages, OTP check-in, DRF list endpoints) is timed and its
+SQL queries counted, and the transaction is rolled back. The results are written as a
+JSON report that --compare diffs against the report of another commit.
+
+The command fails when a scenario exceeds its query budget or answers with
+an error status.
+
+Usage:
+    python manage.py benchmark_views --scales 1 10 100 --output benchmark.json
+    python manage.py benchmark_views --scales 1 10 --compare benchmark-main.json
+"""
+import json
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from core.benchmarks import SCENARIOS, measure, seed
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Time the main views at several data scales and enforce their query budgets (seeded data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100], help="Dataset size multipliers")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per scenario, the first on a cold cache")
+        parser.add_argument('--only', nargs='+', help="Scenario names to run")
+        parser.add_argument('--output', help="Path of the JSON report")
+        parser.add_argument('--compare', help="JSON report to compare with")
+        parser.add_argument('--tolerance', type=float, default=20, help="Slowdown (%%) flagged by --compare")
+
+    def handle(self, *args, **options):
+        scenarios = SCENARIOS
+        if options['only']:
+            scenarios = [scenario for scenario in SCENARIOS if scenario.name in options['only']]
+            unknown = set(options['only']) - {scenario.name for scenario in scenarios}
+            if unknown:
+                raise CommandError(f"Scénarios inconnus : {', '.join(sorted(unknown))}")
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'commit': _commit(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'scales': {},
+        }
+
+        # Test clients use the "testserver" host; emails stay in memory
+        database = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=['*'],
+                EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                PERFORMANCE_SERVER_TIMING=False,
+            ):
+                for scale in options['scales']:
+                    report['scales'][str(scale)] = self._run_scale(scale, scenarios, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(database, verbosity=0)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2, ensure_ascii=False)
+            self.stdout.write(f"\nRapport écrit dans {options['output']}")
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                self._compare(json.load(file), report, options['tolerance'])
+
+        failures = [
+            f"{name} ({scale}x) : {result['queries']} requêtes pour un budget de {result['budget']}"
+            if not result['within_budget'] else f"{name} ({scale}x) : statut {result['statuses']}"
+            for scale, data in report['scales'].items()
+            for name, result in data['views'].items()
+            if not result['within_budget'] or max(result['statuses']) >= 400
+        ]
+        if failures:
+            raise CommandError("Budgets dépassés ou erreurs :\n" + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS("Tous les scénarios respectent leur budget de requêtes."))
+
+    def _run_scale(self, scale, scenarios, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n=== Échelle {scale}x ==="))
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                dataset = seed(scale)
+                seconds = time.perf_counter() - started
+                volumes = ', '.join(f"{count} {name}" for name, count in dataset.volumes.items())
+                self.stdout.write(f"Jeu de données créé en {seconds:.1f} s : {volumes}\n")
+
+                views = {}
+                self.stdout.write("%-22s %10s %10s %10s %8s %8s" % ("Scénario", "froid ms", "médian ms", "max ms", "SQL", "budget"))
+                for scenario in scenarios:
+                    result = views[scenario.name] = measure(scenario, dataset, repeat)
+                    line = "%-22s %10.1f %10.1f %10.1f %8d %8d" % (
+                        scenario.name, result['cold_ms'], result['median_ms'], result['max_ms'],
+                        result['queries'], result['budget']
+                    )
+                    self.stdout.write(line if result['within_budget'] else self.style.ERROR(line))
+                raise _Rollback
+        except _Rollback:
+            pass
+        return {'seed_seconds': round(seconds, 2), 'volumes': dataset.volumes, 'views': views}
+
+    def _compare(self, baseline, report, tolerance):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n=== Comparaison avec {baseline.get('commit') or 'la référence'} ==="
+        ))
+        self.stdout.write("%-28s %12s %12s %8s %10s" % ("Scénario", "avant ms", "après ms", "écart", "SQL"))
+        for scale, data in report['scales'].items():
+            previous = baseline.get('scales', {}).get(scale, {}).get('views', {})
+            for name, result in data['views'].items():
+                if name not in previous:
+                    continue
+                before, after = previous[name]['median_ms'], result['median_ms']
+                change = (after - before) / before * 100 if before else 0
+                line = "%-28s %12.1f %12.1f %+7.0f%% %4d -> %-4d" % (
+                    f"{name} ({scale}x)", before, after, change, previous[name]['queries'], result['queries']
+                )
+                regressed = change > tolerance or result['queries'] > previous[name]['queries']
+                self.stdout.write(self.style.WARNING(line) if regressed else line)
@@ -0,0 +1,96 @@
+"""
+Move the files uploaded before the content-addressed storage into it
+
+Every file of the fields of core.storage.BLOB_FIELDS still stored under its
+upload_to path is stored as a blob (identical files become one), the rows
+are repointed and the original is deleted. Refcounts are then recomputed
+from the database, which also repairs counts left wrong by bulk updates.
+
+Usage:
+    python manage.py dedupe_uploads [--dry-run] [--keep-originals] [--collect]
+"""
+import hashlib
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from core.images import IMAGE_FIELDS, delete_renditions
+from core.storage import BLOB_FIELDS, BLOB_PREFIX, CHUNK_SIZE, blob_storage, collect_blobs, recount_blobs
+from core.tasks import generate_image_renditions
+
+
+class Command(BaseCommand):
+    help = "Store the files uploaded before the deduplicated storage as blobs and recount references"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report the space that would be saved")
+        parser.add_argument('--keep-originals', action='store_true', help="Do not delete the original files")
+        parser.add_argument('--collect', action='store_true', help="Also delete the unreferenced blobs now")
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        renamed = {}
+        digests = {}
+        missing = 0
+
+        for label, field_names in BLOB_FIELDS.items():
+            model = apps.get_model(label)
+            for field_name in field_names:
+                names = (
+                    model.objects.exclude(**{f'{field_name}__isnull': True})
+                    .exclude(**{field_name: ''})
+                    .exclude(**{f'{field_name}__startswith': BLOB_PREFIX})
+                    .values_list(field_name, flat=True)
+                    .distinct()
+                )
+                for name in list(names):
+                    if not blob_storage.exists(name):
+                        missing += 1
+                        self.stdout.write(self.style.WARNING(f"Fichier introuvable : {name}"))
+                        continue
+
+                    if name not in digests:
+                        digests[name] = self._digest(name)
+                    if dry_run:
+                        continue
+
+                    if name not in renamed:
+                        with blob_storage.open(name, 'rb') as fh:
+                            renamed[name] = blob_storage.save(name, fh)
+                    model.objects.filter(**{field_name: name}).update(**{field_name: renamed[name]})
+
+                    if field_name in IMAGE_FIELDS.get(label, ()):
+                        generate_image_renditions.delay(renamed[name])
+
+        total = sum(size for _, size in digests.values())
+        distinct = sum(dict(digests.values()).values())
+        self.stdout.write(
+            f"{len(digests)} fichier(s), {len(dict(digests.values()))} contenu(s) distinct(s) : "
+            f"{total - distinct} octet(s) économisé(s) sur {total}."
+        )
+        if missing:
+            self.stdout.write(self.style.WARNING(f"{missing} fichier(s) introuvable(s) laissé(s) tels quels."))
+        if dry_run:
+            return
+
+        if not options['keep_originals']:
+            for name in renamed:
+                blob_storage.delete(name)
+                delete_renditions(name)
+
+        corrected = recount_blobs()
+        self.stdout.write(f"{corrected} compteur(s) de références corrigé(s).")
+
+        if options['collect']:
+            from datetime import timedelta
+            deleted = collect_blobs(grace=timedelta(0))
+            self.stdout.write(f"{deleted} fichier(s) non référencé(s) supprimé(s).")
+
+        self.stdout.write(self.style.SUCCESS(f"{len(renamed)} fichier(s) déplacé(s) vers le stockage dédupliqué."))
+
+    def _digest(self, name):
+        digest, size = hashlib.sha256(), 0
+        with blob_storage.open(name, 'rb') as fh:
+            for chunk in fh.chunks(CHUNK_SIZE):
+                digest.update(chunk)
+                size += len(chunk)
+        return digest.hexdigest(), size
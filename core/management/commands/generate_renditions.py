@@ -0,0 +1,43 @@
+"""
+Generate renditions for images uploaded before the pipeline existed
+
+New uploads are processed by the upload signal and pages never generate
+renditions; --force regenerates existing ones, e.g. after a change of
+RENDITION_WIDTHS or FIELD_WIDTHS.
+
+Usage:
+    python manage.py generate_renditions [--force]
+"""
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from core.images import FIELD_WIDTHS, IMAGE_FIELDS, RENDITION_WIDTHS
+from core.models import ImageRendition
+from core.tasks import generate_image_renditions
+
+
+class Command(BaseCommand):
+    help = "Schedule rendition generation for every registered image field"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate existing renditions")
+
+    def handle(self, *args, **options):
+        done = set(ImageRendition.objects.values_list('source', flat=True).distinct())
+        scheduled = 0
+
+        for label, field_names in IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            for field_name in field_names:
+                widths = list(FIELD_WIDTHS.get((label, field_name), RENDITION_WIDTHS))
+                sources = (
+                    model.objects.exclude(**{f'{field_name}__isnull': True})
+                    .exclude(**{field_name: ''})
+                    .values_list(field_name, flat=True)
+                    .distinct()
+                )
+                for source in sources.iterator():
+                    if options['force'] or source not in done:
+                        generate_image_renditions.delay(source, widths)
+                        scheduled += 1
+
+        self.stdout.write(self.style.SUCCESS(f"{scheduled} image(s) envoyée(s) au traitement."))
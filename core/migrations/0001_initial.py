@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de modification')),
+                ('source', models.CharField(db_index=True, max_length=255, verbose_name='Image source')),
+                ('source_width', models.PositiveIntegerField(verbose_name='Largeur source')),
+                ('source_height', models.PositiveIntegerField(verbose_name='Hauteur source')),
+                ('file', models.ImageField(max_length=255, upload_to='renditions/', verbose_name='Fichier')),
+                ('format', models.CharField(choices=[('JPEG', 'JPEG'), ('WEBP', 'WebP')], max_length=4, verbose_name='Format')),
+                ('width', models.PositiveIntegerField(verbose_name='Largeur')),
+                ('height', models.PositiveIntegerField(verbose_name='Hauteur')),
+            ],
+            options={
+                'verbose_name': "Déclinaison d'image",
+                'verbose_name_plural': "Déclinaisons d'images",
+                'ordering': ['source', 'format', 'width'],
+                'unique_together': {('source', 'format', 'width')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de modification')),
+                ('name', models.CharField(max_length=100, verbose_name='Export')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Paramètres')),
+                ('format', models.CharField(max_length=10, verbose_name='Format')),
+                ('status', models.CharField(choices=[('PENDING', 'En attente'), ('RUNNING', 'En cours'), ('DONE', 'Terminé'), ('FAILED', 'Échec')], default='PENDING', max_length=10, verbose_name='Statut')),
+                ('file', models.FileField(blank=True, max_length=255, upload_to='exports/', verbose_name='Fichier')),
+                ('row_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de lignes')),
+                ('error', models.TextField(blank=True, verbose_name='Erreur')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminé le')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Export en arrière-plan',
+                'verbose_name_plural': 'Exports en arrière-plan',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de modification')),
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Empreinte SHA-256')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Fichier')),
+                ('size', models.PositiveBigIntegerField(verbose_name='Taille (octets)')),
+                ('refcount', models.IntegerField(default=0, verbose_name='Références')),
+            ],
+            options={
+                'verbose_name': 'Fichier dédupliqué',
+                'verbose_name_plural': 'Fichiers dédupliqués',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
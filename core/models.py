@@ -42,3 +42,88 @@ class AuditModel(TimeStampedModel):
 
     class Meta:
         abstract = True
+
+
+class ImageRendition(TimeStampedModel):
+    """
+    A resized, EXIF-stripped copy of an uploaded image
+
+    Renditions are keyed by the storage name of the original file, so any
+    ImageField of any model can have them without a schema change.
+    """
+    FORMAT_CHOICES = [
+        ('JPEG', 'JPEG'),
+        ('WEBP', 'WebP'),
+    ]
+
+    source = models.CharField(_("Image source"), max_length=255, db_index=True)
+    source_width = models.PositiveIntegerField(_("Largeur source"))
+    source_height = models.PositiveIntegerField(_("Hauteur source"))
+    file = models.ImageField(_("Fichier"), upload_to='renditions/', max_length=255)
+    format = models.CharField(_("Format"), max_length=4, choices=FORMAT_CHOICES)
+    width = models.PositiveIntegerField(_("Largeur"))
+    height = models.PositiveIntegerField(_("Hauteur"))
+
+    class Meta:
+        verbose_name = _("Déclinaison d'image")
+        verbose_name_plural = _("Déclinaisons d'images")
+        ordering = ['source', 'format', 'width']
+        unique_together = ['source', 'format', 'width']
+
+    def __str__(self):
+        return f"{self.source} ({self.format} {self.width}x{self.height})"
+
+
+class ExportJob(TimeStampedModel):
+    """
+    An export too large to be streamed during the request, written to a
+    file by a background task
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'En attente'),
+        ('RUNNING', 'En cours'),
+        ('DONE', 'Terminé'),
+        ('FAILED', 'Échec'),
+    ]
+
+    user = models.ForeignKey(
+        'users.User',
+        on_delete=models.CASCADE,
+        related_name='export_jobs',
+        verbose_name=_("Utilisateur")
+    )
+    name = models.CharField(_("Export"), max_length=100)
+    params = models.JSONField(_("Paramètres"), default=dict, blank=True)
+    format = models.CharField(_("Format"), max_length=10)
+    status = models.CharField(_("Statut"), max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    file = models.FileField(_("Fichier"), upload_to='exports/', max_length=255, blank=True)
+    row_count = models.PositiveIntegerField(_("Nombre de lignes"), default=0)
+    error = models.TextField(_("Erreur"), blank=True)
+    completed_at = models.DateTimeField(_("Terminé le"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Export en arrière-plan")
+        verbose_name_plural = _("Exports en arrière-plan")
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.name} ({self.format}) - {self.get_status_display()}"
+
+
+class StoredBlob(TimeStampedModel):
+    """
+    An uploaded file stored once under the SHA-256 of its content (see
+    core.storage), shared by every file field that references it
+    """
+    digest = models.CharField(_("Empreinte SHA-256"), max_length=64, primary_key=True)
+    name = models.CharField(_("Fichier"), max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(_("Taille (octets)"))
+    refcount = models.IntegerField(_("Références"), default=0)
+
+    class Meta:
+        verbose_name = _("Fichier dédupliqué")
+        verbose_name_plural = _("Fichiers dédupliqués")
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
@@ -0,0 +1,109 @@
+"""
+Minimal PDF writer for tabular documents
+
+Renders the tables of a document (core.exports.Document) as monospaced text
+on landscape A4 pages, with the standard Courier font: no external library
+and no font file to embed.
+"""
+from decimal import Decimal
+
+
+PAGE_WIDTH, PAGE_HEIGHT = 842, 595  # A4 landscape, in points
+MARGIN = 36
+FONT_SIZE = 8
+LINE_HEIGHT = 10
+CHAR_WIDTH = FONT_SIZE * 0.6  # Courier advance width
+LINE_CHARS = int((PAGE_WIDTH - 2 * MARGIN) / CHAR_WIDTH)
+PAGE_LINES = int((PAGE_HEIGHT - 2 * MARGIN) / LINE_HEIGHT) - 2  # room for the footer
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (Decimal, float)):
+        return f"{value:,.0f}".replace(',', ' ')
+    return str(value)
+
+
+def _table_lines(table):
+    rows = [[_cell(value) for value in row] for row in table.rows]
+    headers = [str(header) for header in table.headers]
+    count = len(headers)
+
+    widths = [
+        max([len(headers[index])] + [len(row[index]) for row in rows if index < len(row)])
+        for index in range(count)
+    ]
+    # Shrink the columns until the table fits the page width
+    limit = max(6, LINE_CHARS // max(count, 1) - 1)
+    if sum(widths) + count - 1 > LINE_CHARS:
+        widths = [min(width, limit) for width in widths]
+
+    def line(values, numeric):
+        cells = []
+        for index, width in enumerate(widths):
+            text = values[index] if index < len(values) else ''
+            text = text[:width]
+            cells.append(text.rjust(width) if numeric and index else text.ljust(width))
+        return ' '.join(cells).rstrip()
+
+    yield table.title
+    yield line(headers, numeric=True)
+    yield '-' * min(LINE_CHARS, sum(widths) + count - 1)
+    for row in rows:
+        yield line(row, numeric=True)
+    yield ''
+
+
+def _escape(text):
+    data = text.encode('cp1252', errors='replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _page_stream(lines, footer):
+    parts = [b'BT', f'/F1 {FONT_SIZE} Tf {LINE_HEIGHT} TL'.encode(), f'{MARGIN} {PAGE_HEIGHT - MARGIN} Td'.encode()]
+    for text in lines:
+        parts.append(b'(' + _escape(text) + b') Tj T*')
+    parts.append(b'ET')
+    parts.append(f'BT /F1 {FONT_SIZE} Tf {MARGIN} {MARGIN / 2} Td'.encode() + b' (' + _escape(footer) + b') Tj ET')
+    return b'\n'.join(parts)
+
+
+def render_tables(title, tables):
+    """PDF bytes of a title followed by tables, paginated"""
+    lines = [title, '']
+    for table in tables:
+        lines.extend(_table_lines(table))
+
+    pages = [lines[index:index + PAGE_LINES] for index in range(0, len(lines), PAGE_LINES)] or [[]]
+
+    # Objects: 1 catalog, 2 page tree, 3 font, then a page and its content per page
+    objects = {
+        1: b'<< /Type /Catalog /Pages 2 0 R >>',
+        3: b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+    }
+    kids = []
+    for number, page_lines in enumerate(pages, 1):
+        page_id, content_id = 2 + 2 * number, 3 + 2 * number
+        stream = _page_stream(page_lines, f'{title} - page {number}/{len(pages)}')
+        objects[content_id] = b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream'
+        objects[page_id] = (
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] ' % (PAGE_WIDTH, PAGE_HEIGHT)
+            + b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % content_id
+        )
+        kids.append(b'%d 0 R' % page_id)
+    objects[2] = b'<< /Type /Pages /Kids [' + b' '.join(kids) + b'] /Count %d >>' % len(kids)
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(output)
+        output += b'%d 0 obj\n' % object_id + objects[object_id] + b'\nendobj\n'
+
+    xref = len(output)
+    size = max(objects) + 1
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % size
+    for object_id in range(1, size):
+        output += b'%010d 00000 n \n' % offsets[object_id]
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, xref)
+    return bytes(output)
@@ -0,0 +1,290 @@
+"""
+Per-request performance instrumentation
+
+PerformanceMiddleware measures, for every request, the total time, the
+number and duration of SQL queries, cache hits and misses and the template
+rendering time. Each request then gets:
+
+- a ``Server-Timing`` header (PERFORMANCE_SERVER_TIMING), shown by the
+  browser developer tools
+- a JSON line on the ``aesi_platform.performance`` logger
+- a sample in an in-memory histogram per URL name, read by the staff
+  "slowest views" page (core.views.performance_report)
+
+The histograms live in the process: with several workers, each one reports
+the requests it served since it started.
+
+The middleware is sync and async capable, so that it does not move the async
+views to a thread under ASGI. The measures of a request are kept in a context
+variable, which the ORM calls made through sync_to_async inherit: the SQL
+queries are counted by an execute wrapper installed on every database
+connection.
+"""
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+logger = logging.getLogger('aesi_platform.performance')
+
+# Upper bounds of the histogram buckets, in milliseconds
+BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+_current = contextvars.ContextVar('performance_recorder', default=None)
+_MISSING = object()
+
+
+class Recorder:
+    """Measures of the request being served"""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def execute(self, execute, sql, params, many, context):
+        """Database execute wrapper"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.sql_count += 1
+
+
+def _execute(execute, sql, params, many, context):
+    """Execute wrapper of every connection: counts the queries of the current request"""
+    recorder = _current.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder.execute(execute, sql, params, many, context)
+
+
+def _instrument_connection(connection, **kwargs):
+    """Install the execute wrapper on a connection (once per connection object)"""
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute)
+
+
+def _instrument_cache(backend):
+    """Count the hits and misses of the reads of a cache backend (once per instance)"""
+    if getattr(backend, '_performance_instrumented', False):
+        return
+    get, get_many = backend.get, backend.get_many
+
+    @functools.wraps(get)
+    def instrumented_get(key, default=None, version=None):
+        value = get(key, _MISSING, version=version)
+        recorder = _current.get()
+        if recorder is not None:
+            if value is _MISSING:
+                recorder.cache_misses += 1
+            else:
+                recorder.cache_hits += 1
+        return default if value is _MISSING else value
+
+    @functools.wraps(get_many)
+    def instrumented_get_many(keys, version=None):
+        keys = list(keys)
+        values = get_many(keys, version=version)
+        recorder = _current.get()
+        if recorder is not None:
+            recorder.cache_hits += len(values)
+            recorder.cache_misses += len(keys) - len(values)
+        return values
+
+    backend.get, backend.get_many = instrumented_get, instrumented_get_many
+    backend._performance_instrumented = True
+
+
+def _instrument_templates():
+    """Time the rendering of top-level templates (render(), render_to_string())"""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, '_performance_instrumented', False):
+        return
+    render = Template.render
+
+    @functools.wraps(render)
+    def instrumented_render(self, context=None, request=None):
+        recorder = _current.get()
+        if recorder is None:
+            return render(self, context, request)
+        # Templates rendered while rendering another one are already counted
+        recorder.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            recorder.template_depth -= 1
+            if not recorder.template_depth:
+                recorder.template_time += time.perf_counter() - start
+
+    instrumented_render._performance_instrumented = True
+    Template.render = instrumented_render
+
+
+class Histogram:
+    """Duration distribution of the requests of one view"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.sql_count = 0
+        self.sql_max = 0
+        self.buckets = [0] * len(BUCKETS)
+
+    def add(self, duration, sql_count):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.sql_count += sql_count
+        self.sql_max = max(self.sql_max, sql_count)
+        for index, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                self.buckets[index] += 1
+                break
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of the requests"""
+        threshold = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= threshold:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'average_ms': round(self.total / self.count, 1) if self.count else 0,
+            'p50_ms': round(self.percentile(0.5), 1),
+            'p95_ms': round(self.percentile(0.95), 1),
+            'max_ms': round(self.max, 1),
+            'average_queries': round(self.sql_count / self.count, 1) if self.count else 0,
+            'max_queries': self.sql_max,
+            'buckets': list(self.buckets),
+        }
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+_started = time.time()
+
+
+def record(view_name, duration, sql_count):
+    with _histograms_lock:
+        histogram = _histograms.get(view_name)
+        if histogram is None:
+            histogram = _histograms[view_name] = Histogram()
+        histogram.add(duration, sql_count)
+
+
+def slowest_views(order_by='p95_ms', limit=None):
+    """Summary of each view of this process, slowest first"""
+    with _histograms_lock:
+        views = [dict(histogram.summary(), view=name) for name, histogram in _histograms.items()]
+    views.sort(key=lambda view: view[order_by], reverse=True)
+    return views[:limit] if limit else views
+
+
+def reset():
+    global _started
+    with _histograms_lock:
+        _histograms.clear()
+        _started = time.time()
+
+
+def started():
+    """Timestamp of the first request counted by the histograms"""
+    return _started
+
+
+def server_timing(recorder, duration):
+    """Value of the Server-Timing header"""
+    return ', '.join([
+        f'sql;dur={recorder.sql_time * 1000:.1f};desc="{recorder.sql_count} queries"',
+        f'cache;desc="{recorder.cache_hits} hits, {recorder.cache_misses} misses"',
+        f'tpl;dur={recorder.template_time * 1000:.1f}',
+        f'total;dur={duration:.1f}',
+    ])
+
+
+class PerformanceMiddleware:
+    """Collects the measures of each request (see module docstring)"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'PERFORMANCE_SERVER_TIMING', False)
+        _instrument_templates()
+        # Connections opened later (other threads) and the ones already open
+        connection_created.connect(_instrument_connection, dispatch_uid='performance_execute_wrapper')
+        for connection in connections.all(initialized_only=True):
+            _instrument_connection(connection)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder, token, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        recorder, token, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, recorder, start)
+
+    def _start(self):
+        recorder = Recorder()
+        token = _current.set(recorder)
+        for alias in settings.CACHES:
+            _instrument_cache(caches[alias])
+        return recorder, token, time.perf_counter()
+
+    def _finish(self, request, response, recorder, start):
+        duration = (time.perf_counter() - start) * 1000
+
+        match = request.resolver_match
+        view_name = match.view_name if match else '<non résolu>'
+        record(view_name, duration, recorder.sql_count)
+
+        if self.server_timing:
+            response['Server-Timing'] = server_timing(recorder, duration)
+
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'duration_ms': round(duration, 1),
+            'sql_count': recorder.sql_count,
+            'sql_ms': round(recorder.sql_time * 1000, 1),
+            'cache_hits': recorder.cache_hits,
+            'cache_misses': recorder.cache_misses,
+            'template_ms': round(recorder.template_time * 1000, 1),
+        }))
+        return response
@@ -9,7 +9,8 @@ class IsClubExecutive(permissions.BasePermission):
     Permission to check if user is an executive member of a club
     """
     def has_permission(self, request, view):
-        return request.user.is_authenticated and hasattr(request.user, 'club_member')
+        # get_user_club_id() is memoized, or comes with the JWT snapshot
+        return request.user.is_authenticated and request.user.get_user_club_id() is not None
 
     def has_object_permission(self, request, view, obj):
         # Read permissions are allowed for any authenticated user
@@ -17,7 +18,7 @@ class IsClubExecutive(permissions.BasePermission):
             return True
         
         # Write permissions only for club executives
-        return hasattr(request.user, 'club_member') and request.user.club_member.club == obj
+        return request.user.get_user_club_id() == obj.pk
 
 
 class IsAESIExecutive(permissions.BasePermission):
@@ -0,0 +1,133 @@
+"""
+Lightweight publish/subscribe for live pages (server-sent events)
+
+Publishers are ordinary sync code (views, signal handlers); subscribers are
+async views holding an SSE connection. Two backends:
+
+- 'memory' (default): in-process broker, enough for a single ASGI process
+  and for development
+- 'redis': Redis PUBSUB, required as soon as several processes serve the
+  platform (PUBSUB_REDIS_URL)
+
+Messages are JSON-serializable dicts.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+
+class Subscription:
+    """Messages of one channel for one subscriber (in-process broker)"""
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    async def get(self, timeout):
+        """Next message, or None if nothing arrived within timeout seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker._unsubscribe(self)
+
+
+class InProcessBroker:
+    """Fan-out to the subscribers of the current process"""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        # Publishers may run in another thread than the subscribers' loop
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.queue.put_nowait, message)
+        return len(subscribers)
+
+    async def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+
+class RedisSubscription:
+    """Messages of one channel for one subscriber (Redis broker)"""
+
+    def __init__(self, client, pubsub):
+        self.client = client
+        self.pubsub = pubsub
+
+    async def get(self, timeout):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message['data'])
+
+    async def close(self):
+        await self.pubsub.unsubscribe()
+        await self.pubsub.close()
+        await self.client.close()
+
+
+class RedisBroker:
+    """Redis PUBSUB, shared by every process"""
+
+    def __init__(self, url):
+        import redis
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self, channel, message):
+        return self._client.publish(channel, json.dumps(message, default=str))
+
+    async def subscribe(self, channel):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(channel)
+        return RedisSubscription(client, pubsub)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            if settings.PUBSUB_BACKEND == 'redis':
+                _broker = RedisBroker(settings.PUBSUB_REDIS_URL)
+            else:
+                _broker = InProcessBroker()
+        return _broker
+
+
+def publish(channel, message):
+    """Send a message to the current subscribers of a channel"""
+    return get_broker().publish(channel, message)
+
+
+async def subscribe(channel):
+    """Subscribe to a channel; returns an object with async get(timeout) and close()"""
+    return await get_broker().subscribe(channel)
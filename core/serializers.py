@@ -0,0 +1,47 @@
+"""
+Shared serializer fields
+"""
+from rest_framework import serializers
+from .images import get_renditions
+
+
+class ImageRenditionsField(serializers.ReadOnlyField):
+    """
+    Read-only representation of an image field with its renditions, so API
+    clients can pick the smallest suitable file:
+
+        {"url": ..., "srcset": "... 160w, ... 320w", "webp_srcset": ...,
+         "renditions": [{"format", "width", "height", "url"}, ...]}
+    """
+
+    def to_representation(self, image):
+        if not image:
+            return None
+
+        request = self.context.get('request')
+
+        def absolute(url):
+            return request.build_absolute_uri(url) if request else url
+
+        renditions = [
+            {
+                'format': item['format'],
+                'width': item['width'],
+                'height': item['height'],
+                'url': absolute(item['url']),
+            }
+            for item in get_renditions(image.name)
+        ]
+
+        def srcset(image_format):
+            return ', '.join(
+                f"{item['url']} {item['width']}w"
+                for item in renditions if item['format'] == image_format
+            )
+
+        return {
+            'url': absolute(image.url),
+            'srcset': srcset('JPEG'),
+            'webp_srcset': srcset('WEBP'),
+            'renditions': renditions,
+        }
@@ -0,0 +1,91 @@
+"""
+Signal handlers for core app
+"""
+from django.apps import apps
+from django.db.models.signals import pre_save, post_save, post_delete
+from .images import IMAGE_FIELDS, delete_renditions, rendition_widths, schedule_renditions
+from .models import ImageRendition
+from .storage import BLOB_FIELDS, acquire, is_blob, release
+
+
+def schedule_image_renditions(sender, instance, update_fields=None, **kwargs):
+    """Generate renditions off-request for newly uploaded images"""
+    previous = getattr(instance, '_stored_file_names', {})
+    for field_name in IMAGE_FIELDS[sender._meta.label]:
+        if update_fields is not None and field_name not in update_fields:
+            continue
+
+        image = getattr(instance, field_name)
+        if not image or image.name == (previous.get(field_name) or ''):
+            continue
+        # A deduplicated blob may already have its renditions
+        if not ImageRendition.objects.filter(source=image.name).exists():
+            schedule_renditions(image.name, rendition_widths(image))
+
+
+def remove_image_renditions(sender, instance, **kwargs):
+    """Drop the renditions of the images of a deleted object"""
+    for field_name in IMAGE_FIELDS[sender._meta.label]:
+        image = getattr(instance, field_name)
+        # Renditions of a shared blob are dropped with the blob (core.storage.collect_blobs)
+        if image and not is_blob(image.name):
+            delete_renditions(image.name)
+
+
+def _file_fields(model):
+    """File fields of a model with blob references or renditions"""
+    label = model._meta.label
+    return tuple(dict.fromkeys(BLOB_FIELDS.get(label, ()) + IMAGE_FIELDS.get(label, ())))
+
+
+def remember_file_names(sender, instance, update_fields=None, **kwargs):
+    """Keep the stored file names of an object before it is saved"""
+    field_names = _file_fields(sender)
+    instance._stored_file_names = {}
+    if instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None:
+        field_names = [field_name for field_name in field_names if field_name in update_fields]
+        if not field_names:
+            return
+    instance._stored_file_names = sender.objects.filter(pk=instance.pk).values(*field_names).first() or {}
+
+
+def count_blob_references(sender, instance, update_fields=None, **kwargs):
+    """Move the blob references of the fields whose file changed"""
+    previous = getattr(instance, '_stored_file_names', {})
+    for field_name in BLOB_FIELDS[sender._meta.label]:
+        if update_fields is not None and field_name not in update_fields:
+            continue
+
+        old, new = previous.get(field_name) or '', getattr(instance, field_name).name or ''
+        if old == new:
+            continue
+        if is_blob(new):
+            acquire(new)
+        if is_blob(old):
+            release(old)
+
+
+def release_blob_references(sender, instance, **kwargs):
+    """Drop the blob references of a deleted object"""
+    for field_name in BLOB_FIELDS[sender._meta.label]:
+        name = getattr(instance, field_name).name
+        if is_blob(name):
+            release(name)
+
+
+def connect_blob_signals():
+    for label in BLOB_FIELDS:
+        model = apps.get_model(label)
+        pre_save.connect(remember_file_names, sender=model, dispatch_uid=f'files_pre_save_{label}')
+        post_save.connect(count_blob_references, sender=model, dispatch_uid=f'blobs_save_{label}')
+        post_delete.connect(release_blob_references, sender=model, dispatch_uid=f'blobs_delete_{label}')
+
+
+def connect_image_signals():
+    for label in IMAGE_FIELDS:
+        model = apps.get_model(label)
+        pre_save.connect(remember_file_names, sender=model, dispatch_uid=f'files_pre_save_{label}')
+        post_save.connect(schedule_image_renditions, sender=model, dispatch_uid=f'renditions_save_{label}')
+        post_delete.connect(remove_image_renditions, sender=model, dispatch_uid=f'renditions_delete_{label}')
@@ -0,0 +1,247 @@
+"""
+Content-addressed storage for uploaded files
+
+Uploads are hashed (SHA-256) while they are streamed to a temporary file,
+then stored once under blobs/<2 hex>/<digest><extension>: the same receipt or
+photo uploaded by several executives takes the disk space of one file.
+
+Each StoredBlob row counts the file fields referencing its file (kept up to
+date by core.signals). A blob nobody references any more is only removed by
+collect_blobs() after a grace period, so an upload whose model save is still
+running, or was rolled back, never loses its file.
+
+A blob never changes once written, so it is served with immutable (private)
+cache headers by core.views.serve_blob, which checks the access rules of
+PRIVATE_BLOB_FIELDS (also applied to the image renditions of the blob, see
+core.views.serve_blob_rendition). Files saved before this storage keep their
+upload_to names and their MEDIA_URL.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import Count, F
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+
+BLOB_PREFIX = 'blobs/'
+TMP_DIRECTORY = 'blobs/tmp'
+CHUNK_SIZE = 64 * 1024
+
+# Name of a blob relative to BLOB_PREFIX (also validates served paths)
+BLOB_NAME_RE = re.compile(r'^[0-9a-f]{2}/([0-9a-f]{64})(\.[a-z0-9]{1,10})?$')
+
+# File fields stored in the blob storage, by model label
+BLOB_FIELDS = {
+    'finances.Transaction': ('receipt',),
+    'clubs.ActivityResource': ('file',),
+    'clubs.ActivityPhoto': ('image',),
+    'participation.Participation': ('photo1', 'photo2', 'photo3'),
+}
+
+
+def _can_view_receipt(user, transaction):
+    return user.can_view_finances(transaction.club)
+
+
+def _can_view_participation_photo(user, participation):
+    return True
+
+
+# Fields whose files are only served to logged-in users (core.views.serve_blob), by
+# model label: the field names and the check of the user against a referencing object
+PRIVATE_BLOB_FIELDS = {
+    'finances.Transaction': (('receipt',), _can_view_receipt),
+    'participation.Participation': (('photo1', 'photo2', 'photo3'), _can_view_participation_photo),
+}
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+def blob_name(digest, original_name=''):
+    """Storage name of a content; the extension of the upload is kept for content types"""
+    extension = os.path.splitext(original_name or '')[1].lower()
+    if not re.fullmatch(r'\.[a-z0-9]{1,10}', extension):
+        extension = ''
+    return f'{BLOB_PREFIX}{digest[:2]}/{digest}{extension}'
+
+
+@deconstructible
+class BlobStorage(FileSystemStorage):
+    """
+    FileSystemStorage writing each distinct content once, under its digest
+
+    The name passed to save() only provides the extension. delete() leaves
+    blobs alone: other fields may share them, see collect_blobs().
+    """
+
+    def save(self, name, content, max_length=None):
+        from .models import StoredBlob
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        directory = self.path(TMP_DIRECTORY)
+        os.makedirs(directory, exist_ok=True)
+        digest, size = hashlib.sha256(), 0
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as tmp:
+            try:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            except BaseException:
+                os.unlink(tmp.name)
+                raise
+        digest = digest.hexdigest()
+
+        try:
+            # The row lock serializes this save with a collect_blobs() of the same content
+            with transaction.atomic():
+                blob, created = StoredBlob.objects.select_for_update().get_or_create(
+                    digest=digest,
+                    defaults={'name': blob_name(digest, name), 'size': size}
+                )
+                if not created:
+                    # Restarts the grace period of an unreferenced blob
+                    StoredBlob.objects.filter(pk=digest).update(updated_at=timezone.now())
+
+                path = self.path(blob.name)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp.name, path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(path, self.file_permissions_mode)
+        finally:
+            if os.path.exists(tmp.name):
+                os.unlink(tmp.name)
+
+        return blob.name
+
+    def delete(self, name):
+        if not is_blob(name):
+            super().delete(name)
+
+    def url(self, name):
+        if is_blob(name):
+            return reverse('core:serve_blob', args=[name[len(BLOB_PREFIX):]])
+        return super().url(name)
+
+
+blob_storage = BlobStorage()
+
+
+def acquire(name):
+    """Count a new reference to a blob"""
+    from .models import StoredBlob
+
+    StoredBlob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+
+def release(name):
+    """Drop a reference to a blob (the file is removed later by collect_blobs)"""
+    from .models import StoredBlob
+
+    StoredBlob.objects.filter(name=name).update(refcount=F('refcount') - 1, updated_at=timezone.now())
+
+
+def can_read_blob(user, name):
+    """
+    Whether a user may download a blob: a blob of PRIVATE_BLOB_FIELDS needs a
+    logged-in user allowed to see one of the objects referencing it (one query
+    per model)
+    """
+    from django.apps import apps
+    from django.db.models import Q
+
+    private = False
+    for label, (field_names, can_view) in PRIVATE_BLOB_FIELDS.items():
+        condition = Q()
+        for field_name in field_names:
+            condition |= Q(**{field_name: name})
+        for instance in apps.get_model(label).objects.filter(condition):
+            if user.is_authenticated and can_view(user, instance):
+                return True
+            private = True
+    return not private
+
+
+def count_references():
+    """Number of file fields referencing each blob name, from the database"""
+    from django.apps import apps
+
+    counts = Counter()
+    for label, field_names in BLOB_FIELDS.items():
+        model = apps.get_model(label)
+        for field_name in field_names:
+            rows = (
+                model.objects.filter(**{f'{field_name}__startswith': BLOB_PREFIX})
+                .values(field_name)
+                .annotate(references=Count('pk'))
+                .order_by()
+            )
+            for row in rows:
+                counts[row[field_name]] += row['references']
+    return counts
+
+
+def recount_blobs():
+    """Reset every refcount from the actual references; returns the number corrected"""
+    from .models import StoredBlob
+
+    counts = count_references()
+    corrected = 0
+    for blob in StoredBlob.objects.only('digest', 'name', 'refcount').iterator():
+        if blob.refcount != counts.get(blob.name, 0):
+            StoredBlob.objects.filter(pk=blob.pk).update(refcount=counts.get(blob.name, 0), updated_at=timezone.now())
+            corrected += 1
+    return corrected
+
+
+def collect_blobs(grace=None):
+    """
+    Delete the blobs unreferenced for longer than the grace period (rows,
+    files and image renditions) and stale temporary files; returns the number
+    of blobs deleted
+    """
+    from .images import delete_renditions
+    from .models import StoredBlob
+
+    grace = grace if grace is not None else timedelta(hours=settings.BLOB_GRACE_HOURS)
+    limit = timezone.now() - grace
+
+    deleted = 0
+    candidates = StoredBlob.objects.filter(refcount__lte=0, updated_at__lt=limit)
+    for digest in list(candidates.values_list('digest', flat=True)):
+        with transaction.atomic():
+            blob = candidates.select_for_update().filter(pk=digest).first()
+            if blob is None:
+                continue
+            blob.delete()
+            # Inside the transaction: a concurrent save() of the same content waits for it
+            FileSystemStorage.delete(blob_storage, blob.name)
+        delete_renditions(blob.name)
+        deleted += 1
+
+    # Temporary files of interrupted uploads
+    directory = blob_storage.path(TMP_DIRECTORY)
+    if os.path.isdir(directory):
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.stat().st_mtime < time.time() - grace.total_seconds():
+                os.unlink(entry.path)
+
+    return deleted
@@ -0,0 +1,123 @@
+"""
+Background tasks for core app
+"""
+from django.utils import timezone
+from .background import shared_task
+
+
+@shared_task(ignore_result=True)
+def clear_expired_sessions(batch_size=1000):
+    """
+    Delete expired database sessions in small batches
+
+    Sessions are written through to the database (cached_db engine), so the
+    table grows until expired rows are purged. Deleting by batches of primary
+    keys keeps each statement short and avoids locking the whole table.
+    """
+    from django.contrib.sessions.models import Session
+
+    now = timezone.now()
+    deleted = 0
+
+    while True:
+        keys = list(
+            Session.objects.filter(expire_date__lt=now).values_list('pk', flat=True)[:batch_size]
+        )
+        if not keys:
+            break
+        deleted += Session.objects.filter(pk__in=keys).delete()[0]
+
+    return deleted
+
+
+@shared_task(ignore_result=True)
+def generate_image_renditions(source, widths=None):
+    """
+    Generate resized JPEG/WebP renditions of an uploaded image
+
+    Without Celery this runs in the upload request: an unreadable image is
+    logged and keeps being served as the original instead of failing it.
+    """
+    from django.core.files.storage import default_storage
+    from PIL import Image
+    from .images import RENDITION_WIDTHS, generate_renditions, logger
+
+    if not default_storage.exists(source):
+        return
+    try:
+        generate_renditions(source, tuple(widths or RENDITION_WIDTHS))
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        # UnidentifiedImageError is an OSError
+        logger.warning("Renditions impossibles pour %s : %s", source, exc)
+
+
+@shared_task(ignore_result=True)
+def run_export_job(job_id):
+    """
+    Write a large export or a document to a file (see core.exports)
+    """
+    import tempfile
+    import uuid
+    from django.core.files import File
+    from .exports import DOCUMENTS, get_export, stream_export, stream_document, export_filename
+    from .models import ExportJob
+
+    job = ExportJob.objects.get(pk=job_id)
+    job.status = 'RUNNING'
+    job.save(update_fields=['status', 'updated_at'])
+
+    try:
+        if job.name in DOCUMENTS:
+            definition = DOCUMENTS[job.name](job.params)
+            chunks = stream_document(definition, job.format)
+        else:
+            definition = get_export(job.name, job.params)
+            chunks = stream_export(definition, job.format)
+        with tempfile.TemporaryFile() as tmp:
+            for chunk in chunks:
+                tmp.write(chunk)
+            tmp.seek(0)
+            # Random prefix: the file must not be guessable from the media URL
+            name = f"{uuid.uuid4().hex}_{export_filename(definition, job.format)}"
+            job.file.save(name, File(tmp), save=False)
+        if job.name in DOCUMENTS:
+            job.row_count = sum(len(table.rows) for table in definition.tables)
+        else:
+            job.row_count = definition.queryset.count()
+        job.status = 'DONE'
+    except Exception as exc:
+        job.status = 'FAILED'
+        job.error = str(exc)
+        raise
+    finally:
+        job.completed_at = timezone.now()
+        job.save()
+
+
+@shared_task(ignore_result=True)
+def purge_export_jobs(days=None):
+    """
+    Delete export jobs (and their files) older than EXPORT_RETENTION_DAYS
+    """
+    from datetime import timedelta
+    from django.conf import settings
+    from .models import ExportJob
+
+    limit = timezone.now() - timedelta(days=days or settings.EXPORT_RETENTION_DAYS)
+    deleted = 0
+    for job in ExportJob.objects.filter(created_at__lt=limit).iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        deleted += 1
+    return deleted
+
+
+@shared_task(ignore_result=True)
+def collect_unreferenced_blobs():
+    """
+    Delete the deduplicated uploads no file field references any more
+    """
+    from .storage import collect_blobs
+
+    return collect_blobs()
@@ -0,0 +1,71 @@
+"""
+Template tags for responsive images (renditions + srcset)
+
+Usage:
+    {% load image_tags %}
+    <img src="{{ photo.image|rendition_url:320 }}"
+         srcset="{% srcset photo.image %}" sizes="(min-width: 1024px) 25vw, 50vw">
+
+    {% responsive_img activity.cover_image 640 alt=activity.title css_class="w-full" %}
+    {% responsive_img user.profile_picture 40 css_class="h-10 w-10 rounded-full object-cover" %}
+"""
+from django import template
+from django.utils.html import format_html
+from core.images import build_srcset, pick_rendition
+
+register = template.Library()
+
+
+def _original_url(image):
+    try:
+        return image.url
+    except ValueError:
+        return ''
+
+
+@register.filter
+def rendition_url(image, width):
+    """URL of the smallest JPEG rendition at least ``width`` px wide (falls back to the original)"""
+    if not image:
+        return ''
+    rendition = pick_rendition(image.name, int(width))
+    return rendition['url'] if rendition else _original_url(image)
+
+
+@register.simple_tag
+def srcset(image, image_format='JPEG'):
+    """srcset attribute value for an image field"""
+    if not image:
+        return ''
+    return build_srcset(image.name, image_format.upper())
+
+
+@register.simple_tag
+def responsive_img(image, width, alt='', css_class='', sizes=None, loading='lazy'):
+    """
+    <picture> element serving WebP when supported, JPEG otherwise, and
+    letting the browser pick the smallest rendition for ``width`` CSS px
+    """
+    if not image:
+        return ''
+
+    width = int(width)
+    sizes = sizes or f'{width}px'
+    fallback = pick_rendition(image.name, width)
+
+    if fallback is None:
+        # Renditions not generated yet: serve the original
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}">',
+            _original_url(image), alt, css_class, loading
+        )
+
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" loading="{}" decoding="async">'
+        '</picture>',
+        build_srcset(image.name, 'WEBP'), sizes,
+        fallback['url'], build_srcset(image.name, 'JPEG'), sizes,
+        fallback['width'], fallback['height'], alt, css_class, loading
+    )
@@ -1,3 +1,266 @@
-from django.test import TestCase
+import datetime
+import os
+import re
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from clubs.models import Activity, Club, ClubMember
+from finances.models import Transaction
+from participation.models import Participation
+from users.models import User
+from . import benchmarks, performance
+from .exports import Table
+from .images import _pending_key, generate_renditions, get_renditions
+from .models import StoredBlob
+from .performance import PerformanceMiddleware
+from .pdf import render_tables
+from .storage import blob_storage, collect_blobs
+from .tasks import generate_image_renditions
+from .views import _byte_range
+
+
+@override_settings(PERFORMANCE_SERVER_TIMING=True)
+class PerformanceMiddlewareTests(TestCase):
+    """Each request is timed in a Server-Timing header and in the per-view histograms"""
+
+    def test_server_timing_and_slowest_views(self):
+        performance.reset()
+        response = self.client.get('/about/')
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        for metric in ('sql;', 'cache;', 'tpl;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+
+        [view] = performance.slowest_views()
+        self.assertEqual((view['view'], view['count']), ('core:about', 1))
+
+        staff = User.objects.create_user(email='staff@example.com', password='secret', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/performance/')
+        self.assertContains(response, 'core:about')
+
+    def test_async_requests(self):
+        async def get_response(request):
+            await sync_to_async(User.objects.count)()
+            return HttpResponse()
+
+        middleware = PerformanceMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+
+class QueryBudgetTests(TestCase):
+    """Every benchmarked view answers within its query budget (see core.benchmarks)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = benchmarks.seed(1)
+
+    def test_query_budgets(self):
+        for scenario in benchmarks.SCENARIOS:
+            with self.subTest(scenario.name):
+                result = benchmarks.measure(scenario, self.dataset, repeat=1)
+                self.assertLess(max(result['statuses']), 400)
+                self.assertLessEqual(result['queries'], scenario.budget)
+
+
+class PDFTests(TestCase):
+    """The generated PDF is well formed: objects at their xref offsets, exact stream lengths"""
+
+    def test_structure(self):
+        rows = [[f'Ligne {index} (été)', Decimal('1234.50')] for index in range(150)]
+        pdf = render_tables('Rapport', [Table('Dépenses', ['Libellé', 'Montant'], rows)])
+
+        self.assertTrue(pdf.startswith(b'%PDF-1.4'))
+        self.assertTrue(pdf.endswith(b'%%EOF\n'))
+        startxref = int(re.search(rb'startxref\n(\d+)\n', pdf).group(1))
+        self.assertTrue(pdf[startxref:].startswith(b'xref\n'))
+
+        size = int(re.search(rb'/Size (\d+)', pdf).group(1))
+        offsets = re.findall(rb'(\d{10}) 00000 n ', pdf[startxref:])
+        self.assertEqual(len(offsets), size - 1)
+        for object_id, offset in enumerate(offsets, 1):
+            self.assertTrue(pdf[int(offset):].startswith(b'%d 0 obj\n' % object_id))
+
+        streams = re.findall(rb'<< /Length (\d+) >>\nstream\n', pdf)
+        self.assertEqual(int(re.search(rb'/Count (\d+)', pdf).group(1)), len(streams))
+        self.assertGreater(len(streams), 1)
+        for match in re.finditer(rb'<< /Length (\d+) >>\nstream\n', pdf):
+            end = match.end() + int(match.group(1))
+            self.assertEqual(pdf[end:end + len(b'\nendstream')], b'\nendstream')
+
+
+class BlobStorageTests(TestCase):
+    """Blob reference counts follow the file fields, collect_blobs removes unreferenced blobs"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.club = Club.objects.create(name='Club Test', slug='club-test', type='SPORT', description='Test')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def transaction(self, content):
+        expense = Transaction(
+            club=self.club, transaction_type='EXPENSE', amount=Decimal('10.00'), description='Test',
+            category='Test', transaction_date=datetime.date(2025, 3, 1)
+        )
+        expense.receipt.save('recu.pdf', ContentFile(content), save=False)
+        expense.save()
+        return expense
+
+    def refcount(self, content):
+        return StoredBlob.objects.get(size=len(content)).refcount
+
+    def test_refcounts(self):
+        first = self.transaction(b'recu A')
+        second = self.transaction(b'recu A')
+        self.assertEqual(StoredBlob.objects.count(), 1)
+        self.assertEqual(self.refcount(b'recu A'), 2)
+
+        # Replaced file: the old blob loses a reference, the new one gains one
+        first.receipt.save('recu.pdf', ContentFile(b'recu BB'))
+        self.assertEqual((self.refcount(b'recu A'), self.refcount(b'recu BB')), (1, 1))
+
+        second.delete()
+        self.assertEqual(self.refcount(b'recu A'), 0)
+
+        # A rolled back save leaves the count unchanged
+        try:
+            with transaction.atomic():
+                self.transaction(b'recu BB')
+                self.assertEqual(self.refcount(b'recu BB'), 2)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(self.refcount(b'recu BB'), 1)
+
+    def test_collect_blobs(self):
+        kept = self.transaction(b'recu A')
+        dropped = self.transaction(b'recu BB')
+        name = dropped.receipt.name
+        dropped.delete()
+
+        # Within the grace period
+        self.assertEqual(collect_blobs(grace=datetime.timedelta(hours=1)), 0)
+
+        StoredBlob.objects.update(updated_at=timezone.now() - datetime.timedelta(hours=2))
+        self.assertEqual(collect_blobs(grace=datetime.timedelta(hours=1)), 1)
+        self.assertFalse(os.path.exists(blob_storage.path(name)))
+        self.assertTrue(os.path.exists(blob_storage.path(kept.receipt.name)))
+        self.assertEqual(list(StoredBlob.objects.values_list('name', flat=True)), [kept.receipt.name])
+
+    def test_serve_receipt(self):
+        expense = self.transaction(b'0123456789')
+        url = expense.receipt.url
+
+        self.assertEqual(self.client.get(url, HTTP_HOST='localhost').status_code, 302)
+
+        # Students and the executives of other clubs cannot see the finances of the club
+        self.client.force_login(User.objects.create_user(email='etudiant@example.com', password='secret'))
+        self.assertEqual(self.client.get(url, HTTP_HOST='localhost').status_code, 403)
+        other = Club.objects.create(name='Autre club', slug='autre-club', type='ANGLAIS', description='Test')
+        executive = User.objects.create_user(email='membre@example.com', password='secret', role='CLUB_EXECUTIVE')
+        ClubMember.objects.create(club=other, user=executive, position='TREASURER', start_date=datetime.date(2025, 1, 1))
+        self.client.force_login(executive)
+        self.assertEqual(self.client.get(url, HTTP_HOST='localhost').status_code, 403)
+
+        self.client.force_login(User.objects.create_user(
+            email='tresorier@example.com', password='secret', role='AESI_TREASURER'
+        ))
+        response = self.client.get(url, HTTP_HOST='localhost', HTTP_RANGE='bytes=-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'6789')
+        self.assertTrue(response['Cache-Control'].startswith('private'))
+
+        # If-Range with another validator: the whole file
+        response = self.client.get(url, HTTP_HOST='localhost', HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"autre"')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_HOST='localhost', HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=response['ETag'])
+        self.assertEqual(response.status_code, 206)
+
+        response = self.client.get(url, HTTP_HOST='localhost', HTTP_RANGE='bytes=10-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */10'))
+
+    def test_serve_private_rendition(self):
+        from PIL import Image
+
+        image = BytesIO()
+        Image.new('RGB', (200, 100), 'red').save(image, format='JPEG')
+        student = User.objects.create_user(email='etudiant@example.com', password='secret')
+        activity = Activity.objects.create(
+            club=self.club, title='Sortie', description='Test', date=datetime.date(2025, 3, 1), location='Campus'
+        )
+        participation = Participation(activity=activity, user=student)
+        participation.photo1.save('photo.jpg', ContentFile(image.getvalue()), save=False)
+        participation.save()
+        generate_renditions(participation.photo1.name, [80])
+
+        [jpeg, webp] = get_renditions(participation.photo1.name)
+        self.assertTrue(jpeg['url'].startswith('/files/renditions/'))
+        self.assertEqual(self.client.get(jpeg['url'], HTTP_HOST='localhost').status_code, 302)
+        self.client.force_login(student)
+        response = self.client.get(jpeg['url'], HTTP_HOST='localhost')
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/jpeg'))
+        self.assertEqual(self.client.get('/files/renditions/00/inconnu.jpg', HTTP_HOST='localhost').status_code, 404)
+
+    def test_byte_range(self):
+        self.assertEqual(_byte_range('bytes=-4', 10), (6, 9))
+        self.assertEqual(_byte_range('bytes=-40', 10), (0, 9))
+        self.assertEqual(_byte_range('bytes=2-', 10), (2, 9))
+        self.assertEqual(_byte_range('bytes=2-400', 10), (2, 9))
+        self.assertIs(_byte_range('bytes=10-', 10), False)
+        self.assertIs(_byte_range('bytes=5-2', 10), False)
+        self.assertIs(_byte_range('bytes=0-', 0), False)
+        self.assertIsNone(_byte_range('bytes=-', 10))
+        self.assertIsNone(_byte_range('bytes=0-1,4-5', 10))
+        self.assertIsNone(_byte_range('items=0-1', 10))
+
+
+class ImageRenditionTests(TestCase):
+    """Pages never generate renditions; unreadable uploads are logged, not raised"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_scheduled_when_the_image_changes(self):
+        club = Club.objects.create(name='Club Test', slug='club-test', type='SPORT', description='Test')
+        club.logo.save('logo.png', ContentFile(b'logo'), save=False)
+        club.save()
+        self.assertTrue(cache.get(_pending_key(club.logo.name)))
+
+        cache.clear()
+        # Stored names read before the save, no rendition lookup
+        with self.assertNumQueries(2):
+            club.description = 'Autre description'
+            club.save()
+        self.assertIsNone(cache.get(_pending_key(club.logo.name)))
+
+    def test_unreadable_image(self):
+        source = default_storage.save('photos/pas-une-image.jpg', ContentFile(b'pas une image'))
+
+        with self.assertLogs('aesi_platform.images', 'WARNING'):
+            generate_image_renditions(source)
+
+        cache.clear()
+        self.assertEqual(get_renditions(source), [])
+        self.assertIsNone(cache.get(_pending_key(source)))
@@ -12,4 +12,9 @@ urlpatterns = [
     path('guide/', views.user_guide, name='user_guide'),
     path('style-guide/', views.style_guide, name='style_guide'),
     path('mobile-test/', views.mobile_test, name='mobile_test'),
+    path('performance/', views.performance_report, name='performance_report'),
+    path('exports/<int:pk>/', views.export_status, name='export_status'),
+    path('exports/<int:pk>/download/', views.export_download, name='export_download'),
+    path('files/renditions/<path:name>', views.serve_blob_rendition, name='serve_blob_rendition'),
+    path('files/<path:name>', views.serve_blob, name='serve_blob'),
 ]
@@ -3,6 +3,8 @@ Core utility functions
 """
 import random
 import string
+import time
+from django.core import signing
 from django.core.cache import cache
 from django.core.mail import send_mail
 from django.conf import settings
@@ -43,6 +45,20 @@ def verify_otp(activity_id, otp_code):
     cache_key = f'otp_activity_{activity_id}'
     stored_otp = cache.get(cache_key)
     
+    return _check_otp(stored_otp, otp_code)
+
+
+async def averify_otp(activity_id, otp_code):
+    """
+    Async version of verify_otp (for ASGI views)
+    """
+    cache_key = f'otp_activity_{activity_id}'
+    stored_otp = await cache.aget(cache_key)
+    
+    return _check_otp(stored_otp, otp_code)
+
+
+def _check_otp(stored_otp, otp_code):
     if stored_otp is None:
         return False, "Code OTP expiré ou invalide"
     
@@ -74,6 +90,161 @@ def get_otp_expiry(activity_id):
     return None
 
 
+async def aget_otp_expiry(activity_id):
+    """
+    Async version of get_otp_expiry (for ASGI views)
+    """
+    expiry_key = f'otp_expiry_{activity_id}'
+    expiry_str = await cache.aget(expiry_key)
+    
+    if expiry_str:
+        return datetime.fromisoformat(expiry_str)
+    return None
+
+
+OTP_FLAG_SALT = 'participation.otp_verified'
+
+
+def _otp_flag_name(activity_id):
+    return f'otp_verified_{activity_id}'
+
+
+def _otp_flag_value(request, activity_id):
+    # Bound to the user: a flag copied to another browser or left behind
+    # after a logout is worthless for anybody else
+    return f'{request.user.pk}:{activity_id}'
+
+
+def mark_otp_verified(request, response, activity_id, max_age=None):
+    """
+    Remember that the user entered a valid OTP for the activity
+
+    With OTP_FLAG_STORAGE = 'cookie' the flag is a signed cookie, so any
+    worker can check it without a session lookup. max_age (seconds) caps
+    its lifetime below OTP_VALIDITY_MINUTES.
+    """
+    name = _otp_flag_name(activity_id)
+    validity = settings.OTP_VALIDITY_MINUTES * 60
+    if max_age is not None:
+        validity = max(0, min(int(max_age), validity))
+
+    if settings.OTP_FLAG_STORAGE == 'cookie':
+        response.set_signed_cookie(
+            name,
+            _otp_flag_value(request, activity_id),
+            salt=OTP_FLAG_SALT,
+            max_age=validity,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite='Lax',
+        )
+    else:
+        # Expiry timestamp of the flag
+        request.session[name] = int(time.time()) + validity
+
+    return response
+
+
+def is_otp_verified(request, activity_id):
+    """
+    Check whether the user has verified the OTP for the activity
+    """
+    name = _otp_flag_name(activity_id)
+
+    if settings.OTP_FLAG_STORAGE == 'cookie':
+        if not request.user.is_authenticated:
+            return False
+        value = request.get_signed_cookie(
+            name,
+            default=None,
+            salt=OTP_FLAG_SALT,
+            max_age=settings.OTP_VALIDITY_MINUTES * 60,
+        )
+        return value == _otp_flag_value(request, activity_id)
+
+    expires_at = request.session.get(name)
+    # True: flag stored before expiry timestamps were kept
+    return expires_at is True or (bool(expires_at) and expires_at > time.time())
+
+
+def clear_otp_verified(request, response, activity_id):
+    """
+    Forget the OTP verification flag once the participation is submitted
+    """
+    name = _otp_flag_name(activity_id)
+
+    if settings.OTP_FLAG_STORAGE == 'cookie':
+        response.delete_cookie(name, samesite='Lax')
+    else:
+        request.session.pop(name, None)
+
+    return response
+
+
+def clear_otp_flags(request, response):
+    """
+    Delete every OTP flag cookie of the browser (on logout)
+    """
+    for name in request.COOKIES:
+        if name.startswith(_otp_flag_name('')):
+            response.delete_cookie(name, samesite='Lax')
+    return response
+
+
+CHECKIN_TOKEN_SALT = 'participation.checkin_token'
+
+
+def _checkin_signer():
+    # First key signs, the others are still accepted (key rotation)
+    keys = settings.CHECKIN_TOKEN_KEYS or [settings.SECRET_KEY, *settings.SECRET_KEY_FALLBACKS]
+    return signing.Signer(key=keys[0], fallback_keys=keys[1:], salt=CHECKIN_TOKEN_SALT)
+
+
+def make_checkin_token(activity_id, expires_at):
+    """
+    Create a signed check-in token for an activity, valid until expires_at
+
+    The token carries its own validity window, so checking it needs no cache
+    or database access (see read_checkin_token).
+    """
+    payload = {'a': int(activity_id), 'e': int(expires_at.timestamp())}
+    return _checkin_signer().sign_object(payload)
+
+
+def read_checkin_token(token):
+    """
+    Return (activity id, expiry timestamp) of a valid check-in token, None if
+    the signature is wrong or the token has expired
+    """
+    try:
+        payload = _checkin_signer().unsign_object(token)
+    except signing.BadSignature:
+        return None
+    
+    if not isinstance(payload, dict) or payload.get('e', 0) < time.time():
+        return None
+    
+    return payload.get('a'), payload['e']
+
+
+def make_qr_svg(data):
+    """
+    Render data as an inline SVG QR code (None if qrcode is not installed)
+    """
+    try:
+        import qrcode
+        import qrcode.image.svg
+    except ImportError:
+        return None
+    from xml.etree import ElementTree
+    
+    svg = qrcode.make(data, image_factory=qrcode.image.svg.SvgPathImage).get_image()
+    # Scale with the container instead of the fixed size in mm
+    svg.set('width', '100%')
+    svg.set('height', '100%')
+    return ElementTree.tostring(svg, encoding='unicode')
+
+
 def send_otp_email(email, otp_code, activity_name):
     """
     Send OTP code via email
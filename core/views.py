@@ -1,8 +1,43 @@
 """
 Core views
 """
-from django.shortcuts import render
+import datetime
+import mimetypes
+import os
+import re
+
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
+from django.views.decorators.http import require_safe
 from clubs.models import Club
+from . import performance
+from .images import RENDITION_PREFIX
+from .models import ExportJob, ImageRendition
+from .storage import BLOB_NAME_RE, BLOB_PREFIX, CHUNK_SIZE, blob_storage, can_read_blob
+
+
+# Blobs never change: their URL changes with their content (their renditions
+# with the blob). Private: receipts and participation photos must not be kept by
+# shared caches
+BLOB_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+# Content types displayed by the browser; anything else (HTML, SVG...) is downloaded
+INLINE_CONTENT_TYPES = re.compile(r'^(image/(?!svg)|video/|audio/|application/pdf$)')
+
+# Columns of the slowest views page, which can all be sorted on
+PERFORMANCE_COLUMNS = [
+    ('p95_ms', 'p95'),
+    ('average_ms', 'Moyenne'),
+    ('max_ms', 'Max'),
+    ('count', 'Requêtes'),
+    ('average_queries', 'SQL moyen'),
+    ('max_queries', 'SQL max'),
+]
 
 
 def home(request):
@@ -42,3 +77,159 @@ def mobile_test(request):
     Mobile responsive test view
     """
     return render(request, 'core/mobile_test.html')
+
+
+@login_required
+def performance_report(request):
+    """
+    Slowest views served by this process (restricted to AESI executives)
+    """
+    if not request.user.is_staff:
+        return render(request, 'dashboard/access_denied.html')
+    
+    if request.method == 'POST':
+        performance.reset()
+        return redirect('core:performance_report')
+    
+    order_by = request.GET.get('sort')
+    if order_by not in dict(PERFORMANCE_COLUMNS):
+        order_by = 'p95_ms'
+    
+    context = {
+        'views': performance.slowest_views(order_by),
+        'columns': PERFORMANCE_COLUMNS,
+        'order_by': order_by,
+        'started': datetime.datetime.fromtimestamp(performance.started(), tz=timezone.get_current_timezone()),
+    }
+    return render(request, 'core/performance.html', context)
+
+
+@login_required
+def export_status(request, pk):
+    """
+    Progress page of a background export (refreshes until the file is ready)
+    """
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user)
+    return render(request, 'core/export_status.html', {'job': job})
+
+
+@login_required
+def export_download(request, pk):
+    """
+    Download the file of a finished background export
+    """
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user)
+    if job.status != 'DONE' or not job.file:
+        raise Http404("Export non disponible")
+    
+    filename = job.file.name.rsplit('/', 1)[-1].split('_', 1)[-1]
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=filename)
+
+
+def _byte_range(header, size):
+    """
+    (start, end) of a single "bytes=" range, None when the header is to be
+    ignored (whole file) and False when it cannot be satisfied
+    """
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+    if first:
+        start, end = int(first), int(last) if last else size - 1
+    else:
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size or start > end or size == 0:
+        return False
+    return start, min(end, size - 1)
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        while length > 0:
+            chunk = fh.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _check_blob_access(request, name):
+    """Redirect anonymous users to the login page, refuse the others"""
+    if not can_read_blob(request.user, name):
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        raise PermissionDenied
+
+
+def _serve_file(request, path, etag):
+    """Whole file or single byte range, with immutable caching"""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        raise Http404
+
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        byte_range = None
+        if 'Range' in request.headers and request.headers.get('If-Range', etag) == etag:
+            byte_range = _byte_range(request.headers['Range'], size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(_read_range(path, start, end - start + 1), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = end - start + 1
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+
+        if not INLINE_CONTENT_TYPES.match(content_type):
+            response['Content-Disposition'] = f'attachment; filename="{os.path.basename(path)}"'
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = BLOB_CACHE_CONTROL
+    return response
+
+
+@require_safe
+def serve_blob(request, name):
+    """
+    Serve a deduplicated upload (core.storage) with immutable caching and
+    single byte range requests (resumed downloads, seeking in media files);
+    receipts only to the users who can view the finances of their club,
+    participation photos to logged-in users
+    """
+    match = BLOB_NAME_RE.match(name)
+    if not match:
+        raise Http404
+    denied = _check_blob_access(request, BLOB_PREFIX + name)
+    if denied:
+        return denied
+    return _serve_file(request, blob_storage.path(BLOB_PREFIX + name), f'"{match.group(1)}"')
+
+
+@require_safe
+def serve_blob_rendition(request, name):
+    """
+    Serve an image rendition of a blob (core.images) with the access rules of
+    the blob
+    """
+    file_name = RENDITION_PREFIX + BLOB_PREFIX + name
+    rendition = ImageRendition.objects.filter(file=file_name).values_list('pk', 'source').first()
+    if rendition is None:
+        raise Http404
+    pk, source = rendition
+    denied = _check_blob_access(request, source)
+    if denied:
+        return denied
+    # A regenerated rendition is a new row
+    return _serve_file(request, default_storage.path(file_name), f'"rendition-{pk}"')
@@ -3,7 +3,7 @@ Views for dashboard app
 """
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Avg, Sum, Q
+from django.db.models import Count, Avg, Q
 from django.utils import timezone
 from datetime import timedelta
 from rest_framework.decorators import api_view, permission_classes
@@ -13,7 +13,7 @@ from django.core.cache import cache
 
 from clubs.models import Club, Activity, Winner, ActivityPhoto
 from participation.models import Participation, ParticipationStats
-from finances.models import Transaction, CashBalance
+from finances.services import club_summaries
 from users.models import User
 
 
@@ -39,14 +39,10 @@ def global_dashboard(request):
         total_participations = Participation.objects.filter(otp_verified=True).count()
         total_clubs = clubs.count()
         
-        # Total budget (income and expenses)
-        total_income = Transaction.objects.filter(
-            transaction_type='INCOME'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        
-        total_expenses = Transaction.objects.filter(
-            transaction_type='EXPENSE'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        # Total budget (income and expenses), from the cached club summaries
+        finance_summaries = club_summaries(Club.objects.values_list('id', flat=True))
+        total_income = sum((item['total_income'] for item in finance_summaries.values()), Decimal('0'))
+        total_expenses = sum((item['total_expenses'] for item in finance_summaries.values()), Decimal('0'))
         
         total_budget = total_income - total_expenses
         
@@ -54,83 +50,80 @@ def global_dashboard(request):
         total_winners = Winner.objects.count()
         
         # ==================== CLUB COMPARISON ====================
-        club_stats = []
-        for club in clubs:
-            activities_completed = club.activities.filter(status='COMPLETED').count()
-            activities_total = club.activities.count()
-            
-            participants_count = Participation.objects.filter(
-                activity__club=club,
-                otp_verified=True
-            ).count()
-            
-            participants_unique = Participation.objects.filter(
-                activity__club=club,
+        # One grouped query per table for all the clubs
+        activity_counts = {
+            row['club']: row for row in Activity.objects.order_by().values('club').annotate(
+                total=Count('id'),
+                completed=Count('id', filter=Q(status='COMPLETED'))
+            )
+        }
+        participation_counts = {
+            row['activity__club']: row for row in Participation.objects.filter(
                 otp_verified=True
-            ).values('user').distinct().count()
+            ).order_by().values('activity__club').annotate(
+                count=Count('id'),
+                unique=Count('user', distinct=True),
+                avg_rating=Avg('rating')
+            )
+        }
+        winner_counts = dict(
+            Winner.objects.order_by().values('competition__activity__club').annotate(
+                count=Count('id')
+            ).values_list('competition__activity__club', 'count')
+        )
+        
+        club_stats = []
+        for club in clubs.with_execution_rate():
+            activities = activity_counts.get(club.id, {})
+            participations = participation_counts.get(club.id, {})
             
             # Financial data
-            club_income = Transaction.objects.filter(
-                club=club,
-                transaction_type='INCOME'
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            
-            club_expenses = Transaction.objects.filter(
-                club=club,
-                transaction_type='EXPENSE'
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            
-            club_balance = club_income - club_expenses
+            club_income = finance_summaries[club.id]['total_income']
+            club_expenses = finance_summaries[club.id]['total_expenses']
+            club_balance = finance_summaries[club.id]['balance']
             
-            # Winners count
-            club_winners = Winner.objects.filter(
-                competition__activity__club=club
-            ).count()
-            
-            # Average rating
-            avg_rating = Participation.objects.filter(
-                activity__club=club,
-                otp_verified=True,
-                rating__isnull=False
-            ).aggregate(avg=Avg('rating'))['avg'] or 0
+            avg_rating = participations.get('avg_rating') or 0
             
             club_stats.append({
                 'club': club,
                 'execution_rate': club.execution_rate,
-                'activities_completed': activities_completed,
-                'activities_total': activities_total,
-                'participants_count': participants_count,
-                'participants_unique': participants_unique,
+                'activities_completed': activities.get('completed', 0),
+                'activities_total': activities.get('total', 0),
+                'participants_count': participations.get('count', 0),
+                'participants_unique': participations.get('unique', 0),
                 'club_income': float(club_income),
                 'club_expenses': float(club_expenses),
                 'club_balance': float(club_balance),
-                'winners_count': club_winners,
+                'winners_count': winner_counts.get(club.id, 0),
                 'average_rating': round(avg_rating, 2),
             })
         
         # ==================== TOP 5 PARTICIPANTS (GLOBAL) ====================
-        top_participants_data = Participation.objects.filter(
+        top_participants_data = list(Participation.objects.filter(
             otp_verified=True
         ).values('user').annotate(
             participation_count=Count('id'),
             avg_rating=Avg('rating')
-        ).order_by('-participation_count')[:5]
+        ).order_by('-participation_count')[:5])
+        
+        top_user_ids = [item['user'] for item in top_participants_data]
+        top_users = User.objects.in_bulk(top_user_ids)
+        top_wins = dict(
+            Winner.objects.filter(participant__in=top_user_ids).order_by().values('participant').annotate(
+                count=Count('id')
+            ).values_list('participant', 'count')
+        )
         
         top_participants = []
         for item in top_participants_data:
-            user = User.objects.get(id=item['user'])
-            
-            # Count wins
-            wins_count = Winner.objects.filter(participant=user).count()
-            
             # Participation rate
             participation_rate = (item['participation_count'] / total_activities * 100) if total_activities > 0 else 0
             
             top_participants.append({
-                'user': user,
+                'user': top_users[item['user']],
                 'participation_count': item['participation_count'],
                 'avg_rating': round(item['avg_rating'], 2) if item['avg_rating'] else 0,
-                'wins_count': wins_count,
+                'wins_count': top_wins.get(item['user'], 0),
                 'participation_rate': round(participation_rate, 2)
             })
         
@@ -553,28 +546,18 @@ def financial_summary_api(request):
             status=403
         )
     
-    clubs = Club.objects.filter(is_active=True)
+    clubs = list(Club.objects.filter(is_active=True).values_list('id', 'name'))
+    summaries = club_summaries([club_id for club_id, _ in clubs])
     
     financial_data = []
-    for club in clubs:
-        total_income = Transaction.objects.filter(
-            club=club,
-            transaction_type='INCOME'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        total_expenses = Transaction.objects.filter(
-            club=club,
-            transaction_type='EXPENSE'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        balance = total_income - total_expenses
-        
+    for club_id, club_name in clubs:
+        summary = summaries[club_id]
         financial_data.append({
-            'club_id': club.id,
-            'club_name': club.name,
-            'total_income': float(total_income),
-            'total_expenses': float(total_expenses),
-            'balance': float(balance),
+            'club_id': club_id,
+            'club_name': club_name,
+            'total_income': float(summary['total_income']),
+            'total_expenses': float(summary['total_expenses']),
+            'balance': float(summary['balance']),
         })
     
     return Response(financial_data)
@@ -2,7 +2,7 @@
 Admin configuration for finances app
 """
 from django.contrib import admin
-from .models import Transaction, Budget, CashBalance, ExpenseCategory
+from .models import Transaction, Budget, CashBalance, MonthlyClosing, ExpenseCategory
 
 
 @admin.register(Transaction)
@@ -14,7 +14,7 @@ class TransactionAdmin(admin.ModelAdmin):
     list_filter = [
         'transaction_type', 'club', 'category', 'transaction_date'
     ]
-    search_fields = ['description', 'notes', 'club__name']
+    search_fields = ['description', 'notes', 'reference', 'club__name']
     date_hierarchy = 'transaction_date'
     
     fieldsets = (
@@ -22,7 +22,7 @@ class TransactionAdmin(admin.ModelAdmin):
             'fields': ('club', 'transaction_type', 'amount', 'transaction_date')
         }),
         ('Détails', {
-            'fields': ('description', 'category', 'activity', 'notes')
+            'fields': ('description', 'category', 'reference', 'activity', 'notes')
         }),
         ('Documents', {
             'fields': ('receipt',)
@@ -51,6 +51,9 @@ class BudgetAdmin(admin.ModelAdmin):
         'spent_amount', 'remaining_amount', 'usage_percentage',
         'created_by', 'updated_by', 'created_at', 'updated_at'
     ]
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_usage().select_related('club')
 
 
 @admin.register(CashBalance)
@@ -75,6 +78,20 @@ class CashBalanceAdmin(admin.ModelAdmin):
     update_balances.short_description = "Mettre à jour les soldes"
 
 
+@admin.register(MonthlyClosing)
+class MonthlyClosingAdmin(admin.ModelAdmin):
+    list_display = [
+        'club', 'month', 'opening_balance', 'income', 'expenses',
+        'closing_balance', 'transaction_count', 'closed_at'
+    ]
+    list_filter = ['club']
+    date_hierarchy = 'month'
+    readonly_fields = [
+        'club', 'month', 'opening_balance', 'income', 'expenses',
+        'closing_balance', 'transaction_count', 'closed_at'
+    ]
+
+
 @admin.register(ExpenseCategory)
 class ExpenseCategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'color', 'is_active']
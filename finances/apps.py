@@ -5,3 +5,6 @@ class FinancesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'finances'
     verbose_name = 'Finances'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,25 @@
+"""
+Exports of finances app (see core.exports)
+"""
+from django.utils.dateparse import parse_date
+from core.exports import Document, register_document
+
+
+@register_document('financial_report')
+def financial_report(params):
+    """Financial report of one or several clubs over a date range"""
+    from clubs.models import Club
+    from .reports import build_report, report_tables
+    
+    start, end = parse_date(params['start']), parse_date(params['end'])
+    clubs = Club.objects.filter(is_active=True)
+    if params.get('clubs'):
+        clubs = Club.objects.filter(id__in=params['clubs'])
+    
+    tables = []
+    for club in clubs.order_by('name'):
+        tables.extend(report_tables(club, build_report(club.id, start, end)))
+    
+    title = f"Rapport financier du {start:%d/%m/%Y} au {end:%d/%m/%Y}"
+    slug = clubs.get().slug if params.get('clubs') and len(params['clubs']) == 1 else 'clubs'
+    return Document(title, tables, f"rapport_financier_{slug}_{start:%Y%m%d}_{end:%Y%m%d}")
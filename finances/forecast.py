@@ -0,0 +1,144 @@
+"""
+Budget burn-rate forecasting
+
+The daily expenses of the clubs of all the budgets are read in one grouped
+query and laid out as a clubs x days NumPy matrix. Its cumulative sums give,
+for every budget at once: the amount spent to date, the average daily burn
+rate since the start of the period, the spend projected at the end of the
+period and the date on which the allocation is (or will be) exceeded.
+"""
+from decimal import Decimal
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.utils import timezone
+from .models import Transaction
+
+
+STATUS_LABELS = {
+    'upcoming': 'À venir',
+    'on_track': 'Dans le budget',
+    'at_risk': 'Dépassement prévu',
+    'over_budget': 'Dépassé',
+    'closed': 'Terminé',
+}
+
+
+def _money(value):
+    return Decimal(f'{value:.2f}')
+
+
+def _daily_expenses(club_ids, first, last):
+    """clubs x days matrix of the expenses between two dates (one query)"""
+    import numpy as np
+
+    rows = {club_id: index for index, club_id in enumerate(club_ids)}
+    days = max((last - first).days + 1, 0)
+    daily = np.zeros((len(club_ids), days))
+    if not days:
+        return rows, daily
+
+    series = list(
+        Transaction.objects.filter(
+            transaction_type='EXPENSE',
+            club_id__in=club_ids,
+            transaction_date__range=(first, last)
+        ).values('club_id', 'transaction_date').annotate(total=Sum('amount')).order_by()
+    )
+    if series:
+        np.add.at(
+            daily,
+            (
+                np.array([rows[item['club_id']] for item in series]),
+                np.array([(item['transaction_date'] - first).days for item in series]),
+            ),
+            np.array([float(item['total']) for item in series]),
+        )
+    return rows, daily
+
+
+def forecast_budgets(budgets, today=None):
+    """
+    Forecast of each budget, by budget id: spent_to_date, burn_rate (per
+    day), elapsed_days, total_days, projected_spend, projected_remaining,
+    projected_percentage, over_budget_date (None while the allocation
+    holds), status (see STATUS_LABELS) and status_label
+    """
+    import numpy as np
+
+    budgets = list(budgets)
+    if not budgets:
+        return {}
+    today = today or timezone.localdate()
+
+    first = min(budget.start_date for budget in budgets)
+    last = min(max(budget.end_date for budget in budgets), today)
+    rows, daily = _daily_expenses(sorted({budget.club_id for budget in budgets}), first, last)
+    days = daily.shape[1]
+
+    # cumulative[:, k]: expenses of the days before day k
+    cumulative = np.zeros((daily.shape[0], days + 1))
+    np.cumsum(daily, axis=1, out=cumulative[:, 1:])
+
+    club = np.array([rows[budget.club_id] for budget in budgets])
+    start = np.array([(budget.start_date - first).days for budget in budgets])
+    end = np.array([(budget.end_date - first).days for budget in budgets])
+    allocated = np.array([float(budget.allocated_amount) for budget in budgets])
+    today_index = (today - first).days
+
+    total_days = np.maximum(end - start + 1, 1)
+    elapsed = np.clip(np.minimum(end, today_index) - start + 1, 0, total_days)
+    window_start = np.minimum(start, days)
+    window_end = np.clip(start + elapsed, window_start, days)
+
+    spent = cumulative[club, window_end] - cumulative[club, window_start]
+    burn_rate = np.divide(spent, elapsed, out=np.zeros_like(spent), where=elapsed > 0)
+    projected = spent + burn_rate * (total_days - elapsed)
+
+    # Day on which the spend to date went over the allocation
+    day = np.arange(days)
+    running = cumulative[club, 1:] - cumulative[club, window_start][:, None]
+    crossed = (
+        (day >= window_start[:, None]) & (day < window_end[:, None])
+        & (running > allocated[:, None] + 0.005)
+    )
+    has_crossed = crossed.any(axis=1)
+    crossing = crossed.argmax(axis=1)
+
+    # Otherwise, day on which the current burn rate will exceed it
+    will_cross = ~has_crossed & (burn_rate > 0) & (projected > allocated + 0.005) & (elapsed < total_days)
+    days_left = np.floor(np.divide(allocated - spent, burn_rate, out=np.zeros_like(spent), where=burn_rate > 0)) + 1
+
+    forecasts = {}
+    for index, budget in enumerate(budgets):
+        if has_crossed[index]:
+            over_budget_date = first + timedelta(days=int(crossing[index]))
+        elif will_cross[index]:
+            over_budget_date = today + timedelta(days=int(days_left[index]))
+        else:
+            over_budget_date = None
+
+        if today < budget.start_date:
+            status = 'upcoming'
+        elif has_crossed[index]:
+            status = 'over_budget'
+        elif budget.end_date < today:
+            status = 'closed'
+        elif will_cross[index]:
+            status = 'at_risk'
+        else:
+            status = 'on_track'
+
+        forecasts[budget.id] = {
+            'spent_to_date': _money(spent[index]),
+            'burn_rate': _money(burn_rate[index]),
+            'elapsed_days': int(elapsed[index]),
+            'total_days': int(total_days[index]),
+            'projected_spend': _money(projected[index]),
+            'projected_remaining': _money(allocated[index] - projected[index]),
+            'projected_percentage': round(float(projected[index] / allocated[index] * 100), 2) if allocated[index] else 0,
+            'over_budget_date': over_budget_date,
+            'status': status,
+            'status_label': STATUS_LABELS[status],
+        }
+    return forecasts
@@ -78,3 +78,66 @@ class BudgetForm(forms.ModelForm):
             'end_date': forms.DateInput(attrs={'type': 'date'}),
             'description': forms.Textarea(attrs={'rows': 4}),
         }
+
+
+class StatementImportForm(forms.Form):
+    """Form for importing a bank or mobile-money statement (CSV)"""
+    
+    ENCODING_CHOICES = [
+        ('utf-8-sig', 'UTF-8'),
+        ('cp1252', 'Windows (Excel)'),
+        ('latin-1', 'ISO-8859-1'),
+    ]
+    INPUT_CLASS = 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-primary focus:border-primary'
+    
+    file = forms.FileField(
+        label='Relevé CSV',
+        widget=forms.FileInput(attrs={'class': INPUT_CLASS, 'accept': '.csv,text/csv'})
+    )
+    category = forms.CharField(
+        label='Catégorie',
+        max_length=100,
+        initial='Relevé',
+        help_text='Utilisée pour les lignes sans colonne de catégorie',
+        widget=forms.TextInput(attrs={'class': INPUT_CLASS})
+    )
+    encoding = forms.ChoiceField(
+        label='Encodage',
+        choices=ENCODING_CHOICES,
+        initial='utf-8-sig',
+        widget=forms.Select(attrs={'class': INPUT_CLASS})
+    )
+    dry_run = forms.BooleanField(
+        label='Aperçu seulement (ne rien enregistrer)',
+        required=False
+    )
+    
+    # Column names, when the headers of the statement are not recognised
+    date_column = forms.CharField(label='Colonne date', required=False)
+    amount_column = forms.CharField(label='Colonne montant', required=False)
+    debit_column = forms.CharField(label='Colonne débit', required=False)
+    credit_column = forms.CharField(label='Colonne crédit', required=False)
+    reference_column = forms.CharField(label='Colonne référence', required=False)
+    description_column = forms.CharField(label='Colonne libellé', required=False)
+    type_column = forms.CharField(label='Colonne type (crédit/débit)', required=False)
+    
+    COLUMN_FIELDS = ['date', 'amount', 'debit', 'credit', 'reference', 'description', 'type']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in self.COLUMN_FIELDS:
+            self.fields[f'{name}_column'].widget.attrs.update({'class': self.INPUT_CLASS, 'placeholder': 'Détection automatique'})
+    
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        if not file.name.lower().endswith(('.csv', '.txt')):
+            raise forms.ValidationError('Le relevé doit être un fichier CSV.')
+        return file
+    
+    def columns(self):
+        """Column names given by the user, by Transaction field (see finances.imports)"""
+        return {
+            name: self.cleaned_data[f'{name}_column'].strip()
+            for name in self.COLUMN_FIELDS
+            if self.cleaned_data.get(f'{name}_column', '').strip()
+        }
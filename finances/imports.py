@@ -0,0 +1,301 @@
+"""
+Import of bank and mobile-money statements (CSV)
+
+The file is read as a stream, row by row, and its columns are mapped to
+Transaction fields: detected from the usual header names (the header may
+follow a few preamble lines), or given explicitly. Rows are inserted by
+batches with bulk_create in a single database transaction; the ledger
+signals do not fire, so the cash balance, the monthly closings and the
+cached summary are updated once at the end.
+
+A statement line already imported is recognised by its fingerprint (club,
+date, amount, reference, type), backed by an index. Lines without a reference get
+one derived from their content, so importing the same file twice creates
+nothing the second time.
+"""
+import csv
+import datetime
+import hashlib
+import io
+import re
+import unicodedata
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from core.background import enqueue
+from .ledger import invalidate_closings
+from .models import Transaction, CashBalance, signed_amount
+from .tasks import close_monthly_balances
+
+
+BATCH_SIZE = 500
+HEADER_SEARCH_ROWS = 20
+MAX_ERRORS = 50
+MAX_AMOUNT = Decimal('99999999.99')
+
+# Usual header names of each column (lower case, without accents or punctuation)
+COLUMN_ALIASES = {
+    'date': ('date', 'date operation', 'date de l operation', 'date transaction', 'date de transaction',
+             'date valeur', 'date de valeur', 'date comptable', 'transaction date'),
+    'amount': ('montant', 'montant fcfa', 'amount', 'valeur'),
+    'debit': ('debit', 'debit fcfa', 'retrait', 'sortie', 'montant debit'),
+    'credit': ('credit', 'credit fcfa', 'depot', 'entree', 'montant credit'),
+    'reference': ('reference', 'ref', 'id transaction', 'id de transaction', 'transaction id', 'numero',
+                  'n transaction', 'numero de transaction', 'id'),
+    'description': ('libelle', 'description', 'motif', 'details', 'detail', 'label', 'narration'),
+    'type': ('type', 'sens', 'type de transaction', 'type operation', 'nature'),
+    'category': ('categorie', 'category'),
+}
+
+# Values of a type column
+INCOME_TYPES = {'credit', 'c', 'cr', 'entree', 'depot', 'income', 'reception', 'recu', 'in'}
+EXPENSE_TYPES = {'debit', 'd', 'dr', 'depense', 'sortie', 'retrait', 'paiement', 'expense', 'envoi', 'out'}
+
+DELIMITERS = ';,\t|'
+DATE_FORMATS = ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y', '%Y/%m/%d')
+
+
+class StatementError(ValueError):
+    """The file cannot be read as a statement"""
+
+
+def _normalize(text):
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text.lower()).split())
+
+
+def parse_amount(value):
+    """Decimal of an amount as written on statements ("1 500", "-2.500,50", "(300) FCFA"), None when empty"""
+    text = (value or '').strip()
+    negative = text.startswith('-') or text.endswith('-') or ('(' in text and ')' in text)
+    digits = re.sub(r'[^\d,.]', '', text)
+    if not digits:
+        return None
+
+    # The last separator is the decimal one, unless it is followed by a group of three digits
+    separators = [char for char in digits if char in ',.']
+    if separators:
+        last = separators[-1]
+        decimals = digits.rsplit(last, 1)[1]
+        if separators.count(last) > 1 or (len(decimals) == 3 and len(set(separators)) == 1):
+            digits = digits.replace(',', '').replace('.', '')
+        else:
+            other = '.' if last == ',' else ','
+            digits = digits.replace(other, '').replace(last, '.')
+
+    try:
+        amount = Decimal(digits).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise StatementError(f"Montant invalide : {value}")
+    return -amount if negative else amount
+
+
+def parse_date(value):
+    # Drop a time part ("12/03/2025 14:02", "2025-03-12T14:02:00")
+    text = (value or '').strip().split(' ')[0].split('T')[0]
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    raise StatementError(f"Date invalide : {value}")
+
+
+def detect_columns(headers, columns=None):
+    """
+    Index of each mapped column in a header row: the explicit ``columns``
+    (field -> header name) first, then the usual header names. Raises
+    StatementError when the date or the amount cannot be found.
+    """
+    normalized = {}
+    for index, header in enumerate(headers):
+        normalized.setdefault(_normalize(header), index)
+
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        wanted = (columns or {}).get(field)
+        if wanted:
+            if _normalize(wanted) not in normalized:
+                raise StatementError(f"Colonne introuvable : {wanted}")
+            mapping[field] = normalized[_normalize(wanted)]
+            continue
+        for alias in aliases:
+            if alias in normalized and normalized[alias] not in mapping.values():
+                mapping[field] = normalized[alias]
+                break
+
+    if 'date' not in mapping:
+        raise StatementError("Colonne de date introuvable")
+    if 'amount' not in mapping and not ('debit' in mapping or 'credit' in mapping):
+        raise StatementError("Colonne de montant (ou débit/crédit) introuvable")
+    return mapping
+
+
+def _row_type_and_amount(row, mapping):
+    def cell(field):
+        index = mapping.get(field)
+        return row[index] if index is not None and index < len(row) else ''
+
+    credit, debit = parse_amount(cell('credit')), parse_amount(cell('debit'))
+    if credit:
+        return 'INCOME', abs(credit)
+    if debit:
+        return 'EXPENSE', abs(debit)
+
+    amount = parse_amount(cell('amount'))
+    if not amount:
+        raise StatementError("Montant manquant ou nul")
+
+    kind = _normalize(cell('type'))
+    if kind in INCOME_TYPES:
+        return 'INCOME', abs(amount)
+    if kind in EXPENSE_TYPES:
+        return 'EXPENSE', abs(amount)
+    return ('EXPENSE', -amount) if amount < 0 else ('INCOME', amount)
+
+
+def _open_text(file, encoding):
+    if isinstance(file, (bytes, bytearray)):
+        file = io.BytesIO(file)
+    file.seek(0)
+    return io.TextIOWrapper(file, encoding=encoding, errors='replace', newline='')
+
+
+def _rows(text):
+    """Line number and cells of each CSV row"""
+    # The delimiter found on most lines of the start of the file (csv.Sniffer
+    # gives up on the preamble lines of bank statements)
+    lines = [line for line in text.read(8192).splitlines() if line.strip()]
+    text.seek(0)
+    delimiter = max(DELIMITERS, key=lambda char: (sum(char in line for line in lines), sum(line.count(char) for line in lines)))
+    reader = csv.reader(text, delimiter=delimiter)
+    try:
+        yield from enumerate(reader, 1)
+    except csv.Error as exc:
+        # E.g. an unterminated quote: the rest of the file is one huge field
+        raise StatementError(f"Fichier CSV illisible (ligne {reader.line_num}) : {exc}")
+
+
+def import_statement(club, file, user=None, category='Relevé', encoding='utf-8-sig', columns=None, dry_run=False):
+    """
+    Import the lines of a statement CSV into the transactions of a club
+
+    ``columns`` maps Transaction fields (see COLUMN_ALIASES) to header names
+    when they are not detected. Unreadable lines are skipped and reported;
+    with ``dry_run`` nothing is written. Returns a dict: created, duplicates,
+    errors (line, message), error_count, income, expenses, first_date,
+    last_date.
+    """
+    result = {
+        'created': 0, 'duplicates': 0, 'errors': [], 'error_count': 0,
+        'income': Decimal('0.00'), 'expenses': Decimal('0.00'),
+        'first_date': None, 'last_date': None,
+    }
+    seen = set()
+    occurrences = Counter()
+    pending = []
+
+    def error(line, message):
+        result['error_count'] += 1
+        if len(result['errors']) < MAX_ERRORS:
+            result['errors'].append((line, message))
+
+    def flush():
+        dates = [item.transaction_date for item in pending]
+        existing = set(
+            Transaction.objects.filter(
+                club=club,
+                transaction_date__range=(min(dates), max(dates)),
+                reference__in={item.reference for item in pending},
+            ).values_list('transaction_date', 'amount', 'reference', 'transaction_type')
+        )
+        new = [
+            item for item in pending
+            if (item.transaction_date, item.amount, item.reference, item.transaction_type) not in existing
+        ]
+        result['duplicates'] += len(pending) - len(new)
+        if not dry_run:
+            Transaction.objects.bulk_create(new, batch_size=BATCH_SIZE)
+        for item in new:
+            result['created'] += 1
+            result['income' if item.transaction_type == 'INCOME' else 'expenses'] += item.amount
+            result['first_date'] = min(filter(None, [result['first_date'], item.transaction_date]))
+            result['last_date'] = max(filter(None, [result['last_date'], item.transaction_date]))
+        pending.clear()
+
+    text = _open_text(file, encoding)
+    try:
+        with transaction.atomic():
+            mapping = None
+            for line, row in _rows(text):
+                if not any(cell.strip() for cell in row):
+                    continue
+
+                # Preamble lines (bank, account number...) before the header
+                if mapping is None:
+                    try:
+                        mapping = detect_columns(row, columns)
+                    except StatementError:
+                        if line >= HEADER_SEARCH_ROWS:
+                            raise
+                    continue
+
+                try:
+                    transaction_type, amount = _row_type_and_amount(row, mapping)
+                    day = parse_date(row[mapping['date']] if mapping['date'] < len(row) else '')
+                    if amount > MAX_AMOUNT:
+                        raise StatementError(f"Montant trop élevé : {amount}")
+                except StatementError as exc:
+                    error(line, str(exc))
+                    continue
+
+                def cell(field, length):
+                    index = mapping.get(field)
+                    return row[index].strip()[:length] if index is not None and index < len(row) else ''
+
+                description = cell('description', 200) or f"Relevé du {day:%d/%m/%Y}"
+                reference = cell('reference', 100)
+                if not reference:
+                    # Stable across imports of the same file, distinct for identical lines
+                    key = f'{day}|{amount}|{transaction_type}|{description}'
+                    occurrences[key] += 1
+                    reference = 'auto-' + hashlib.sha1(f'{key}|{occurrences[key]}'.encode('utf-8')).hexdigest()[:20]
+
+                fingerprint = (day, amount, reference, transaction_type)
+                if fingerprint in seen:
+                    result['duplicates'] += 1
+                    continue
+                seen.add(fingerprint)
+
+                pending.append(Transaction(
+                    club=club,
+                    transaction_type=transaction_type,
+                    amount=amount,
+                    description=description,
+                    category=cell('category', 100) or category,
+                    reference=reference,
+                    transaction_date=day,
+                    created_by=user,
+                ))
+                if len(pending) >= BATCH_SIZE:
+                    flush()
+
+            if mapping is None:
+                raise StatementError("En-tête du relevé introuvable (colonnes date et montant)")
+            if pending:
+                flush()
+
+            if result['created'] and not dry_run:
+                # bulk_create bypasses finances.signals: one ledger update for the whole file
+                CashBalance.apply_delta(
+                    club.id,
+                    signed_amount('INCOME', result['income']) + signed_amount('EXPENSE', result['expenses'])
+                )
+                if invalidate_closings(club.id, result['first_date']):
+                    enqueue(close_monthly_balances, [club.id])
+    finally:
+        # The uploaded file stays open for Django to close
+        text.detach()
+
+    return result
@@ -0,0 +1,168 @@
+"""
+Running balance and month-end closings
+
+The balance of a club at any date is read from the last MonthlyClosing
+before that date plus the transactions since (at most about a month once the
+closings are up to date), instead of summing the whole history. Closings are
+written by the close_monthly_balances task; a transaction written in an
+already closed month deletes the closings from that month on, and they are
+rebuilt by the next run. Both lock the CashBalance row of the club (like the
+ledger deltas), so a closing is never computed from rows that an
+invalidation is about to commit.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When, Window
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .models import Transaction, CashBalance, MonthlyClosing
+
+
+ZERO = Decimal('0.00')
+
+# Chronological order of a club's transactions
+LEDGER_ORDER = ('transaction_date', 'created_at', 'id')
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+def signed_expression():
+    """SQL expression of the effect of a transaction on the balance"""
+    return Case(
+        When(transaction_type='INCOME', then=F('amount')),
+        default=-F('amount'),
+        output_field=DecimalField(max_digits=12, decimal_places=2)
+    )
+
+
+def _net(queryset):
+    totals = queryset.aggregate(
+        income=Sum('amount', filter=Q(transaction_type='INCOME')),
+        expenses=Sum('amount', filter=Q(transaction_type='EXPENSE')),
+    )
+    return (totals['income'] or ZERO) - (totals['expenses'] or ZERO)
+
+
+def _lock_club(club_id):
+    """Serialize closings and invalidations of a club (inside an atomic block)"""
+    CashBalance.objects.select_for_update().filter(club_id=club_id).first()
+
+
+def balance_at(club_id, day):
+    """Balance of a club at the end of ``day``"""
+    closing = MonthlyClosing.objects.filter(
+        club_id=club_id,
+        month__lt=month_start(day)
+    ).order_by('-month').first()
+
+    transactions = Transaction.objects.filter(club_id=club_id, transaction_date__lte=day)
+    if closing is None:
+        return _net(transactions)
+    return closing.closing_balance + _net(transactions.filter(transaction_date__gte=next_month(closing.month)))
+
+
+def running_ledger(club_id, start=None, end=None):
+    """
+    Opening balance and transactions of a club between two dates, each
+    annotated with its signed amount (delta) and the balance after it
+    (running_balance), computed by a window function
+    """
+    opening = balance_at(club_id, start - datetime.timedelta(days=1)) if start else ZERO
+
+    transactions = Transaction.objects.filter(club_id=club_id)
+    if start:
+        transactions = transactions.filter(transaction_date__gte=start)
+    if end:
+        transactions = transactions.filter(transaction_date__lte=end)
+
+    transactions = transactions.annotate(
+        delta=signed_expression(),
+        running_balance=Window(
+            Sum(signed_expression()),
+            order_by=[F(field).asc() for field in LEDGER_ORDER]
+        ) + Value(opening, output_field=DecimalField(max_digits=12, decimal_places=2)),
+    ).order_by(*LEDGER_ORDER)
+
+    return opening, transactions
+
+
+def close_months(club_ids=None, until=None):
+    """
+    Write the missing month-end closings of each club, up to the month before
+    ``until`` (the current month by default). Returns the number created.
+    """
+    from clubs.models import Club
+
+    until = month_start(until or timezone.localdate())
+    clubs = Club.objects.all()
+    if club_ids is not None:
+        clubs = clubs.filter(id__in=club_ids)
+
+    created = 0
+    for club_id in clubs.values_list('id', flat=True):
+        with transaction.atomic():
+            _lock_club(club_id)
+            last = MonthlyClosing.objects.filter(club_id=club_id).order_by('-month').first()
+            transactions = Transaction.objects.filter(club_id=club_id, transaction_date__lt=until)
+
+            if last is not None:
+                month, balance = next_month(last.month), last.closing_balance
+                transactions = transactions.filter(transaction_date__gte=month)
+            else:
+                first = transactions.order_by('transaction_date').values_list('transaction_date', flat=True).first()
+                if first is None:
+                    continue
+                month, balance = month_start(first), ZERO
+
+            totals = {
+                row['period']: row
+                for row in transactions.annotate(period=TruncMonth('transaction_date')).values('period').annotate(
+                    income=Sum('amount', filter=Q(transaction_type='INCOME')),
+                    expenses=Sum('amount', filter=Q(transaction_type='EXPENSE')),
+                    count=Count('id'),
+                ).order_by()
+            }
+
+            closings = []
+            while month < until:
+                row = totals.get(month, {})
+                income, expenses = row.get('income') or ZERO, row.get('expenses') or ZERO
+                closings.append(MonthlyClosing(
+                    club_id=club_id,
+                    month=month,
+                    opening_balance=balance,
+                    income=income,
+                    expenses=expenses,
+                    closing_balance=balance + income - expenses,
+                    transaction_count=row.get('count', 0),
+                ))
+                balance += income - expenses
+                month = next_month(month)
+
+            # A concurrent run may have written some of them already
+            MonthlyClosing.objects.bulk_create(closings, ignore_conflicts=True)
+
+        created += len(closings)
+
+    return created
+
+
+def invalidate_closings(club_id, day):
+    """
+    Delete the closings made stale by a transaction dated ``day``; returns
+    True when there were some
+    """
+    day = Transaction._meta.get_field('transaction_date').to_python(day)
+    if day >= month_start(timezone.localdate()):
+        return False
+    with transaction.atomic():
+        _lock_club(club_id)
+        return MonthlyClosing.objects.filter(club_id=club_id, month__gte=month_start(day)).delete()[0] > 0
@@ -0,0 +1,61 @@
+"""
+Check the cash balance ledger against a full recompute
+
+Usage:
+    python manage.py reconcile_cash_balances [--club ID ...] [--fix]
+"""
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q, Sum
+from clubs.models import Club
+from finances.models import Transaction, CashBalance
+
+
+class Command(BaseCommand):
+    help = "Compare CashBalance with the sum of the transactions of each club (and repair with --fix)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--club', type=int, action='append', dest='club_ids', help="Limit to a club id (repeatable)")
+        parser.add_argument('--fix', action='store_true', help="Recompute the balances that differ")
+
+    def handle(self, *args, **options):
+        clubs = Club.objects.all()
+        if options['club_ids']:
+            clubs = clubs.filter(id__in=options['club_ids'])
+
+        totals = {
+            row['club_id']: (row['income'] or Decimal('0.00')) - (row['expenses'] or Decimal('0.00'))
+            for row in Transaction.objects.filter(club__in=clubs).values('club_id').annotate(
+                income=Sum('amount', filter=Q(transaction_type='INCOME')),
+                expenses=Sum('amount', filter=Q(transaction_type='EXPENSE')),
+            )
+        }
+        balances = dict(CashBalance.objects.filter(club__in=clubs).values_list('club_id', 'current_balance'))
+
+        mismatches = []
+        for club_id, name in clubs.values_list('id', 'name'):
+            expected = totals.get(club_id, Decimal('0.00'))
+            stored = balances.get(club_id)
+            if stored is None and not expected:
+                continue
+            if stored != expected:
+                mismatches.append(club_id)
+                self.stdout.write(self.style.WARNING(
+                    f"{name}: solde enregistré {stored if stored is not None else '-'} FCFA, "
+                    f"recalculé {expected} FCFA"
+                ))
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("Tous les soldes de caisse sont cohérents."))
+            return
+
+        if options['fix']:
+            for club_id in mismatches:
+                balance, _ = CashBalance.objects.get_or_create(club_id=club_id)
+                balance.update_balance()
+            self.stdout.write(self.style.SUCCESS(f"{len(mismatches)} solde(s) de caisse corrigé(s)."))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f"{len(mismatches)} solde(s) de caisse incohérent(s). Relancer avec --fix pour les corriger."
+            ))
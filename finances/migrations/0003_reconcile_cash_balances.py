@@ -0,0 +1,32 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Q, Sum
+
+
+def reconcile_balances(apps, schema_editor):
+    """Start the ledger from exact balances (expenses were not always counted)"""
+    Transaction = apps.get_model('finances', 'Transaction')
+    CashBalance = apps.get_model('finances', 'CashBalance')
+
+    totals = Transaction.objects.values('club_id').annotate(
+        income=Sum('amount', filter=Q(transaction_type='INCOME')),
+        expenses=Sum('amount', filter=Q(transaction_type='EXPENSE')),
+    )
+    club_ids = []
+    for row in totals:
+        club_ids.append(row['club_id'])
+        balance = (row['income'] or Decimal('0.00')) - (row['expenses'] or Decimal('0.00'))
+        CashBalance.objects.update_or_create(club_id=row['club_id'], defaults={'current_balance': balance})
+    CashBalance.objects.exclude(club_id__in=club_ids).update(current_balance=Decimal('0.00'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(reconcile_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:16
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0004_activity_cancellation_comment_and_more'),
+        ('finances', '0003_reconcile_cash_balances'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyClosing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='mois')),
+                ('opening_balance', models.DecimalField(decimal_places=2, max_digits=12, verbose_name="solde d'ouverture")),
+                ('income', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='entrées')),
+                ('expenses', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='dépenses')),
+                ('closing_balance', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='solde de clôture')),
+                ('transaction_count', models.PositiveIntegerField(default=0, verbose_name='nombre de transactions')),
+                ('closed_at', models.DateTimeField(auto_now_add=True, verbose_name='clôturé le')),
+                ('club', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_closings', to='clubs.club', verbose_name='club')),
+            ],
+            options={
+                'verbose_name': 'clôture mensuelle',
+                'verbose_name_plural': 'clôtures mensuelles',
+                'ordering': ['club', '-month'],
+                'unique_together': {('club', 'month')},
+            },
+        ),
+    ]
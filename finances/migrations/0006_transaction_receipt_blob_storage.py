@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:29
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='receipt',
+            field=models.FileField(blank=True, null=True, storage=core.storage.BlobStorage(), upload_to='finances/receipts/', verbose_name='reçu'),
+        ),
+    ]
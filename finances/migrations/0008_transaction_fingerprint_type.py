@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0007_transaction_reference'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transaction_fingerprint_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['club', 'transaction_date', 'amount', 'reference', 'transaction_type'], name='transaction_fingerprint_idx'),
+        ),
+    ]
@@ -1,11 +1,15 @@
 """
 Models for finances app
 """
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from decimal import Decimal
 from core.models import AuditModel
+from core.storage import blob_storage
 
 
 class Transaction(AuditModel):
@@ -39,6 +43,9 @@ class Transaction(AuditModel):
     description = models.CharField(_('description'), max_length=200)
     category = models.CharField(_('catégorie'), max_length=100)
     
+    # Reference of the line on a bank or mobile-money statement (see finances.imports)
+    reference = models.CharField(_('référence'), max_length=100, blank=True)
+    
     # Date of transaction
     transaction_date = models.DateField(_('date de transaction'))
     
@@ -56,6 +63,7 @@ class Transaction(AuditModel):
     receipt = models.FileField(
         _('reçu'),
         upload_to='finances/receipts/',
+        storage=blob_storage,
         blank=True,
         null=True
     )
@@ -66,10 +74,46 @@ class Transaction(AuditModel):
         verbose_name = _('transaction')
         verbose_name_plural = _('transactions')
         ordering = ['-transaction_date', '-created_at']
+        indexes = [
+            models.Index(fields=['club', 'transaction_type', 'transaction_date'], name='transaction_club_type_idx'),
+            # Ledger and historical balances (all types, by date), and
+            # duplicate detection of imported statement lines
+            models.Index(
+                fields=['club', 'transaction_date', 'amount', 'reference', 'transaction_type'],
+                name='transaction_fingerprint_idx'
+            ),
+        ]
     
     def __str__(self):
         type_display = 'Entrée' if self.transaction_type == 'INCOME' else 'Dépense'
         return f"{self.club.name} - {type_display} - {self.amount} FCFA"
+    
+    def save(self, *args, **kwargs):
+        # The ledger signals read the stored row (pre_save) and apply the
+        # delta (post_save): both must commit or roll back with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class BudgetQuerySet(models.QuerySet):
+    """QuerySet for budgets"""
+    
+    def with_usage(self):
+        """Annotate the spent amount of each budget (spent_total) in the same query"""
+        spent = Transaction.objects.filter(
+            club_id=models.OuterRef('club_id'),
+            transaction_type='EXPENSE',
+            transaction_date__gte=models.OuterRef('start_date'),
+            transaction_date__lte=models.OuterRef('end_date')
+        ).order_by().values('club_id').annotate(total=models.Sum('amount')).values('total')
+        
+        return self.annotate(
+            spent_total=Coalesce(
+                models.Subquery(spent, output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+                models.Value(Decimal('0.00')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            )
+        )
 
 
 class Budget(AuditModel):
@@ -99,6 +143,8 @@ class Budget(AuditModel):
     
     is_active = models.BooleanField(_('actif'), default=True)
     
+    objects = BudgetQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('budget')
         verbose_name_plural = _('budgets')
@@ -109,15 +155,16 @@ class Budget(AuditModel):
     
     @property
     def spent_amount(self):
-        """Calculate total spent amount"""
-        from .models import Transaction
-        total = Transaction.objects.filter(
-            club=self.club,
-            transaction_type='EXPENSE',
-            transaction_date__gte=self.start_date,
-            transaction_date__lte=self.end_date
-        ).aggregate(total=models.Sum('amount'))['total']
-        return total or Decimal('0.00')
+        """Calculate total spent amount (annotated by Budget.objects.with_usage())"""
+        if not hasattr(self, 'spent_total'):
+            total = Transaction.objects.filter(
+                club_id=self.club_id,
+                transaction_type='EXPENSE',
+                transaction_date__gte=self.start_date,
+                transaction_date__lte=self.end_date
+            ).aggregate(total=models.Sum('amount'))['total']
+            self.spent_total = total or Decimal('0.00')
+        return self.spent_total
     
     @property
     def remaining_amount(self):
@@ -132,8 +179,22 @@ class Budget(AuditModel):
         return round((self.spent_amount / self.allocated_amount) * 100, 2)
 
 
+def signed_amount(transaction_type, amount):
+    """Effect of a transaction on the cash balance (income +, expense -)"""
+    amount = Decimal(str(amount or 0))
+    return amount if transaction_type == 'INCOME' else -amount
+
+
 class CashBalance(models.Model):
-    """Model for tracking club cash balance"""
+    """
+    Model for tracking club cash balance
+
+    The balance is a ledger: every transaction saved or deleted through the
+    ORM applies its signed delta (see finances.signals), so reading or
+    updating it does not depend on the number of transactions. Bulk writes
+    bypass the signals; reconcile_cash_balances checks and repairs balances
+    against a full recompute.
+    """
     
     club = models.OneToOneField(
         'clubs.Club',
@@ -158,18 +219,77 @@ class CashBalance(models.Model):
     def __str__(self):
         return f"{self.club.name} - {self.current_balance} FCFA"
     
+    @staticmethod
+    def compute_balance(club_id):
+        """Full recompute of a club balance from its transactions"""
+        totals = Transaction.objects.filter(club_id=club_id).aggregate(
+            income=models.Sum('amount', filter=models.Q(transaction_type='INCOME')),
+            expenses=models.Sum('amount', filter=models.Q(transaction_type='EXPENSE')),
+        )
+        return (totals['income'] or Decimal('0.00')) - (totals['expenses'] or Decimal('0.00'))
+    
     def update_balance(self):
         """Recalculate balance from all transactions"""
-        income = self.club.transactions.filter(
-            transaction_type='INCOME'
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-        
-        expenses = self.club.transactions.filter(
-            transaction_type='EXPENSE'
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
+        with transaction.atomic():
+            # Lock the row so no delta is applied between the sum and the write
+            CashBalance.objects.select_for_update().filter(pk=self.pk).first()
+            self.current_balance = self.compute_balance(self.club_id)
+            self.save()
+    
+    @classmethod
+    def apply_delta(cls, club_id, delta, create=True):
+        """
+        Add ``delta`` to the balance of a club, atomically
         
-        self.current_balance = income - expenses
-        self.save()
+        A missing balance is created from a full recompute (which already
+        includes the change) unless ``create`` is False. last_updated is
+        touched even when ``delta`` is zero: it versions the cached financial
+        summaries (see finances.services).
+        """
+        with transaction.atomic():
+            balance = cls.objects.select_for_update().filter(club_id=club_id).first()
+            if balance is not None:
+                cls.objects.filter(pk=balance.pk).update(
+                    current_balance=F('current_balance') + delta,
+                    last_updated=timezone.now()
+                )
+            elif create:
+                balance, created = cls.objects.get_or_create(club_id=club_id)
+                balance.update_balance()
+
+
+class MonthlyClosing(models.Model):
+    """
+    Month-end balance of a club, so that a historical balance is one snapshot
+    plus at most a month of transactions (see finances.ledger)
+    """
+    
+    club = models.ForeignKey(
+        'clubs.Club',
+        on_delete=models.CASCADE,
+        related_name='monthly_closings',
+        verbose_name=_('club')
+    )
+    
+    # First day of the closed month
+    month = models.DateField(_('mois'))
+    
+    opening_balance = models.DecimalField(_("solde d'ouverture"), max_digits=12, decimal_places=2)
+    income = models.DecimalField(_('entrées'), max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    expenses = models.DecimalField(_('dépenses'), max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    closing_balance = models.DecimalField(_('solde de clôture'), max_digits=12, decimal_places=2)
+    transaction_count = models.PositiveIntegerField(_('nombre de transactions'), default=0)
+    
+    closed_at = models.DateTimeField(_('clôturé le'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('clôture mensuelle')
+        verbose_name_plural = _('clôtures mensuelles')
+        ordering = ['club', '-month']
+        unique_together = ['club', 'month']
+    
+    def __str__(self):
+        return f"{self.club.name} - {self.month:%m/%Y} - {self.closing_balance} FCFA"
 
 
 class ExpenseCategory(models.Model):
@@ -0,0 +1,163 @@
+"""
+Financial reports of a club over a date range
+
+A report gives the totals, the opening and closing balances and two pivots
+of the expenses: month x category and activity x category. Whole months are
+read from the cached monthly rollup (finances.services); only the partial
+months at the edges of the range are queried. Reports are cached by club,
+range and data version.
+"""
+import datetime
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from .ledger import balance_at, month_start, next_month
+from .models import Transaction
+from .services import grouped_rows, monthly_rollups, summary_version
+
+
+ZERO = Decimal('0.00')
+REPORT_TIMEOUT = 60 * 60 * 24
+MONTH_NAMES = [
+    'janvier', 'février', 'mars', 'avril', 'mai', 'juin',
+    'juillet', 'août', 'septembre', 'octobre', 'novembre', 'décembre',
+]
+
+
+def current_semester(day=None):
+    """First and last day of the semester (January-June or July-December) of a date"""
+    day = day or timezone.localdate()
+    if day.month <= 6:
+        return datetime.date(day.year, 1, 1), datetime.date(day.year, 6, 30)
+    return datetime.date(day.year, 7, 1), datetime.date(day.year, 12, 31)
+
+
+def month_label(month):
+    return f"{MONTH_NAMES[month.month - 1]} {month.year}"
+
+
+def _range_rows(club_id, start, end):
+    """Rollup rows of a club restricted to [start, end]"""
+    first_full = start if start.day == 1 else next_month(start)
+    after_full = next_month(end) if next_month(end) - datetime.timedelta(days=1) == end else month_start(end)
+
+    rows = []
+    if first_full < after_full:
+        rows = [
+            row for row in monthly_rollups([club_id])[club_id]
+            if first_full <= row['month'] < after_full
+        ]
+
+    # Partial months at the edges of the range
+    edges = Q()
+    if start < first_full:
+        edges |= Q(transaction_date__gte=start, transaction_date__lt=min(first_full, end + datetime.timedelta(days=1)))
+    if after_full <= end and after_full >= first_full:
+        edges |= Q(transaction_date__gte=after_full, transaction_date__lte=end)
+    if edges:
+        rows += list(grouped_rows(Transaction.objects.filter(edges, club_id=club_id)))
+    return rows
+
+
+def _pivot(rows, key, categories):
+    table = {}
+    for row in rows:
+        if not row['expense_count']:
+            continue
+        cells = table.setdefault(key(row), dict.fromkeys(categories, ZERO))
+        cells[row['category']] += row['expenses']
+    return table
+
+
+def build_report(club_id, start, end):
+    """Report of a club between two dates (inclusive), cached by data version"""
+    key = f'finance_report_{club_id}_{start:%Y%m%d}_{end:%Y%m%d}_v{summary_version(club_id)}'
+    report = cache.get(key)
+    if report is not None:
+        return report
+
+    rows = _range_rows(club_id, start, end)
+    income = sum((row['income'] or ZERO for row in rows), ZERO)
+    expenses = sum((row['expenses'] or ZERO for row in rows), ZERO)
+    categories = sorted({row['category'] for row in rows if row['expense_count']})
+
+    by_month = _pivot(rows, lambda row: row['month'], categories)
+    by_activity = _pivot(rows, lambda row: row['activity__title'] or 'Sans activité', categories)
+    income_by_month = {}
+    for row in rows:
+        income_by_month[row['month']] = income_by_month.get(row['month'], ZERO) + (row['income'] or ZERO)
+
+    report = {
+        'start': start,
+        'end': end,
+        'total_income': income,
+        'total_expenses': expenses,
+        'balance': income - expenses,
+        'opening_balance': balance_at(club_id, start - datetime.timedelta(days=1)),
+        'closing_balance': balance_at(club_id, end),
+        'categories': categories,
+        'category_totals': {
+            category: sum((cells[category] for cells in by_month.values()), ZERO)
+            for category in categories
+        },
+        'month_by_category': [
+            {
+                'month': month,
+                'label': month_label(month),
+                'income': income_by_month.get(month, ZERO),
+                'cells': [by_month.get(month, {}).get(category, ZERO) for category in categories],
+                'total': sum(by_month.get(month, {}).values(), ZERO),
+            }
+            for month in sorted(set(by_month) | set(income_by_month))
+        ],
+        'activity_by_category': sorted(
+            (
+                {
+                    'activity': activity,
+                    'cells': [cells[category] for category in categories],
+                    'total': sum(cells.values(), ZERO),
+                }
+                for activity, cells in by_activity.items()
+            ),
+            key=lambda item: item['total'],
+            reverse=True
+        ),
+    }
+    cache.set(key, report, REPORT_TIMEOUT)
+    return report
+
+
+def report_tables(club, report):
+    """Tables of a report for the PDF/XLSX documents (core.exports.Table)"""
+    from core.exports import Table
+
+    period = f"du {report['start']:%d/%m/%Y} au {report['end']:%d/%m/%Y}"
+    categories = report['categories']
+    return [
+        Table(f"{club.name} - synthèse {period}", ['Indicateur', 'Montant (FCFA)'], [
+            ["Solde d'ouverture", report['opening_balance']],
+            ['Entrées', report['total_income']],
+            ['Dépenses', report['total_expenses']],
+            ['Résultat', report['balance']],
+            ['Solde de clôture', report['closing_balance']],
+        ]),
+        Table(
+            f"{club.name} - dépenses par mois et catégorie",
+            ['Mois', 'Entrées'] + categories + ['Total dépenses'],
+            [
+                [row['label'], row['income']] + row['cells'] + [row['total']]
+                for row in report['month_by_category']
+            ] + [
+                ['Total', report['total_income']]
+                + [report['category_totals'][category] for category in categories]
+                + [report['total_expenses']]
+            ]
+        ),
+        Table(
+            f"{club.name} - dépenses par activité et catégorie",
+            ['Activité'] + categories + ['Total'],
+            [[row['activity']] + row['cells'] + [row['total']] for row in report['activity_by_category']]
+        ),
+    ]
@@ -14,7 +14,7 @@ class TransactionSerializer(serializers.ModelSerializer):
         model = Transaction
         fields = [
             'id', 'club', 'club_name', 'transaction_type',
-            'amount', 'description', 'category', 'transaction_date',
+            'amount', 'description', 'category', 'reference', 'transaction_date',
             'activity', 'activity_title', 'receipt', 'notes', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
@@ -26,6 +26,7 @@ class BudgetSerializer(serializers.ModelSerializer):
     spent_amount = serializers.ReadOnlyField()
     remaining_amount = serializers.ReadOnlyField()
     usage_percentage = serializers.ReadOnlyField()
+    forecast = serializers.SerializerMethodField()
     
     class Meta:
         model = Budget
@@ -33,9 +34,17 @@ class BudgetSerializer(serializers.ModelSerializer):
             'id', 'club', 'club_name', 'title', 'description',
             'start_date', 'end_date', 'allocated_amount',
             'spent_amount', 'remaining_amount', 'usage_percentage',
-            'is_active', 'created_at'
+            'forecast', 'is_active', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
+    
+    def get_forecast(self, obj):
+        """Burn-rate forecast (computed for the whole page by BudgetViewSet)"""
+        forecasts = self.context.get('forecasts') or {}
+        if obj.id not in forecasts:
+            from .forecast import forecast_budgets
+            forecasts = forecast_budgets([obj])
+        return forecasts[obj.id]
 
 
 class CashBalanceSerializer(serializers.ModelSerializer):
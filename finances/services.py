@@ -0,0 +1,133 @@
+"""
+Financial summary of clubs
+
+Totals and breakdowns (per type, category, activity and year) of a club
+are derived from its monthly rollup: sums per category, activity and month
+from a single grouped query with conditional sums, cached per club under a
+version number. The version is the last_updated of the club's CashBalance,
+which every transaction write touches (see finances.signals): it is read
+from the database, so every worker sees a change at once even with a
+per-process cache, and a summary is never stale nor deleted explicitly.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from .models import Transaction, CashBalance
+
+
+ZERO = Decimal('0.00')
+SUMMARY_TIMEOUT = 60 * 60 * 24
+
+
+def _summary_key(club_id, version):
+    return f'finance_summary_{club_id}_v{version}'
+
+
+def summary_version(club_id):
+    """Current version of the financial data of a club (for dependent caches)"""
+    return _versions([club_id])[club_id]
+
+
+def _versions(club_ids):
+    # One indexed lookup; clubs without balance have no transactions yet
+    updated = dict(
+        CashBalance.objects.filter(club_id__in=club_ids).values_list('club_id', 'last_updated')
+    )
+    return {
+        club_id: int(updated[club_id].timestamp() * 1000000) if club_id in updated else 0
+        for club_id in club_ids
+    }
+
+
+def grouped_rows(queryset):
+    """Sums per club, category, activity and month of a transaction queryset"""
+    return (
+        queryset.annotate(month=TruncMonth('transaction_date'))
+        .values('club_id', 'category', 'activity_id', 'activity__title', 'activity__date', 'month')
+        .annotate(
+            income=Sum('amount', filter=Q(transaction_type='INCOME')),
+            expenses=Sum('amount', filter=Q(transaction_type='EXPENSE')),
+            income_count=Count('id', filter=Q(transaction_type='INCOME')),
+            expense_count=Count('id', filter=Q(transaction_type='EXPENSE')),
+        )
+        .order_by()
+    )
+
+
+def monthly_rollups(club_ids):
+    """Monthly rollup rows of each club, from the cache or one query for the missing ones"""
+    keys = {club_id: _summary_key(club_id, version) for club_id, version in _versions(club_ids).items()}
+    cached = cache.get_many(keys.values())
+    rows = {club_id: cached[key] for club_id, key in keys.items() if key in cached}
+
+    missing = [club_id for club_id in club_ids if club_id not in rows]
+    if missing:
+        fetched = {club_id: [] for club_id in missing}
+        for row in grouped_rows(Transaction.objects.filter(club_id__in=missing)):
+            fetched[row.pop('club_id')].append(row)
+        cache.set_many({keys[club_id]: value for club_id, value in fetched.items()}, SUMMARY_TIMEOUT)
+        rows.update(fetched)
+
+    return rows
+
+
+def _summarize(rows, year=None):
+    years = sorted({row['month'].year for row in rows}, reverse=True)
+    if year:
+        rows = [row for row in rows if row['month'].year == int(year)]
+
+    income = sum((row['income'] or ZERO for row in rows), ZERO)
+    expenses = sum((row['expenses'] or ZERO for row in rows), ZERO)
+
+    by_category, by_activity, by_year = {}, {}, {}
+    for row in rows:
+        category = by_category.setdefault(row['category'], {'category': row['category'], 'income': ZERO, 'expenses': ZERO})
+        category['income'] += row['income'] or ZERO
+        category['expenses'] += row['expenses'] or ZERO
+
+        if row['activity_id'] and row['expense_count']:
+            activity = by_activity.setdefault(row['activity_id'], {
+                'activity_id': row['activity_id'],
+                'activity__title': row['activity__title'],
+                'activity__date': row['activity__date'],
+                'total': ZERO,
+                'count': 0,
+            })
+            activity['total'] += row['expenses']
+            activity['count'] += row['expense_count']
+
+        period = by_year.setdefault(row['month'].year, {'year': row['month'].year, 'income': ZERO, 'expenses': ZERO, 'count': 0})
+        period['income'] += row['income'] or ZERO
+        period['expenses'] += row['expenses'] or ZERO
+        period['count'] += row['income_count'] + row['expense_count']
+
+    return {
+        'total_income': income,
+        'total_expenses': expenses,
+        'balance': income - expenses,
+        'transaction_count': sum(row['income_count'] + row['expense_count'] for row in rows),
+        'by_type': {'INCOME': income, 'EXPENSE': expenses},
+        'by_category': sorted(by_category.values(), key=lambda item: item['expenses'], reverse=True),
+        'by_activity': sorted(by_activity.values(), key=lambda item: item['total'], reverse=True),
+        'by_year': [by_year[key] for key in sorted(by_year, reverse=True)],
+        'years': years,
+    }
+
+
+def club_summaries(club_ids, year=None):
+    """Financial summary of several clubs, by club id (at most one query)"""
+    club_ids = list(club_ids)
+    rows = monthly_rollups(club_ids)
+    return {club_id: _summarize(rows[club_id], year) for club_id in club_ids}
+
+
+def club_summary(club_id, year=None):
+    """
+    Financial summary of a club, optionally restricted to a year:
+    total_income, total_expenses, balance, transaction_count, by_type,
+    by_category, by_activity (expenses), by_year and years (all years with
+    transactions)
+    """
+    return club_summaries([club_id], year)[club_id]
@@ -0,0 +1,78 @@
+"""
+Signal handlers for finances app
+
+Keep CashBalance up to date as a ledger: each transaction insert, edit or
+delete applies its signed delta instead of re-aggregating the whole history.
+Writes dated in an already closed month invalidate the monthly closings.
+Every write touches CashBalance.last_updated, even with a zero delta (e.g.
+a new category): it is the version of the cached financial summary, which
+also shows activity titles and dates.
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from core.background import enqueue
+from .ledger import invalidate_closings
+from .models import Transaction, CashBalance, signed_amount
+from .tasks import close_monthly_balances
+
+
+def _invalidate(club_id, day):
+    if invalidate_closings(club_id, day):
+        enqueue(close_monthly_balances, [club_id])
+
+
+@receiver(pre_save, sender=Transaction, dispatch_uid='ledger_transaction_pre_save')
+def transaction_pre_save(sender, instance, raw=False, **kwargs):
+    """Remember the stored values of an edited transaction"""
+    instance._ledger_previous = None
+    if raw or instance.pk is None:
+        return
+    # Locked until the delta is applied (Transaction.save is atomic)
+    instance._ledger_previous = Transaction.objects.select_for_update().filter(pk=instance.pk).values(
+        'club_id', 'transaction_type', 'amount', 'transaction_date'
+    ).first()
+
+
+@receiver(post_save, sender=Transaction, dispatch_uid='ledger_transaction_save')
+def transaction_saved(sender, instance, raw=False, **kwargs):
+    """Apply the difference between the new and the stored transaction"""
+    if raw:
+        return
+    previous = getattr(instance, '_ledger_previous', None)
+    instance._ledger_previous = None
+    delta = signed_amount(instance.transaction_type, instance.amount)
+
+    _invalidate(instance.club_id, instance.transaction_date)
+
+    if previous is None:
+        CashBalance.apply_delta(instance.club_id, delta)
+        return
+
+    old_delta = signed_amount(previous['transaction_type'], previous['amount'])
+    if previous['club_id'] == instance.club_id:
+        CashBalance.apply_delta(instance.club_id, delta - old_delta)
+    else:
+        CashBalance.apply_delta(previous['club_id'], -old_delta)
+        CashBalance.apply_delta(instance.club_id, delta)
+    _invalidate(previous['club_id'], previous['transaction_date'])
+
+
+@receiver(post_delete, sender=Transaction, dispatch_uid='ledger_transaction_delete')
+def transaction_deleted(sender, instance, **kwargs):
+    """Remove the effect of a deleted transaction"""
+    # Never recreate the balance: the club itself may be being deleted
+    CashBalance.apply_delta(
+        instance.club_id,
+        -signed_amount(instance.transaction_type, instance.amount),
+        create=False
+    )
+    _invalidate(instance.club_id, instance.transaction_date)
+
+
+@receiver(post_save, sender='clubs.Activity', dispatch_uid='summary_activity_save')
+@receiver(post_delete, sender='clubs.Activity', dispatch_uid='summary_activity_delete')
+def activity_changed(sender, instance, raw=False, **kwargs):
+    """Renamed or deleted activities change the expenses per activity of the summary"""
+    if not raw:
+        CashBalance.objects.filter(club_id=instance.club_id).update(last_updated=timezone.now())
@@ -0,0 +1,14 @@
+"""
+Background tasks for finances app
+"""
+from core.background import shared_task
+
+
+@shared_task(ignore_result=True)
+def close_monthly_balances(club_ids=None):
+    """
+    Write the missing month-end closings (every club when None)
+    """
+    from .ledger import close_months
+
+    return close_months(club_ids)
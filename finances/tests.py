@@ -1,3 +1,356 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from clubs.models import Activity, Club
+from users.models import User
+from .forecast import forecast_budgets
+from .imports import StatementError, detect_columns, import_statement, parse_amount
+from .ledger import balance_at, close_months, running_ledger
+from .models import Budget, CashBalance, MonthlyClosing, Transaction
+from .reports import build_report
+from .services import club_summary
+
+
+class BudgetUsageTests(TestCase):
+    """Budget usage is computed for every budget of a listing in one query"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='tresorier@example.com',
+            password='secret',
+            first_name='Awa',
+            last_name='Diallo',
+            role='AESI_TREASURER'
+        )
+        cls.club = Club.objects.create(name='Club Test', slug='club-test', type='SPORT', description='Test')
+        start = datetime.date(2025, 1, 1)
+        for month in range(1, 6):
+            Budget.objects.create(
+                club=cls.club,
+                title=f'Budget {month}',
+                description='Test',
+                start_date=start,
+                end_date=datetime.date(2025, month, 28),
+                allocated_amount=Decimal('1000.00')
+            )
+            Transaction.objects.create(
+                club=cls.club,
+                transaction_type='EXPENSE',
+                amount=Decimal('100.00'),
+                description='Dépense',
+                category='Test',
+                transaction_date=datetime.date(2025, month, 15)
+            )
+        # Ignored: income, and an expense outside every budget period
+        Transaction.objects.create(
+            club=cls.club, transaction_type='INCOME', amount=Decimal('500.00'),
+            description='Entrée', category='Test', transaction_date=datetime.date(2025, 2, 1)
+        )
+        Transaction.objects.create(
+            club=cls.club, transaction_type='EXPENSE', amount=Decimal('50.00'),
+            description='Dépense', category='Test', transaction_date=datetime.date(2024, 12, 31)
+        )
+
+    def test_with_usage_matches_properties(self):
+        annotated = {budget.pk: budget for budget in Budget.objects.with_usage()}
+        for budget in Budget.objects.all():
+            self.assertEqual(annotated[budget.pk].spent_amount, budget.spent_amount)
+            self.assertEqual(annotated[budget.pk].usage_percentage, budget.usage_percentage)
+        self.assertEqual(Budget.objects.with_usage().get(title='Budget 3').spent_amount, Decimal('300.00'))
+
+    def test_budget_api_query_count(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('budget-list')
+
+        # Pagination count, the annotated page and the daily expenses of the
+        # forecasts, whatever the number of budgets
+        with self.assertNumQueries(3):
+            response = client.get(url, HTTP_HOST='localhost')
+
+        self.assertEqual(response.status_code, 200)
+        results = {item['title']: item for item in response.json()['results']}
+        self.assertEqual(Decimal(str(results['Budget 5']['spent_amount'])), Decimal('500.00'))
+        self.assertEqual(Decimal(str(results['Budget 5']['remaining_amount'])), Decimal('500.00'))
+        self.assertEqual(Decimal(str(results['Budget 5']['usage_percentage'])), Decimal('50.00'))
+
+
+class BudgetForecastTests(TestCase):
+    """Burn-rate forecasts of several budgets computed in one pass"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.club = Club.objects.create(name='Club Test', slug='club-test', type='SPORT', description='Test')
+        for day, amount in [(1, '100.00'), (5, '300.00'), (6, '50.00'), (20, '999.00')]:
+            Transaction.objects.create(
+                club=cls.club,
+                transaction_type='EXPENSE',
+                amount=Decimal(amount),
+                description='Dépense',
+                category='Test',
+                transaction_date=datetime.date(2025, 3, day)
+            )
+
+    def budget(self, title, allocated, start=datetime.date(2025, 3, 1), end=datetime.date(2025, 3, 31)):
+        return Budget.objects.create(
+            club=self.club, title=title, description='Test',
+            start_date=start, end_date=end, allocated_amount=Decimal(allocated)
+        )
+
+    def test_forecasts(self):
+        budgets = [
+            self.budget('Risque', '1000.00'),
+            self.budget('Dépassé', '350.00'),
+            self.budget('Correct', '5000.00'),
+            self.budget('À venir', '100.00', datetime.date(2025, 5, 1), datetime.date(2025, 6, 30)),
+        ]
+        with self.assertNumQueries(1):
+            forecasts = forecast_budgets(budgets, today=datetime.date(2025, 3, 10))
+        risk, over, ok, upcoming = (forecasts[budget.id] for budget in budgets)
+
+        # 450 spent in 10 days: 45 a day, 1395 projected over 31 days
+        self.assertEqual(risk['spent_to_date'], Decimal('450.00'))
+        self.assertEqual(risk['burn_rate'], Decimal('45.00'))
+        self.assertEqual(risk['projected_spend'], Decimal('1395.00'))
+        self.assertEqual(risk['status'], 'at_risk')
+        self.assertEqual(risk['over_budget_date'], datetime.date(2025, 3, 23))
+
+        self.assertEqual(over['status'], 'over_budget')
+        self.assertEqual(over['over_budget_date'], datetime.date(2025, 3, 5))
+        self.assertEqual(ok['status'], 'on_track')
+        self.assertIsNone(ok['over_budget_date'])
+        self.assertEqual(upcoming['status'], 'upcoming')
+        self.assertEqual(upcoming['spent_to_date'], Decimal('0.00'))
+
+
+class CashBalanceLedgerTests(TestCase):
+    """The ledger deltas always give the same balance as a full recompute"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.club = Club.objects.create(name='Club Test', slug='club-test', type='SPORT', description='Test')
+        cls.other = Club.objects.create(name='Autre club', slug='autre-club', type='SPORT', description='Test')
+
+    def transaction(self, transaction_type, amount, club=None):
+        return Transaction.objects.create(
+            club=club or self.club, transaction_type=transaction_type, amount=Decimal(amount),
+            description='Test', category='Test', transaction_date=datetime.date(2025, 3, 1)
+        )
+
+    def assertLedger(self, *expected):
+        for club, amount in zip((self.club, self.other), expected):
+            balance = CashBalance.objects.get(club=club)
+            self.assertEqual(balance.current_balance, Decimal(amount))
+            balance.update_balance()
+            self.assertEqual(balance.current_balance, Decimal(amount))
+
+    def test_create_edit_move_delete(self):
+        income = self.transaction('INCOME', '500.00')
+        expense = self.transaction('EXPENSE', '120.00')
+        self.transaction('INCOME', '50.00', club=self.other)
+        self.assertLedger('380.00', '50.00')
+
+        expense.amount = Decimal('200.00')
+        expense.save()
+        self.assertLedger('300.00', '50.00')
+
+        expense.transaction_type = 'INCOME'
+        expense.save()
+        self.assertLedger('700.00', '50.00')
+
+        income.club = self.other
+        income.save()
+        self.assertLedger('200.00', '550.00')
+
+        expense.delete()
+        self.assertLedger('0.00', '550.00')
+
+    def test_reconcile_cash_balances(self):
+        self.transaction('INCOME', '500.00')
+        # Bulk writes bypass the ledger signals
+        Transaction.objects.filter(club=self.club).update(amount=Decimal('800.00'))
+
+        out = StringIO()
+        call_command('reconcile_cash_balances', stdout=out)
+        self.assertIn('incohérent', out.getvalue())
+        self.assertEqual(CashBalance.objects.get(club=self.club).current_balance, Decimal('500.00'))
+
+        call_command('reconcile_cash_balances', '--fix', stdout=out)
+        self.assertEqual(CashBalance.objects.get(club=self.club).current_balance, Decimal('800.00'))
+        out = StringIO()
+        call_command('reconcile_cash_balances', stdout=out)
+        self.assertIn('cohérents', out.getvalue())
+
+
+class LedgerHistoryTests(TestCase):
+    """Historical balances read from the closings match a plain sum of the transactions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.club = Club.objects.create(name='Club Test', slug='club-test', type='SPORT', description='Test')
+        for month, day, transaction_type, amount in [
+            (1, 5, 'INCOME', '1000.00'), (1, 20, 'EXPENSE', '250.00'),
+            (2, 10, 'EXPENSE', '100.00'), (3, 1, 'INCOME', '40.00'), (3, 15, 'EXPENSE', '15.50'),
+        ]:
+            Transaction.objects.create(
+                club=cls.club, transaction_type=transaction_type, amount=Decimal(amount),
+                description='Test', category='Test', transaction_date=datetime.date(2025, month, day)
+            )
+
+    def plain_balance(self, day):
+        return sum(
+            (item.amount if item.transaction_type == 'INCOME' else -item.amount
+             for item in Transaction.objects.filter(club=self.club, transaction_date__lte=day)),
+            Decimal('0.00')
+        )
+
+    def assertHistory(self):
+        for day in [datetime.date(2025, 1, 4), datetime.date(2025, 1, 31), datetime.date(2025, 2, 15),
+                    datetime.date(2025, 3, 1), datetime.date(2025, 4, 30)]:
+            self.assertEqual(balance_at(self.club.id, day), self.plain_balance(day))
+
+        opening, transactions = running_ledger(self.club.id, start=datetime.date(2025, 2, 1))
+        self.assertEqual(opening, self.plain_balance(datetime.date(2025, 1, 31)))
+        for item in transactions:
+            # Same-day rows are ordered by creation: no two share a date here
+            self.assertEqual(item.running_balance, self.plain_balance(item.transaction_date))
+
+    def test_balances_before_and_after_back_dated_edit(self):
+        self.assertEqual(close_months([self.club.id], until=datetime.date(2025, 4, 1)), 3)
+        self.assertHistory()
+
+        january = Transaction.objects.get(transaction_date=datetime.date(2025, 1, 20))
+        january.amount = Decimal('300.00')
+        january.save()
+        self.assertFalse(MonthlyClosing.objects.filter(club=self.club).exists())
+        self.assertHistory()
+
+        close_months([self.club.id], until=datetime.date(2025, 4, 1))
+        self.assertHistory()
+
+
+class FinancialSummaryTests(TestCase):
+    """Cached summaries follow every write, versioned by the database"""
+
+    def test_summary_follows_edits_and_activity_renames(self):
+        club = Club.objects.create(name='Club Test', slug='club-test', type='SPORT', description='Test')
+        activity = Activity.objects.create(
+            club=club, title='Tournoi', description='Test', theme='Test',
+            date=datetime.date(2025, 3, 1), location='Campus', status='COMPLETED'
+        )
+        expense = Transaction.objects.create(
+            club=club, transaction_type='EXPENSE', amount=Decimal('80.00'), description='Test',
+            category='Matériel', transaction_date=datetime.date(2025, 3, 1), activity=activity
+        )
+        self.assertEqual(club_summary(club.id)['by_category'][0]['category'], 'Matériel')
+
+        # Same amount: no ledger delta, the summary must still change
+        expense.category = 'Transport'
+        expense.save()
+        activity.title = 'Grand tournoi'
+        activity.save()
+
+        summary = club_summary(club.id)
+        self.assertEqual(summary['by_category'][0]['category'], 'Transport')
+        self.assertEqual(summary['by_activity'][0]['activity__title'], 'Grand tournoi')
+
+
+class FinancialReportTests(TestCase):
+    """Reports mixing cached whole months and queried partial months match plain sums"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.club = Club.objects.create(name='Club Test', slug='club-test', type='SPORT', description='Test')
+        for month, day, transaction_type, amount, category in [
+            (2, 28, 'EXPENSE', '10.00', 'Transport'),
+            (3, 1, 'INCOME', '500.00', 'Cotisations'), (3, 4, 'EXPENSE', '20.00', 'Transport'),
+            (3, 15, 'EXPENSE', '35.00', 'Matériel'), (3, 31, 'EXPENSE', '7.00', 'Matériel'),
+            (4, 10, 'EXPENSE', '40.00', 'Transport'), (5, 2, 'INCOME', '60.00', 'Dons'),
+            (5, 20, 'EXPENSE', '5.00', 'Matériel'),
+        ]:
+            Transaction.objects.create(
+                club=cls.club, transaction_type=transaction_type, amount=Decimal(amount),
+                description='Test', category=category, transaction_date=datetime.date(2025, month, day)
+            )
+
+    def test_ranges(self):
+        for start, end in [
+            (datetime.date(2025, 3, 5), datetime.date(2025, 3, 20)),   # within a month
+            (datetime.date(2025, 3, 15), datetime.date(2025, 5, 10)),  # starts and ends mid-month
+            (datetime.date(2025, 3, 15), datetime.date(2025, 4, 30)),  # starts mid-month
+            (datetime.date(2025, 3, 1), datetime.date(2025, 5, 31)),   # whole months
+        ]:
+            with self.subTest(start=start, end=end):
+                report = build_report(self.club.id, start, end)
+                rows = Transaction.objects.filter(club=self.club, transaction_date__range=(start, end))
+                expenses = rows.filter(transaction_type='EXPENSE')
+
+                self.assertEqual(report['total_income'], sum(
+                    (row.amount for row in rows.filter(transaction_type='INCOME')), Decimal('0.00')
+                ))
+                self.assertEqual(report['total_expenses'], sum((row.amount for row in expenses), Decimal('0.00')))
+                self.assertEqual(report['category_totals'], {
+                    category: sum((row.amount for row in expenses if row.category == category), Decimal('0.00'))
+                    for category in {row.category for row in expenses}
+                })
+                self.assertEqual(
+                    report['closing_balance'] - report['opening_balance'], report['total_income'] - report['total_expenses']
+                )
+
+
+class StatementImportTests(TestCase):
+    """Statement lines are parsed leniently and imported once"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.club = Club.objects.create(name='Club Test', slug='club-test', type='SPORT', description='Test')
+
+    def test_parse_amount(self):
+        for text, expected in [
+            ('1 500', '1500.00'), ('1.500', '1500.00'), ('1,500', '1500.00'), ('-2.500,50', '-2500.50'),
+            ('2,500.50', '2500.50'), ('12,5', '12.50'), ('(300) FCFA', '-300.00'), ('300-', '-300.00'),
+            ('1.234.567', '1234567.00'), ('0.75', '0.75'),
+        ]:
+            self.assertEqual(parse_amount(text), Decimal(expected), text)
+        self.assertIsNone(parse_amount(' FCFA '))
+
+    def test_detect_columns(self):
+        headers = ['Date de valeur', 'Libellé', 'Débit', 'Crédit', 'Réf.']
+        self.assertEqual(detect_columns(headers), {'date': 0, 'description': 1, 'debit': 2, 'credit': 3, 'reference': 4})
+        self.assertEqual(detect_columns(['Jour', 'Somme'], {'date': 'jour', 'amount': 'SOMME'}), {'date': 0, 'amount': 1})
+        with self.assertRaises(StatementError):
+            detect_columns(['Libellé', 'Montant'])
+
+    def test_reimport_is_idempotent(self):
+        statement = (
+            'Banque Atlantique;Relevé de compte\n'
+            'Compte;0123456789\n'
+            '\n'
+            'Date;Libellé;Montant;Type;Référence\n'
+            '01/03/2025;Cotisations;5 000;Crédit;R-1\n'
+            '01/03/2025;Remboursement;5 000;Débit;R-1\n'
+            '02/03/2025;Transport;-1 200,50;;\n'
+            '02/03/2025;Transport;-1 200,50;;\n'
+            '03/03/2025;Illisible;abc;;\n'
+        ).encode('utf-8')
+
+        result = import_statement(self.club, statement)
+        # Same reference but another type, identical lines without reference: all distinct
+        self.assertEqual((result['created'], result['duplicates'], result['error_count']), (4, 0, 1))
+        self.assertEqual(CashBalance.objects.get(club=self.club).current_balance, Decimal('-2401.00'))
+
+        result = import_statement(self.club, statement)
+        self.assertEqual((result['created'], result['duplicates']), (0, 4))
+        self.assertEqual(Transaction.objects.filter(club=self.club).count(), 4)
 
-# Create your tests here.
+    def test_unreadable_csv(self):
+        statement = ('Date;Montant\n01/03/2025;"100\n' + 'x' * 200000).encode('utf-8')
+        with self.assertRaises(StatementError):
+            import_statement(self.club, statement)
+        self.assertFalse(Transaction.objects.exists())
@@ -10,6 +10,7 @@ urlpatterns = [
     # Transaction management
     path('club/<slug:club_slug>/', views.club_finances, name='club_finances'),
     path('club/<slug:club_slug>/add-transaction/', views.add_transaction, name='add_transaction'),
+    path('club/<slug:club_slug>/import/', views.import_transactions, name='import_transactions'),
     path('transaction/<int:pk>/edit/', views.edit_transaction, name='edit_transaction'),
     path('transaction/<int:pk>/delete/', views.delete_transaction, name='delete_transaction'),
     
@@ -20,4 +21,6 @@ urlpatterns = [
     
     # Reports
     path('club/<slug:club_slug>/reports/', views.financial_reports, name='financial_reports'),
+    path('club/<slug:club_slug>/ledger/', views.club_ledger, name='club_ledger'),
+    path('reports/', views.all_clubs_reports, name='all_clubs_reports'),
 ]
@@ -4,7 +4,8 @@ Views for finances app
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Sum, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from core.permissions import CanViewFinancialData
@@ -12,6 +13,9 @@ from clubs.models import Club
 from .models import Transaction, Budget, CashBalance, ExpenseCategory
 from .serializers import TransactionSerializer, BudgetSerializer, CashBalanceSerializer
 from .forms import TransactionForm, BudgetForm
+from .ledger import balance_at, running_ledger
+from .reports import build_report, current_semester
+from .services import club_summary
 
 
 # Template views
@@ -34,18 +38,12 @@ def club_finances(request, club_slug):
     recent_transactions = Transaction.objects.filter(club=club)[:10]
     
     # Calculate totals
-    total_income = Transaction.objects.filter(
-        club=club,
-        transaction_type='INCOME'
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    total_expenses = Transaction.objects.filter(
-        club=club,
-        transaction_type='EXPENSE'
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    summary = club_summary(club.id)
+    total_income = summary['total_income']
+    total_expenses = summary['total_expenses']
     
     # Get active budgets
-    active_budgets = Budget.objects.filter(club=club, is_active=True)
+    active_budgets = Budget.objects.filter(club=club, is_active=True).with_usage()
     
     context = {
         'club': club,
@@ -75,12 +73,9 @@ def add_transaction(request, club_slug):
             transaction = form.save(commit=False)
             transaction.club = club
             transaction.created_by = request.user
+            # The cash balance ledger is updated by finances.signals
             transaction.save()
             
-            # Update cash balance
-            cash_balance, _ = CashBalance.objects.get_or_create(club=club)
-            cash_balance.update_balance()
-            
             messages.success(request, "Transaction ajoutée avec succès!")
             return redirect('finances:club_finances', club_slug=club_slug)
     else:
@@ -94,6 +89,56 @@ def add_transaction(request, club_slug):
     return render(request, 'finances/add_transaction.html', context)
 
 
+@login_required
+def import_transactions(request, club_slug):
+    """Import the lines of a bank or mobile-money statement (CSV)"""
+    from .forms import StatementImportForm
+    from .imports import StatementError, import_statement
+    
+    club = get_object_or_404(Club, slug=club_slug)
+    
+    # Check permissions - Only club executives can modify finances
+    if not request.user.can_modify_finances(club):
+        messages.error(request, "Vous n'avez pas la permission d'importer des transactions.")
+        return redirect('clubs:club_budget', slug=club_slug)
+    
+    result = None
+    if request.method == 'POST':
+        form = StatementImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                result = import_statement(
+                    club,
+                    form.cleaned_data['file'],
+                    user=request.user,
+                    category=form.cleaned_data['category'],
+                    encoding=form.cleaned_data['encoding'],
+                    columns=form.columns(),
+                    dry_run=form.cleaned_data['dry_run']
+                )
+            except StatementError as exc:
+                form.add_error('file', str(exc))
+            else:
+                if not form.cleaned_data['dry_run']:
+                    messages.success(
+                        request,
+                        f"{result['created']} transaction(s) importée(s), {result['duplicates']} doublon(s) ignoré(s)."
+                    )
+                    if not result['error_count']:
+                        return redirect('clubs:club_budget', slug=club_slug)
+    else:
+        form = StatementImportForm()
+    
+    context = {
+        'club': club,
+        'form': form,
+        'result': result,
+        'dry_run': form.is_bound and form.is_valid() and form.cleaned_data['dry_run'],
+    }
+    
+    return render(request, 'finances/import_transactions.html', context)
+
+
 @login_required
 def edit_transaction(request, pk):
     """Edit a transaction"""
@@ -111,9 +156,6 @@ def edit_transaction(request, pk):
             transaction.updated_by = request.user
             transaction.save()
             
-            # Update cash balance
-            transaction.club.cash_balance.update_balance()
-            
             messages.success(request, "Transaction modifiée avec succès!")
             return redirect('finances:club_finances', club_slug=transaction.club.slug)
     else:
@@ -141,10 +183,6 @@ def delete_transaction(request, pk):
     if request.method == 'POST':
         transaction.delete()
         
-        # Update cash balance
-        cash_balance = CashBalance.objects.get(club__slug=club_slug)
-        cash_balance.update_balance()
-        
         messages.success(request, "Transaction supprimée avec succès!")
         return redirect('finances:club_finances', club_slug=club_slug)
     
@@ -161,7 +199,7 @@ def club_budgets(request, club_slug):
         messages.error(request, "Vous n'avez pas accès aux budgets.")
         return redirect('clubs:club_detail', slug=club_slug)
     
-    budgets = Budget.objects.filter(club=club)
+    budgets = Budget.objects.filter(club=club).with_usage()
     
     context = {
         'club': club,
@@ -205,7 +243,7 @@ def add_budget(request, club_slug):
 @login_required
 def budget_detail(request, pk):
     """Budget detail page"""
-    budget = get_object_or_404(Budget, pk=pk)
+    budget = get_object_or_404(Budget.objects.with_usage().select_related('club'), pk=pk)
     
     # Check permissions
     if not (request.user.is_club_executive or request.user.is_staff):
@@ -229,33 +267,124 @@ def budget_detail(request, pk):
 
 @login_required
 def financial_reports(request, club_slug):
-    """Financial reports page"""
+    """Financial reports page: pivots of a period, PDF/XLSX generated in the background"""
     club = get_object_or_404(Club, slug=club_slug)
     
     # Check permissions
-    if not (request.user.is_club_executive or request.user.is_staff):
+    if not request.user.can_view_finances(club):
         messages.error(request, "Vous n'avez pas accès aux rapports financiers.")
         return redirect('clubs:club_detail', slug=club_slug)
     
-    # Get all transactions
-    transactions = Transaction.objects.filter(club=club)
+    # Period (?start=YYYY-MM-DD&end=YYYY-MM-DD), current semester by default
+    start, end = _report_period(request)
+    
+    if request.GET.get('generate'):
+        from core.exports import document_response
+        return document_response(
+            request,
+            'financial_report',
+            {'clubs': [club.id], 'start': start.isoformat(), 'end': end.isoformat()},
+            request.GET['generate']
+        )
     
-    # Category breakdown
-    category_breakdown = transactions.filter(
-        transaction_type='EXPENSE'
-    ).values('category').annotate(
-        total=Sum('amount')
-    ).order_by('-total')
+    report = build_report(club.id, start, end)
     
     context = {
         'club': club,
-        'transactions': transactions,
-        'category_breakdown': category_breakdown,
+        'report': report,
+        'category_breakdown': [
+            {'category': category, 'total': total}
+            for category, total in sorted(report['category_totals'].items(), key=lambda item: item[1], reverse=True)
+        ],
+        'start': start,
+        'end': end,
+        'opening_balance': report['opening_balance'],
+        'closing_balance': report['closing_balance'],
     }
     
     return render(request, 'finances/financial_reports.html', context)
 
 
+@login_required
+def all_clubs_reports(request):
+    """End-of-period financial report of every club (AESI treasurer)"""
+    if not request.user.can_view_finances():
+        messages.error(request, "Vous n'avez pas accès aux rapports financiers.")
+        return redirect('core:home')
+    
+    start, end = _report_period(request)
+    
+    if request.GET.get('generate'):
+        from core.exports import document_response
+        return document_response(
+            request,
+            'financial_report',
+            {'start': start.isoformat(), 'end': end.isoformat()},
+            request.GET['generate']
+        )
+    
+    context = {
+        'start': start,
+        'end': end,
+        'clubs': Club.objects.filter(is_active=True).order_by('name'),
+    }
+    
+    return render(request, 'finances/all_clubs_reports.html', context)
+
+
+def _report_period(request):
+    """Period of a report: ?start=&end=, the current semester by default"""
+    start, end = _period(request)
+    default_start, default_end = current_semester()
+    start, end = start or default_start, end or default_end
+    if end < start:
+        start, end = end, start
+    return start, end
+
+
+def _period(request):
+    """Start and end dates of the ?start=&end= query parameters (None if missing or invalid)"""
+    dates = []
+    for name in ('start', 'end'):
+        try:
+            dates.append(parse_date(request.GET.get(name, '')))
+        except ValueError:
+            dates.append(None)
+    return dates
+
+
+@login_required
+def club_ledger(request, club_slug):
+    """Club ledger: transactions of a period with the running balance"""
+    from django.core.paginator import Paginator
+    
+    club = get_object_or_404(Club, slug=club_slug)
+    
+    # Check permissions
+    if not request.user.can_view_finances(club):
+        messages.error(request, "Vous n'avez pas accès aux données financières.")
+        return redirect('clubs:club_detail', slug=club_slug)
+    
+    # Current year by default
+    start, end = _period(request)
+    if start is None:
+        start = timezone.localdate().replace(month=1, day=1)
+    
+    opening_balance, entries = running_ledger(club.id, start, end)
+    page = Paginator(entries, 50).get_page(request.GET.get('page', 1))
+    
+    context = {
+        'club': club,
+        'start': start,
+        'end': end,
+        'opening_balance': opening_balance,
+        'closing_balance': balance_at(club.id, end or timezone.localdate()),
+        'entries': page,
+    }
+    
+    return render(request, 'finances/club_ledger.html', context)
+
+
 # API ViewSets
 class TransactionViewSet(viewsets.ModelViewSet):
     """ViewSet for Transaction model"""
@@ -264,7 +393,8 @@ class TransactionViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, CanViewFinancialData]
     
     def get_queryset(self):
-        queryset = Transaction.objects.all()
+        # The club is also read by the object permissions
+        queryset = Transaction.objects.select_related('club', 'activity')
         
         # Filter by club
         club_id = self.request.query_params.get('club', None)
@@ -286,7 +416,7 @@ class BudgetViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, CanViewFinancialData]
     
     def get_queryset(self):
-        queryset = Budget.objects.all()
+        queryset = Budget.objects.with_usage().select_related('club')
         
         # Filter by club
         club_id = self.request.query_params.get('club', None)
@@ -294,11 +424,20 @@ class BudgetViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(club_id=club_id)
         
         return queryset
+    
+    def get_serializer(self, *args, **kwargs):
+        # Forecast all the budgets of a list in one pass
+        if kwargs.get('many') and args:
+            from .forecast import forecast_budgets
+            budgets = list(args[0])
+            args = (budgets,) + args[1:]
+            kwargs['context'] = dict(self.get_serializer_context(), forecasts=forecast_budgets(budgets))
+        return super().get_serializer(*args, **kwargs)
 
 
 class CashBalanceViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for CashBalance model (read-only)"""
-    queryset = CashBalance.objects.all()
+    queryset = CashBalance.objects.select_related('club')
     serializer_class = CashBalanceSerializer
     permission_classes = [IsAuthenticated, CanViewFinancialData]
 
@@ -18,14 +18,14 @@ class ParticipationAdmin(admin.ModelAdmin):
         'user__first_name', 'user__last_name',
         'user__email', 'activity__title'
     ]
-    readonly_fields = ['created_at', 'otp_verified_at', 'submitted_at']
+    readonly_fields = ['created_at', 'otp_verified_at', 'submitted_at', 'sync_key']
     
     fieldsets = (
         ('Informations de base', {
             'fields': ('activity', 'user')
         }),
         ('Vérification OTP', {
-            'fields': ('otp_verified', 'otp_verified_at')
+            'fields': ('otp_verified', 'otp_verified_at', 'sync_key')
         }),
         ('Feedback', {
             'fields': ('appreciation', 'suggestion', 'rating')
@@ -46,16 +46,14 @@ class ParticipationStatsAdmin(admin.ModelAdmin):
         'total_wins', 'updated_at'
     ]
     search_fields = ['user__first_name', 'user__last_name', 'user__email']
-    readonly_fields = ['updated_at']
+    readonly_fields = ['club_type_counts', 'updated_at']
     
     actions = ['update_stats']
     
     def update_stats(self, request, queryset):
         """Action to update stats for selected users"""
-        count = 0
-        for stats in queryset:
-            stats.update_stats()
-            count += 1
+        user_ids = list(queryset.values_list('user_id', flat=True))
+        count = ParticipationStats.refresh_for_users(user_ids)
         self.message_user(
             request,
             f'{count} statistiques mises à jour avec succès.'
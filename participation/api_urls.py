@@ -1,9 +1,14 @@
 """
 API URL configuration for participation app
 """
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ParticipationViewSet, generate_otp_api, verify_otp_api
+from . import views, async_views
+from .views import ParticipationViewSet, generate_otp_api, sync_checkins_api, form_funnel_api
+
+# OTP check-in: async version when the platform is served by an ASGI server
+checkin_views = async_views if settings.PARTICIPATION_ASYNC_VIEWS else views
 
 router = DefaultRouter()
 router.register(r'participations', ParticipationViewSet)
@@ -11,5 +16,7 @@ router.register(r'participations', ParticipationViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('generate-otp/<int:activity_id>/', generate_otp_api, name='generate_otp_api'),
-    path('verify-otp/', verify_otp_api, name='verify_otp_api'),
+    path('verify-otp/', checkin_views.verify_otp_api, name='verify_otp_api'),
+    path('sync-checkins/', sync_checkins_api, name='sync_checkins_api'),
+    path('forms/<int:activity_id>/funnel/', form_funnel_api, name='form_funnel_api'),
 ]
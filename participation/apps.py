@@ -5,3 +5,6 @@ class ParticipationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'participation'
     verbose_name = 'Participation'
+
+    def ready(self):
+        from . import signals  # noqa: F401
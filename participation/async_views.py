@@ -0,0 +1,293 @@
+"""
+Async views for participation app
+
+ASGI counterparts of the OTP check-in views. During a check-in burst most of
+the request time is spent waiting on the cache and the database; served by an
+ASGI server (uvicorn, daphne) these views let one worker handle many students
+at once instead of blocking a sync worker per request.
+
+They are routed instead of the sync views when PARTICIPATION_ASYNC_VIEWS is
+enabled (see participation/urls.py).
+"""
+import json
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth import get_user
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render, redirect
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+from clubs.models import Activity
+from core.utils import (
+    averify_otp, aget_otp_expiry,
+    mark_otp_verified, is_otp_verified, clear_otp_verified, read_checkin_token
+)
+from core.pubsub import subscribe
+from .models import Participation
+from .counters import arecord_form_event
+from .live import activity_channel, get_snapshot
+from .forms import ParticipationForm
+
+
+arender = sync_to_async(render)
+
+
+def async_login_required(view_func):
+    """login_required for async views (Django 4.2 decorator is sync only)"""
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        # Resolve the lazy user outside the event loop (session + DB lookup)
+        request.user = await sync_to_async(get_user)(request)
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return wrapper
+
+
+async def _aget_activity_or_404(activity_id):
+    try:
+        return await Activity.objects.select_related('club').aget(id=activity_id)
+    except Activity.DoesNotExist:
+        raise Http404("Activité introuvable")
+
+
+def _get_api_user(request):
+    """
+    Authenticate like the DRF views (DEFAULT_AUTHENTICATION_CLASSES)
+
+    Raises APIException (e.g. CSRF failure of a session-authenticated
+    request, invalid token) with the status DRF would answer.
+    """
+    from rest_framework.request import Request
+    from rest_framework.settings import api_settings
+
+    drf_request = Request(
+        request,
+        authenticators=[authentication() for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    # SessionAuthentication runs the CSRF check for session users
+    return drf_request.user
+
+
+async def _ais_otp_verified(request, activity_id):
+    # Signed cookie check is pure CPU, session check may hit the database
+    if settings.OTP_FLAG_STORAGE == 'cookie':
+        return is_otp_verified(request, activity_id)
+    return await sync_to_async(is_otp_verified)(request, activity_id)
+
+
+@async_login_required
+async def verify_otp_view(request, activity_id):
+    """Verify OTP and allow access to participation form"""
+    activity = await _aget_activity_or_404(activity_id)
+
+    if request.method == 'POST':
+        otp_code = request.POST.get('otp_code', '').strip()
+
+        is_valid, message = await averify_otp(activity_id, otp_code)
+
+        if is_valid:
+            response = redirect('participation:participation_form', activity_id=activity_id)
+            if settings.OTP_FLAG_STORAGE == 'cookie':
+                return mark_otp_verified(request, response, activity_id)
+            return await sync_to_async(mark_otp_verified)(request, response, activity_id)
+        else:
+            messages.error(request, message)
+
+    expiry_time = await aget_otp_expiry(activity_id)
+
+    context = {
+        'activity': activity,
+        'expiry_time': expiry_time,
+    }
+
+    return await arender(request, 'participation/verify_otp.html', context)
+
+
+@async_login_required
+async def checkin_token_view(request, token):
+    """Check in by scanning the activity QR code (signed token instead of OTP)"""
+    checkin = read_checkin_token(token)
+    
+    if checkin is None:
+        messages.error(request, "QR code expiré ou invalide. Demandez le code OTP à l'organisateur.")
+        return redirect('core:home')
+    
+    # The flag does not outlive the QR code
+    activity_id, expires_at = checkin
+    max_age = expires_at - time.time()
+    response = redirect('participation:participation_form', activity_id=activity_id)
+    if settings.OTP_FLAG_STORAGE == 'cookie':
+        return mark_otp_verified(request, response, activity_id, max_age)
+    return await sync_to_async(mark_otp_verified)(request, response, activity_id, max_age)
+
+
+@async_login_required
+async def participation_form(request, activity_id):
+    """Participation form (requires OTP verification)"""
+    activity = await _aget_activity_or_404(activity_id)
+
+    if not await _ais_otp_verified(request, activity_id):
+        messages.error(request, "Veuillez d'abord vérifier le code OTP.")
+        return redirect('participation:verify_otp', activity_id=activity_id)
+
+    participation, created = await Participation.objects.aget_or_create(
+        activity=activity,
+        user=request.user
+    )
+
+    if not created and participation.submitted_at:
+        messages.info(request, "Vous avez déjà soumis votre participation pour cette activité.")
+        return redirect('clubs:activity_detail', pk=activity_id)
+
+    await arecord_form_event(activity_id, 'access')
+
+    context = {
+        'activity': activity,
+        'participation': participation,
+    }
+
+    return await arender(request, 'participation/participation_form.html', context)
+
+
+@async_login_required
+async def submit_participation(request, activity_id):
+    """Submit participation form"""
+    activity = await _aget_activity_or_404(activity_id)
+
+    if not await _ais_otp_verified(request, activity_id):
+        messages.error(request, "Veuillez d'abord vérifier le code OTP.")
+        return redirect('participation:verify_otp', activity_id=activity_id)
+
+    try:
+        participation = await Participation.objects.aget(activity=activity, user=request.user)
+    except Participation.DoesNotExist:
+        raise Http404("Participation introuvable")
+
+    if request.method == 'POST':
+        form = ParticipationForm(request.POST, request.FILES, instance=participation)
+        if await sync_to_async(form.is_valid)():
+            participation = form.save(commit=False)
+            participation.otp_verified = True
+            participation.otp_verified_at = timezone.now()
+            participation.submitted_at = timezone.now()
+            await participation.asave()
+            await arecord_form_event(activity_id, 'submission')
+
+            messages.success(request, "Votre participation a été enregistrée avec succès!")
+
+            response = redirect('clubs:activity_detail', pk=activity_id)
+            if settings.OTP_FLAG_STORAGE == 'cookie':
+                return clear_otp_verified(request, response, activity_id)
+            return await sync_to_async(clear_otp_verified)(request, response, activity_id)
+    else:
+        form = ParticipationForm(instance=participation)
+
+    context = {
+        'activity': activity,
+        'form': form,
+    }
+
+    return await arender(request, 'participation/submit_participation.html', context)
+
+
+async def verify_otp_api(request):
+    """API endpoint to verify OTP (same contract as the DRF version)"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    # DRF default permission: IsAuthenticatedOrReadOnly
+    try:
+        user = await sync_to_async(_get_api_user)(request)
+    except APIException as exc:
+        return JsonResponse({'detail': str(exc.detail)}, status=exc.status_code)
+    if not user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'},
+            status=403
+        )
+
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    else:
+        data = request.POST
+
+    activity_id = data.get('activity_id')
+    otp_code = data.get('otp_code')
+
+    if not activity_id or not otp_code:
+        return JsonResponse(
+            {'error': 'activity_id and otp_code are required'},
+            status=400
+        )
+
+    activity = await _aget_activity_or_404(activity_id)
+    is_valid, message = await averify_otp(activity_id, otp_code)
+
+    if is_valid:
+        return JsonResponse({
+            'valid': True,
+            'message': message,
+            'activity': activity.title
+        })
+    else:
+        return JsonResponse({
+            'valid': False,
+            'message': message
+        }, status=400)
+
+
+# Like DRF api_view: exempt from CsrfViewMiddleware, the CSRF check is made by
+# SessionAuthentication in _get_api_user for session users only (JWT clients
+# have no CSRF token). csrf_exempt only supports async views from Django 5.0.
+verify_otp_api.csrf_exempt = True
+
+
+# Comment line sent when nothing happened, so proxies keep the stream open
+SSE_HEARTBEAT_SECONDS = 15
+# Streams are closed after this delay; EventSource reconnects by itself
+SSE_MAX_SECONDS = 30 * 60
+
+
+def _sse_event(data):
+    return f"data: {json.dumps(data, default=str)}\n\n"
+
+
+@async_login_required
+async def live_activity(request, activity_id):
+    """Server-sent events: live participant counter of an activity (ASGI only)"""
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Live updates require an ASGI server'}, status=501)
+
+    activity = await _aget_activity_or_404(activity_id)
+
+    if not await sync_to_async(request.user.can_manage_club)(activity.club):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    async def events():
+        # Subscribe before reading the snapshot so no check-in is missed
+        subscription = await subscribe(activity_channel(activity.id))
+        try:
+            yield "retry: 3000\n\n"
+            yield _sse_event(await sync_to_async(get_snapshot)(activity.id))
+
+            deadline = time.monotonic() + SSE_MAX_SECONDS
+            while time.monotonic() < deadline:
+                message = await subscription.get(SSE_HEARTBEAT_SECONDS)
+                yield _sse_event(message) if message is not None else ": keep-alive\n\n"
+        finally:
+            await subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,159 @@
+"""
+Access / submission counters of participation forms
+
+During a check-in burst every student opens and submits the same form, so
+incrementing DynamicParticipationForm columns directly turns one row into a
+write hot spot. With FORM_COUNTERS_BUFFERED the increments go to the cache
+(atomic incr) and flush_form_counters() adds them to the database
+periodically with one F() update per form. Otherwise each event is a single
+atomic F() update.
+
+Each event is also counted in a per-minute bucket kept in the cache only,
+which feeds the live check-in funnel (see form_funnel).
+
+Both rely on a cache shared by the workers (settings.CACHE_IS_SHARED): with
+a per-process cache each worker would only see its own events, and the
+flush task the buffer of its own process. Events are then written to the
+database directly and no per-minute series is kept.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+
+EVENTS = ('access', 'submission')
+FIELDS = {'access': 'access_count', 'submission': 'submission_count'}
+
+# Per-minute buckets are kept this long
+SERIES_TTL = 6 * 60 * 60
+FLUSH_LOCK_KEY = 'form_counters_flush_lock'
+
+
+def _pending_key(activity_id, event):
+    return f'form_counter_{activity_id}_{event}'
+
+
+def _series_key(activity_id, event, minute):
+    return f'form_series_{activity_id}_{event}_{minute:%Y%m%d%H%M}'
+
+
+def _incr(key, timeout=None):
+    # incr() fails on a missing key; add() is a no-op when it exists
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:  # expired between add() and incr()
+        cache.set(key, 1, timeout)
+        return 1
+
+
+async def _aincr(key, timeout=None):
+    await cache.aadd(key, 0, timeout)
+    try:
+        return await cache.aincr(key)
+    except ValueError:
+        await cache.aset(key, 1, timeout)
+        return 1
+
+
+def _forms(activity_id):
+    from .models import DynamicParticipationForm
+    return DynamicParticipationForm.objects.filter(activity_id=activity_id)
+
+
+def record_form_event(activity_id, event):
+    """Count an access to / a submission of the participation form of an activity"""
+    if settings.CACHE_IS_SHARED:
+        _incr(_series_key(activity_id, event, timezone.now()), SERIES_TTL)
+    
+    if settings.FORM_COUNTERS_BUFFERED:
+        _incr(_pending_key(activity_id, event))
+    else:
+        _forms(activity_id).update(**{FIELDS[event]: F(FIELDS[event]) + 1})
+
+
+async def arecord_form_event(activity_id, event):
+    """Async version of record_form_event (for ASGI views)"""
+    if settings.CACHE_IS_SHARED:
+        await _aincr(_series_key(activity_id, event, timezone.now()), SERIES_TTL)
+    
+    if settings.FORM_COUNTERS_BUFFERED:
+        await _aincr(_pending_key(activity_id, event))
+    else:
+        await _forms(activity_id).aupdate(**{FIELDS[event]: F(FIELDS[event]) + 1})
+
+
+def pending_counts(activity_ids):
+    """Buffered increments not yet written, as {activity_id: {event: n}}"""
+    keys = {
+        _pending_key(activity_id, event): (activity_id, event)
+        for activity_id in activity_ids
+        for event in EVENTS
+    }
+    pending = {}
+    for key, value in cache.get_many(keys).items():
+        if value:
+            activity_id, event = keys[key]
+            pending.setdefault(activity_id, {})[event] = value
+    return pending
+
+
+def flush_form_counters():
+    """
+    Add the buffered increments to DynamicParticipationForm
+    
+    Returns the number of forms updated.
+    """
+    from .models import DynamicParticipationForm
+    
+    # A concurrent flush would add the same deltas twice
+    if not cache.add(FLUSH_LOCK_KEY, 1, 60):
+        return 0
+    
+    try:
+        since = timezone.now() - timedelta(seconds=SERIES_TTL)
+        activity_ids = DynamicParticipationForm.objects.filter(
+            otp_expires_at__gte=since
+        ).values_list('activity_id', flat=True)
+        
+        updated = 0
+        for activity_id, deltas in pending_counts(list(activity_ids)).items():
+            # Database first: if the update fails the deltas stay buffered
+            _forms(activity_id).update(**{
+                FIELDS[event]: F(FIELDS[event]) + delta
+                for event, delta in deltas.items()
+            })
+            # decr() rather than delete(): increments made meanwhile are kept
+            for event, delta in deltas.items():
+                cache.decr(_pending_key(activity_id, event), delta)
+            updated += 1
+        return updated
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+def form_funnel(activity_id, minutes=60):
+    """
+    Per-minute accesses and submissions of a form over the last minutes
+    (cache only, no database access); empty without a shared cache
+    """
+    if not settings.CACHE_IS_SHARED:
+        return []
+    
+    now = timezone.now().replace(second=0, microsecond=0)
+    slots = [now - timedelta(minutes=offset) for offset in range(minutes - 1, -1, -1)]
+    keys = {
+        _series_key(activity_id, event, minute): (minute, event)
+        for minute in slots
+        for event in EVENTS
+    }
+    values = cache.get_many(keys)
+    
+    series = {minute: {'minute': minute.isoformat(), 'access': 0, 'submission': 0} for minute in slots}
+    for key, value in values.items():
+        minute, event = keys[key]
+        series[minute][event] = value
+    return [series[minute] for minute in slots]
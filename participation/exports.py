@@ -0,0 +1,65 @@
+"""
+Exports of participation app (see core.exports)
+"""
+from core.exports import Column, ExportDefinition, register_export
+from .models import Participation
+
+
+def _date(value, fmt='%d/%m/%Y'):
+    return value.strftime(fmt) if value else '-'
+
+
+def participant_columns(with_activity=False, attendance=None):
+    """
+    Columns of the participant exports (per activity or per club); with
+    ``attendance`` (UserManager.attendance of the participants), the
+    attendance percentage of each participant
+    """
+    columns = [
+        Column('last_name', 'Nom', 'user.last_name'),
+        Column('first_name', 'Prénom', 'user.first_name'),
+        Column('email', 'Email', 'user.email'),
+        Column('filiere', 'Filière', lambda p: p.user.get_filiere_display() or '-'),
+        Column('niveau', 'Niveau', lambda p: p.user.get_niveau_display() or '-'),
+        Column('gender', 'Sexe', lambda p: p.user.get_gender_display() or '-'),
+        Column('phone', 'Téléphone', lambda p: p.user.phone or '-'),
+    ]
+    if with_activity:
+        columns += [
+            Column('activity', 'Activité', 'activity.title'),
+            Column('activity_date', 'Date activité', lambda p: _date(p.activity.date)),
+        ]
+    if attendance is not None:
+        columns.append(
+            Column('attendance', 'Taux de présence (%)', lambda p: attendance.get(p.user_id, {}).get('percentage', 0))
+        )
+    columns += [
+        Column('rating', 'Note', lambda p: p.rating or '-'),
+        Column('submitted_at', 'Date de participation', lambda p: _date(p.submitted_at, '%d/%m/%Y %H:%M')),
+    ]
+    return columns
+
+
+@register_export('activity_participants')
+def activity_participants(params):
+    """Verified participants of an activity"""
+    from clubs.models import Activity
+    from users.models import User
+    
+    activity = Activity.objects.get(id=params['activity'])
+    participations = Participation.objects.filter(
+        activity=activity,
+        otp_verified=True
+    ).select_related('user').order_by('-created_at')
+    
+    if params.get('year'):
+        participations = participations.filter(activity__date__year=params['year'])
+    
+    # Attendance in the activities of the club, computed once for all the rows
+    attendance = User.objects.attendance(participations.values('user_id'), club=activity.club_id)
+    
+    return ExportDefinition(
+        participations,
+        participant_columns(attendance=attendance),
+        f'participants_{activity.title}'
+    )
@@ -0,0 +1,61 @@
+"""
+Live participant counter of an activity
+
+Each time a participation is verified, a snapshot (count, average rating,
+latest check-ins) is computed once, cached and published to the activity
+channel. Organizer screens receive it over SSE (see async_views.live_activity),
+so their number does not change the database load.
+"""
+from django.core.cache import cache
+from django.db.models import Avg, Count, F
+from core.pubsub import publish
+from .models import Participation
+
+
+LATEST_CHECKINS = 10
+SNAPSHOT_TIMEOUT = 60 * 60 * 6
+
+
+def activity_channel(activity_id):
+    return f'activity_{activity_id}'
+
+
+def _snapshot_key(activity_id):
+    return f'live_activity_{activity_id}'
+
+
+def build_snapshot(activity_id):
+    """Participant count, average rating and latest check-ins of an activity"""
+    verified = Participation.objects.filter(activity_id=activity_id, otp_verified=True)
+    totals = verified.aggregate(count=Count('id'), rating=Avg('rating'))
+    latest = verified.select_related('user').order_by(F('otp_verified_at').desc(nulls_last=True), '-id')[:LATEST_CHECKINS]
+
+    return {
+        'activity': activity_id,
+        'count': totals['count'],
+        'average_rating': round(totals['rating'], 2) if totals['rating'] else None,
+        'latest': [
+            {
+                'name': participation.user.get_full_name(),
+                'at': participation.otp_verified_at.isoformat() if participation.otp_verified_at else None,
+            }
+            for participation in latest
+        ],
+    }
+
+
+def get_snapshot(activity_id):
+    """Current snapshot, from the cache when available"""
+    snapshot = cache.get(_snapshot_key(activity_id))
+    if snapshot is None:
+        snapshot = build_snapshot(activity_id)
+        cache.set(_snapshot_key(activity_id), snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def publish_snapshot(activity_id):
+    """Recompute the snapshot of an activity and push it to live screens"""
+    snapshot = build_snapshot(activity_id)
+    cache.set(_snapshot_key(activity_id), snapshot, SNAPSHOT_TIMEOUT)
+    publish(activity_channel(activity_id), snapshot)
+    return snapshot
@@ -0,0 +1,188 @@
+"""
+Benchmark the OTP check-in endpoint: WSGI (sync) path vs ASGI (async) path
+
+Both paths go through the full middleware stack, at the same concurrency:
+the sync view is driven by a pool of threads (one sync worker per thread),
+the async view by concurrent tasks on a single event loop.
+
+A second table compares the cost of one check-in with the OTP form
+(cache lookup + flag) and with the signed QR code token (HMAC check only).
+
+Usage:
+    python manage.py benchmark_checkin --requests 500 --concurrency 20
+"""
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, AsyncClient, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+
+from clubs.models import Activity
+from core.utils import generate_otp, store_otp, invalidate_otp, make_checkin_token
+from participation import views, async_views
+
+
+# Dedicated URLconf so both versions can be called in the same process
+urlpatterns = [
+    path('wsgi/verify-otp/', views.verify_otp_api),
+    path('asgi/verify-otp/', async_views.verify_otp_api),
+    path('otp/verify/<int:activity_id>/', views.verify_otp_view),
+    path('qr/checkin/<str:token>/', views.checkin_token_view),
+    # Targets of the check-in redirects
+    path('participation/', include('participation.urls')),
+]
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, int(round(percent / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+def _summarize(label, latencies, elapsed):
+    return {
+        'label': label,
+        'requests': len(latencies),
+        'throughput': len(latencies) / elapsed if elapsed else 0,
+        'p50': _percentile(latencies, 50) * 1000,
+        'p99': _percentile(latencies, 99) * 1000,
+        'mean': statistics.mean(latencies) * 1000,
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare throughput and p99 latency of the sync and async OTP check-in"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--activity', type=int, help="Activity id (defaults to the latest one)")
+
+    def handle(self, *args, **options):
+        from users.models import User
+
+        activity = (
+            Activity.objects.filter(id=options['activity']).first()
+            if options['activity'] else Activity.objects.order_by('-id').first()
+        )
+        if activity is None:
+            raise CommandError("Aucune activité disponible pour le benchmark.")
+
+        user, _ = User.objects.get_or_create(
+            email='benchmark-checkin@aesi.local',
+            defaults={'first_name': 'Benchmark', 'last_name': 'Check-in'}
+        )
+
+        otp_code = generate_otp()
+        store_otp(activity.id, otp_code, validity_minutes=30)
+        payload = {'activity_id': activity.id, 'otp_code': otp_code}
+        token = make_checkin_token(activity.id, timezone.now() + timedelta(minutes=30))
+        total, concurrency = options['requests'], options['concurrency']
+
+        try:
+            with override_settings(ROOT_URLCONF=__name__, ALLOWED_HOSTS=['*']):
+                results = [
+                    self._run_sync('WSGI', user, '/wsgi/verify-otp/', payload, 200, total, concurrency),
+                    self._run_async(user, payload, total, concurrency),
+                ]
+                checkins = [
+                    self._run_sync(
+                        'OTP', user, f'/otp/verify/{activity.id}/', {'otp_code': otp_code}, 302,
+                        total, concurrency, json=False
+                    ),
+                    self._run_sync('QR', user, f'/qr/checkin/{token}/', None, 302, total, concurrency),
+                ]
+                for result in checkins:
+                    result['queries'] = self._count_queries(user, result['url'], result['data'])
+        finally:
+            invalidate_otp(activity.id)
+            user.delete()
+
+        self.stdout.write(
+            f"{total} requêtes, concurrence {concurrency}, "
+            f"activité #{activity.id}"
+        )
+        self.stdout.write(f"{'chemin':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'moy. ms':>10}")
+        for result in results:
+            self.stdout.write(
+                f"{result['label']:<8}{result['throughput']:>10.1f}{result['p50']:>10.2f}"
+                f"{result['p99']:>10.2f}{result['mean']:>10.2f}"
+            )
+
+        self.stdout.write("")
+        self.stdout.write("Coût d'un check-in (formulaire OTP vs QR code signé)")
+        self.stdout.write(
+            f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'moy. ms':>10}{'req. SQL':>10}"
+        )
+        for result in checkins:
+            self.stdout.write(
+                f"{result['label']:<8}{result['throughput']:>10.1f}{result['p50']:>10.2f}"
+                f"{result['p99']:>10.2f}{result['mean']:>10.2f}{result['queries']:>10}"
+            )
+        otp, qr = checkins
+        if qr['mean']:
+            self.stdout.write(f"QR code : {otp['mean'] / qr['mean']:.1f}x moins coûteux par check-in (moyenne)")
+
+    def _count_queries(self, user, url, data):
+        """SQL queries issued by one check-in request"""
+        client = Client()
+        client.force_login(user)
+        with CaptureQueriesContext(connection) as context:
+            if data is None:
+                client.get(url)
+            else:
+                client.post(url, data)
+        return len(context.captured_queries)
+
+    def _run_sync(self, label, user, url, data, expected_status, total, concurrency, json=True):
+        def worker(count):
+            client = Client()
+            client.force_login(user)
+            latencies = []
+            for _ in range(count):
+                start = time.perf_counter()
+                if data is None:
+                    response = client.get(url)
+                elif json:
+                    response = client.post(url, data, content_type='application/json')
+                else:
+                    response = client.post(url, data)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != expected_status:
+                    raise CommandError(f"{label}: réponse inattendue {response.status_code}")
+            return latencies
+
+        shares = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = [lat for chunk in pool.map(worker, shares) for lat in chunk]
+        return dict(_summarize(label, latencies, time.perf_counter() - start), url=url, data=data)
+
+    def _run_async(self, user, payload, total, concurrency):
+        client = AsyncClient()
+        client.force_login(user)
+
+        async def one(semaphore, latencies):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post('/asgi/verify-otp/', payload, content_type='application/json')
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise CommandError(f"ASGI: réponse inattendue {response.status_code}")
+
+        async def run():
+            semaphore = asyncio.Semaphore(concurrency)
+            latencies = []
+            start = time.perf_counter()
+            await asyncio.gather(*(one(semaphore, latencies) for _ in range(total)))
+            return latencies, time.perf_counter() - start
+
+        latencies, elapsed = asyncio.run(run())
+        return _summarize('ASGI', latencies, elapsed)
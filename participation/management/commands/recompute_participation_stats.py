@@ -0,0 +1,19 @@
+"""
+Recompute participation statistics in bulk
+
+Usage:
+    python manage.py recompute_participation_stats [--user ID ...]
+"""
+from django.core.management.base import BaseCommand
+from participation.models import ParticipationStats
+
+
+class Command(BaseCommand):
+    help = "Recompute ParticipationStats from grouped queries (every user by default)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help="Limit to a user id (repeatable)")
+
+    def handle(self, *args, **options):
+        count = ParticipationStats.refresh_for_users(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f"{count} statistique(s) de participation mise(s) à jour."))
@@ -0,0 +1,31 @@
+"""
+Middleware for participation app
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from core.utils import clear_otp_flags
+
+
+class OTPFlagLogoutMiddleware:
+    """Delete the OTP flag cookies of the browser when the user logs out"""
+
+    # Async capable: the async check-in views are not moved to a thread under ASGI
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._clear_flags(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._clear_flags(request, await self.get_response(request))
+
+    def _clear_flags(self, request, response):
+        if getattr(request, 'clear_otp_flags', False):
+            clear_otp_flags(request, response)
+        return response
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:58
+
+from django.db import migrations, models
+
+
+LEGACY_COLUMNS = {
+    'INFORMATIQUE': 'informatique_count',
+    'ANGLAIS': 'anglais_count',
+    'ART_ORATOIRE': 'art_oratoire_count',
+    'SPORT': 'sport_count',
+}
+
+
+def copy_counts(apps, schema_editor):
+    ParticipationStats = apps.get_model('participation', 'ParticipationStats')
+    rows = list(ParticipationStats.objects.all())
+    for stats in rows:
+        stats.club_type_counts = {
+            club_type: getattr(stats, column)
+            for club_type, column in LEGACY_COLUMNS.items()
+            if getattr(stats, column)
+        }
+    ParticipationStats.objects.bulk_update(rows, ['club_type_counts'], batch_size=500)
+
+
+def restore_counts(apps, schema_editor):
+    ParticipationStats = apps.get_model('participation', 'ParticipationStats')
+    rows = list(ParticipationStats.objects.all())
+    for stats in rows:
+        for club_type, column in LEGACY_COLUMNS.items():
+            setattr(stats, column, stats.club_type_counts.get(club_type, 0))
+    ParticipationStats.objects.bulk_update(rows, list(LEGACY_COLUMNS.values()), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('participation', '0003_dynamicparticipationform'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participationstats',
+            name='club_type_counts',
+            field=models.JSONField(blank=True, default=dict, verbose_name='participations par type de club'),
+        ),
+        migrations.RunPython(copy_counts, restore_counts),
+        migrations.RemoveField(
+            model_name='participationstats',
+            name='anglais_count',
+        ),
+        migrations.RemoveField(
+            model_name='participationstats',
+            name='art_oratoire_count',
+        ),
+        migrations.RemoveField(
+            model_name='participationstats',
+            name='informatique_count',
+        ),
+        migrations.RemoveField(
+            model_name='participationstats',
+            name='sport_count',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('participation', '0004_participationstats_club_type_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participation',
+            name='sync_key',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='clé de synchronisation'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('participation', '0005_participation_sync_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(fields=['activity', 'otp_verified'], name='participation_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(fields=['user', 'otp_verified'], name='participation_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(condition=models.Q(('otp_verified', True)), fields=['activity', '-otp_verified_at'], name='participation_verified_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:29
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('participation', '0006_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='participation',
+            name='photo1',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.BlobStorage(), upload_to='participation/photos/', verbose_name='photo 1'),
+        ),
+        migrations.AlterField(
+            model_name='participation',
+            name='photo2',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.BlobStorage(), upload_to='participation/photos/', verbose_name='photo 2'),
+        ),
+        migrations.AlterField(
+            model_name='participation',
+            name='photo3',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.BlobStorage(), upload_to='participation/photos/', verbose_name='photo 3'),
+        ),
+    ]
@@ -5,6 +5,7 @@ from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
 from core.models import TimeStampedModel
+from core.storage import blob_storage
 
 
 class Participation(TimeStampedModel):
@@ -42,18 +43,21 @@ class Participation(TimeStampedModel):
     photo1 = models.ImageField(
         _('photo 1'),
         upload_to='participation/photos/',
+        storage=blob_storage,
         blank=True,
         null=True
     )
     photo2 = models.ImageField(
         _('photo 2'),
         upload_to='participation/photos/',
+        storage=blob_storage,
         blank=True,
         null=True
     )
     photo3 = models.ImageField(
         _('photo 3'),
         upload_to='participation/photos/',
+        storage=blob_storage,
         blank=True,
         null=True
     )
@@ -61,11 +65,24 @@ class Participation(TimeStampedModel):
     # Track submission
     submitted_at = models.DateTimeField(_('soumis le'), null=True, blank=True)
     
+    # Idempotency key of check-ins recorded offline by an organizer device
+    sync_key = models.CharField(_('clé de synchronisation'), max_length=64, unique=True, null=True, blank=True)
+    
     class Meta:
         verbose_name = _('participation')
         verbose_name_plural = _('participations')
         ordering = ['-created_at']
         unique_together = ['activity', 'user']
+        indexes = [
+            models.Index(fields=['activity', 'otp_verified'], name='participation_activity_idx'),
+            models.Index(fields=['user', 'otp_verified'], name='participation_user_idx'),
+            # Verified check-ins of an activity, latest first (counts, live screens)
+            models.Index(
+                fields=['activity', '-otp_verified_at'],
+                condition=models.Q(otp_verified=True),
+                name='participation_verified_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.activity.title}"
@@ -96,11 +113,8 @@ class ParticipationStats(models.Model):
     total_participations = models.IntegerField(_('total participations'), default=0)
     average_rating = models.FloatField(_('note moyenne'), default=0.0)
     
-    # Per club stats
-    informatique_count = models.IntegerField(_('participations informatique'), default=0)
-    anglais_count = models.IntegerField(_('participations anglais'), default=0)
-    art_oratoire_count = models.IntegerField(_('participations art oratoire'), default=0)
-    sport_count = models.IntegerField(_('participations sport'), default=0)
+    # Per club type stats ({club type: verified participations})
+    club_type_counts = models.JSONField(_('participations par type de club'), default=dict, blank=True)
     
     # Achievements
     total_wins = models.IntegerField(_('total victoires'), default=0)
@@ -117,35 +131,92 @@ class ParticipationStats(models.Model):
     
     def update_stats(self):
         """Update participation statistics"""
-        from clubs.models import Club, Winner
+        type(self).refresh_for_users([self.user_id])
+        self.refresh_from_db()
+    
+    @classmethod
+    def refresh_for_users(cls, user_ids=None, batch_size=500):
+        """
+        Recompute the statistics of the given users (every user when None)
+        
+        Counts and ratings come from one grouped query over verified
+        participations, wins from a second one; rows are then written with
+        bulk_create / bulk_update. Returns the number of rows written.
+        """
+        from django.db.models import Count, Sum
+        from django.utils import timezone
+        from clubs.models import Winner
+        
+        participations = Participation.objects.filter(otp_verified=True)
+        winners = Winner.objects.all()
+        existing = cls.objects.all()
+        
+        if user_ids is not None:
+            user_ids = set(user_ids)
+            if not user_ids:
+                return 0
+            participations = participations.filter(user_id__in=user_ids)
+            winners = winners.filter(participant_id__in=user_ids)
+            existing = existing.filter(user_id__in=user_ids)
+        
+        def empty():
+            return {
+                'total_participations': 0,
+                'rating_sum': 0,
+                'rating_count': 0,
+                'club_type_counts': {},
+                'total_wins': 0,
+            }
+        
+        computed = {}
+        rows = participations.values('user_id', 'activity__club__type').annotate(
+            count=Count('id'),
+            rating_sum=Sum('rating'),
+            rating_count=Count('rating'),
+        ).order_by()
         
-        participations = self.user.participations.filter(otp_verified=True)
+        for row in rows.iterator():
+            data = computed.setdefault(row['user_id'], empty())
+            data['total_participations'] += row['count']
+            data['rating_sum'] += row['rating_sum'] or 0
+            data['rating_count'] += row['rating_count']
+            data['club_type_counts'][row['activity__club__type']] = row['count']
         
-        self.total_participations = participations.count()
+        wins = winners.values('participant_id').annotate(count=Count('id')).order_by()
+        for row in wins.iterator():
+            data = computed.setdefault(row['participant_id'], empty())
+            data['total_wins'] = row['count']
         
-        # Calculate average rating
-        ratings = participations.exclude(rating__isnull=True).values_list('rating', flat=True)
-        if ratings:
-            self.average_rating = sum(ratings) / len(ratings)
+        now = timezone.now()
+        existing = {stats.user_id: stats for stats in existing.iterator()}
+        to_create, to_update = [], []
         
-        # Count per club type
-        self.informatique_count = participations.filter(
-            activity__club__type='INFORMATIQUE'
-        ).count()
-        self.anglais_count = participations.filter(
-            activity__club__type='ANGLAIS'
-        ).count()
-        self.art_oratoire_count = participations.filter(
-            activity__club__type='ART_ORATOIRE'
-        ).count()
-        self.sport_count = participations.filter(
-            activity__club__type='SPORT'
-        ).count()
+        # Users whose participations/wins are all gone are reset to zero
+        for user_id in set(computed) | set(existing):
+            data = computed.get(user_id) or empty()
+            stats = existing.get(user_id)
+            if stats is None:
+                stats = cls(user_id=user_id)
+                to_create.append(stats)
+            else:
+                to_update.append(stats)
+            
+            stats.total_participations = data['total_participations']
+            stats.average_rating = (
+                data['rating_sum'] / data['rating_count'] if data['rating_count'] else 0.0
+            )
+            stats.club_type_counts = data['club_type_counts']
+            stats.total_wins = data['total_wins']
+            stats.updated_at = now
         
-        # Count wins
-        self.total_wins = Winner.objects.filter(participant=self.user).count()
+        cls.objects.bulk_create(to_create, batch_size=batch_size)
+        cls.objects.bulk_update(
+            to_update,
+            ['total_participations', 'average_rating', 'club_type_counts', 'total_wins', 'updated_at'],
+            batch_size=batch_size
+        )
         
-        self.save()
+        return len(to_create) + len(to_update)
 
 
 class DynamicParticipationForm(TimeStampedModel):
@@ -195,11 +266,11 @@ class DynamicParticipationForm(TimeStampedModel):
         return timezone.now() > self.otp_expires_at
     
     def increment_access(self):
-        """Increment access count"""
-        self.access_count += 1
-        self.save(update_fields=['access_count'])
+        """Increment access count (buffered in the cache or atomic F() update)"""
+        from .counters import record_form_event
+        record_form_event(self.activity_id, 'access')
     
     def increment_submission(self):
-        """Increment submission count"""
-        self.submission_count += 1
-        self.save(update_fields=['submission_count'])
+        """Increment submission count (buffered in the cache or atomic F() update)"""
+        from .counters import record_form_event
+        record_form_event(self.activity_id, 'submission')
@@ -4,6 +4,7 @@ Serializers for participation app
 from rest_framework import serializers
 from .models import Participation, ParticipationStats
 from users.serializers import UserMinimalSerializer
+from core.serializers import ImageRenditionsField
 
 
 class ParticipationSerializer(serializers.ModelSerializer):
@@ -12,6 +13,9 @@ class ParticipationSerializer(serializers.ModelSerializer):
     activity_title = serializers.CharField(source='activity.title', read_only=True)
     club_name = serializers.CharField(source='activity.club.name', read_only=True)
     is_completed = serializers.ReadOnlyField()
+    photo1_renditions = ImageRenditionsField(source='photo1')
+    photo2_renditions = ImageRenditionsField(source='photo2')
+    photo3_renditions = ImageRenditionsField(source='photo3')
     
     class Meta:
         model = Participation
@@ -19,6 +23,7 @@ class ParticipationSerializer(serializers.ModelSerializer):
             'id', 'activity', 'activity_title', 'club_name', 'user',
             'otp_verified', 'otp_verified_at', 'appreciation',
             'suggestion', 'rating', 'photo1', 'photo2', 'photo3',
+            'photo1_renditions', 'photo2_renditions', 'photo3_renditions',
             'submitted_at', 'is_completed', 'created_at'
         ]
         read_only_fields = [
@@ -35,7 +40,29 @@ class ParticipationStatsSerializer(serializers.ModelSerializer):
         model = ParticipationStats
         fields = [
             'id', 'user', 'total_participations', 'average_rating',
-            'informatique_count', 'anglais_count', 'art_oratoire_count',
-            'sport_count', 'total_wins', 'updated_at'
+            'club_type_counts', 'total_wins', 'updated_at'
         ]
         read_only_fields = ['id', 'updated_at']
+
+
+class CheckinSyncItemSerializer(serializers.Serializer):
+    """One check-in recorded offline by an organizer device"""
+    key = serializers.CharField(max_length=64)
+    user_id = serializers.IntegerField(required=False)
+    email = serializers.EmailField(required=False)
+    checked_in_at = serializers.DateTimeField()
+    
+    def validate(self, attrs):
+        if not attrs.get('user_id') and not attrs.get('email'):
+            raise serializers.ValidationError('user_id or email is required')
+        return attrs
+
+
+class CheckinSyncSerializer(serializers.Serializer):
+    """Batch of offline check-ins for one activity"""
+    activity_id = serializers.IntegerField()
+    checkins = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=500
+    )
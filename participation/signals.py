@@ -0,0 +1,67 @@
+"""
+Signal handlers for participation app
+
+Keep ParticipationStats up to date when a participation is verified,
+un-verified, edited or deleted and when a winner is recorded, by refreshing
+only the users involved (cached profile summaries are versioned from the
+database, see participation.summary).
+Verified participations are also pushed to the live activity screens.
+The OTP flag cookies are dropped on logout (see OTPFlagLogoutMiddleware).
+"""
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from core.background import enqueue
+from .live import publish_snapshot
+from .models import Participation
+from .tasks import refresh_participation_stats
+
+
+@receiver(pre_save, sender=Participation, dispatch_uid='stats_participation_pre_save')
+def participation_saving(sender, instance, update_fields=None, **kwargs):
+    """Remember the stored verification flag, so un-verifying is noticed too"""
+    if instance._state.adding:
+        instance._stored_otp_verified = False
+    elif update_fields is not None and 'otp_verified' not in update_fields:
+        instance._stored_otp_verified = instance.otp_verified
+    else:
+        stored = sender.objects.filter(pk=instance.pk).values_list('otp_verified', flat=True).first()
+        instance._stored_otp_verified = bool(stored)
+
+
+@receiver(post_save, sender=Participation, dispatch_uid='stats_participation_save')
+def participation_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Refresh stats when a verified participation changes or its verification does"""
+    was_verified = getattr(instance, '_stored_otp_verified', instance.otp_verified)
+    # Participations are created unverified when the form is opened
+    if not (instance.otp_verified or was_verified):
+        return
+    if (was_verified == instance.otp_verified and update_fields is not None
+            and 'rating' not in update_fields):
+        return
+    enqueue(refresh_participation_stats, [instance.user_id])
+    # In the web process: the in-process broker only reaches local subscribers
+    transaction.on_commit(lambda: publish_snapshot(instance.activity_id))
+
+
+@receiver(post_delete, sender=Participation, dispatch_uid='stats_participation_delete')
+def participation_deleted(sender, instance, **kwargs):
+    """Refresh stats when a verified participation is removed"""
+    if instance.otp_verified:
+        enqueue(refresh_participation_stats, [instance.user_id])
+        transaction.on_commit(lambda: publish_snapshot(instance.activity_id))
+
+
+@receiver(post_save, sender='clubs.Winner', dispatch_uid='stats_winner_save')
+@receiver(post_delete, sender='clubs.Winner', dispatch_uid='stats_winner_delete')
+def winner_changed(sender, instance, **kwargs):
+    """Refresh the win count of the participant"""
+    enqueue(refresh_participation_stats, [instance.participant_id])
+
+
+@receiver(user_logged_out, dispatch_uid='otp_flags_logout')
+def user_logged_out_handler(sender, request, **kwargs):
+    """Ask OTPFlagLogoutMiddleware to delete the OTP flag cookies"""
+    if request is not None:
+        request.clear_otp_flags = True
@@ -0,0 +1,157 @@
+"""
+Profile summary of a user
+
+Everything the profile page and the "my stats" API show about the
+participations of a user: verified participations per club, average rating,
+wins, streaks of consecutive months and the latest participations. It is
+built from four queries and cached as plain tuples, together with the
+version of the user's data it was built from. The version is read from the
+database (counts and last modification dates of the participations, their
+activities and clubs, and the wins of the user), so every worker sees a
+change at once even with a per-process cache: a read is one query, made of
+one indexed subquery per table, and a cache get.
+"""
+import datetime
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+
+SUMMARY_TIMEOUT = 60 * 60 * 24
+RECENT_COUNT = 10
+
+
+def _summary_key(user_id):
+    return f'profile_summary_{user_id}'
+
+
+def _per_user(queryset, user_field, aggregate):
+    """Aggregate of the rows of a user, as a subquery (no join with the other tables)"""
+    return Subquery(
+        queryset.filter(**{user_field: OuterRef('pk')}).order_by()
+        .values(user_field).annotate(value=aggregate).values('value')
+    )
+
+
+def summary_version(user_id):
+    """Version of the data behind the summary of a user (one query)"""
+    from clubs.models import Activity, Club, Winner
+    from users.models import User
+    from .models import Participation
+
+    version = User.objects.filter(pk=user_id).values_list(
+        _per_user(Participation.objects, 'user', Count('id')),
+        _per_user(Participation.objects, 'user', Max('updated_at')),
+        _per_user(Activity.objects, 'participations__user', Max('updated_at')),
+        _per_user(Club.objects, 'activities__participations__user', Max('updated_at')),
+        _per_user(Winner.objects, 'participant', Count('id')),
+        _per_user(Winner.objects, 'participant', Max('updated_at')),
+    ).first() or ()
+    return tuple(value.isoformat() if hasattr(value, 'isoformat') else value for value in version)
+
+
+def _month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def _streaks(months):
+    """Longest run of consecutive months, and the run ending on the last month"""
+    longest = run = 0
+    previous = None
+    for month in months:
+        run = run + 1 if previous is not None and month == previous + 1 else 1
+        longest = max(longest, run)
+        previous = month
+    return longest, run
+
+
+def _compute(user_id):
+    from clubs.models import Winner
+    from .models import Participation
+
+    participations = Participation.objects.filter(user_id=user_id, otp_verified=True)
+
+    clubs = participations.values(
+        'activity__club_id', 'activity__club__name', 'activity__club__slug'
+    ).annotate(count=Count('id'), rating_sum=Sum('rating'), rating_count=Count('rating')).order_by()
+    clubs = sorted(clubs, key=lambda row: (-row['count'], row['activity__club__name']))
+
+    months = sorted({_month_index(day) for day in participations.dates('activity__date', 'month')})
+    longest, last_run = _streaks(months)
+
+    recent = participations.values_list(
+        'activity_id', 'activity__title', 'activity__club__name', 'activity__date', 'rating'
+    ).order_by('-created_at')[:RECENT_COUNT]
+
+    wins = Winner.objects.filter(participant_id=user_id).aggregate(count=Count('id'), best=Min('rank'))
+
+    rating_count = sum(row['rating_count'] for row in clubs)
+    rating_sum = sum(row['rating_sum'] or 0 for row in clubs)
+    return (
+        sum(row['count'] for row in clubs),
+        round(rating_sum / rating_count, 2) if rating_count else None,
+        wins['count'],
+        wins['best'],
+        longest,
+        last_run,
+        months[-1] if months else None,
+        tuple(
+            (row['activity__club_id'], row['activity__club__name'], row['activity__club__slug'], row['count'])
+            for row in clubs
+        ),
+        tuple(
+            (activity_id, title, club, day.toordinal(), rating)
+            for activity_id, title, club, day, rating in recent
+        ),
+    )
+
+
+def _expand(data):
+    total, average_rating, wins, best_rank, longest, last_run, last_month, clubs, recent = data
+    # A streak is current while the last active month is this month or the previous one
+    current = _month_index(timezone.localdate())
+    return {
+        'total_participations': total,
+        'average_rating': average_rating,
+        'wins': wins,
+        'best_rank': best_rank,
+        'longest_streak': longest,
+        'current_streak': last_run if last_month is not None and current - last_month <= 1 else 0,
+        'clubs': [
+            {'id': club_id, 'name': name, 'slug': slug, 'count': count}
+            for club_id, name, slug, count in clubs
+        ],
+        'recent': [
+            {
+                'activity_id': activity_id,
+                'title': title,
+                'club': club,
+                'date': datetime.date.fromordinal(day),
+                'rating': rating,
+            }
+            for activity_id, title, club, day, rating in recent
+        ],
+        'recent_activity_ids': [item[0] for item in recent],
+    }
+
+
+def profile_summary(user_id):
+    """
+    Summary of a user: total_participations, average_rating (None without
+    ratings), wins, best_rank, longest_streak and current_streak (months),
+    clubs (id, name, slug, count; most attended first) and recent (the last
+    verified participations: activity_id, title, club, date, rating)
+    """
+    summary_key = _summary_key(user_id)
+    version = summary_version(user_id)
+
+    stored = cache.get(summary_key)
+    if stored is not None and stored[0] == version:
+        return _expand(stored[1])
+
+    # The version is read before the queries: a change made meanwhile gives
+    # another version and the summary stored here is never served
+    data = _compute(user_id)
+    cache.set(summary_key, (version, data), SUMMARY_TIMEOUT)
+    return _expand(data)
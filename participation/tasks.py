@@ -0,0 +1,24 @@
+"""
+Background tasks for participation app
+"""
+from core.background import shared_task
+
+
+@shared_task(ignore_result=True)
+def refresh_participation_stats(user_ids=None):
+    """
+    Recompute ParticipationStats for the given users (every user when None)
+    """
+    from .models import ParticipationStats
+
+    return ParticipationStats.refresh_for_users(user_ids)
+
+
+@shared_task(ignore_result=True)
+def flush_form_counters():
+    """
+    Write the buffered form access/submission counters to the database
+    """
+    from .counters import flush_form_counters as flush
+
+    return flush()
@@ -1,3 +1,233 @@
-from django.test import TestCase
+import datetime
+import json
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from clubs.models import Activity, Club
+from core.utils import make_checkin_token, store_otp
+from users.models import User
+from .async_views import verify_otp_api
+from .counters import record_form_event
+from .models import DynamicParticipationForm, Participation, ParticipationStats
+
+
+@override_settings(OTP_FLAG_STORAGE='cookie')
+class OTPFlagTests(TestCase):
+    """The signed OTP flag cookie only opens the form for the user who verified the code"""
+
+    @classmethod
+    def setUpTestData(cls):
+        club = Club.objects.create(name='Club Test', slug='club-test', type='SPORT', description='Test')
+        cls.activity = Activity.objects.create(
+            club=club, title='Activité', description='Test', theme='Test',
+            date=datetime.date(2025, 3, 1), location='Campus', status='ONGOING'
+        )
+        cls.alice = User.objects.create_user(email='alice@example.com', password='secret')
+        cls.bob = User.objects.create_user(email='bob@example.com', password='secret')
+
+    def test_flag_bound_to_user_and_dropped_on_logout(self):
+        store_otp(self.activity.id, '123456')
+        form_url = reverse('participation:participation_form', args=[self.activity.id])
+        flag = f'otp_verified_{self.activity.id}'
+
+        self.client.force_login(self.alice)
+        self.client.post(
+            reverse('participation:verify_otp', args=[self.activity.id]),
+            {'otp_code': '123456'}, HTTP_HOST='localhost'
+        )
+        cookie = self.client.cookies[flag].value
+        self.assertEqual(self.client.get(form_url, HTTP_HOST='localhost').status_code, 200)
+
+        # Same cookie, another user
+        self.client.force_login(self.bob)
+        self.client.cookies[flag] = cookie
+        response = self.client.get(form_url, HTTP_HOST='localhost')
+        self.assertRedirects(response, reverse('participation:verify_otp', args=[self.activity.id]),
+                             fetch_redirect_response=False)
+
+        self.client.force_login(self.alice)
+        self.client.cookies[flag] = cookie
+        self.client.post(reverse('account_logout'), HTTP_HOST='localhost')
+        self.assertEqual(self.client.cookies[flag].value, '')
+
+    def test_checkin_token_flag_capped_at_token_validity(self):
+        token = make_checkin_token(self.activity.id, timezone.now() + datetime.timedelta(minutes=10))
+        url = reverse('participation:checkin_token', args=[token])
+
+        response = self.client.get(url, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn(f'otp_verified_{self.activity.id}', self.client.cookies)
+
+        self.client.force_login(self.alice)
+        self.client.get(url, HTTP_HOST='localhost')
+        max_age = self.client.cookies[f'otp_verified_{self.activity.id}']['max-age']
+        self.assertTrue(590 <= int(max_age) <= 600)
+
+
+class AsyncVerifyOTPAPITests(TestCase):
+    """The async OTP API authenticates like DRF: CSRF is enforced for session users only"""
+
+    @classmethod
+    def setUpTestData(cls):
+        club = Club.objects.create(name='Club Test', slug='club-test', type='SPORT', description='Test')
+        cls.activity = Activity.objects.create(
+            club=club, title='Activité', description='Test', theme='Test',
+            date=datetime.date(2025, 3, 1), location='Campus', status='ONGOING'
+        )
+        cls.user = User.objects.create_user(email='alice@example.com', password='secret')
+
+    def post(self, **extra):
+        request = RequestFactory().post(
+            '/api/participation/verify-otp/', {'activity_id': self.activity.id, 'otp_code': '123456'},
+            HTTP_HOST='localhost', **extra
+        )
+        request.user = AnonymousUser() if 'HTTP_AUTHORIZATION' in extra else self.user
+        return async_to_sync(verify_otp_api)(request)
+
+    def test_csrf_enforced_for_session_users(self):
+        store_otp(self.activity.id, '123456')
+
+        response = self.post()
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('CSRF', json.loads(response.content)['detail'])
+
+        response = self.post(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(response.content)['valid'])
+
+
+class ParticipationStatsSignalTests(TestCase):
+    """Stats follow the verification of a participation in both directions"""
+
+    def test_verify_then_unverify(self):
+        club = Club.objects.create(name='Club Test', slug='club-test', type='SPORT', description='Test')
+        activity = Activity.objects.create(
+            club=club, title='Activité', description='Test', theme='Test',
+            date=datetime.date(2025, 3, 1), location='Campus', status='COMPLETED'
+        )
+        user = User.objects.create_user(email='alice@example.com', password='secret')
+        participation = Participation.objects.create(activity=activity, user=user)
+
+        for verified, expected in [(True, 1), (False, 0)]:
+            participation.otp_verified = verified
+            with self.captureOnCommitCallbacks(execute=True):
+                participation.save()
+            self.assertEqual(ParticipationStats.objects.get(user=user).total_participations, expected)
+
+
+class SyncCheckinsAPITests(TestCase):
+    """Offline check-ins are idempotent per key and rejected item by item"""
+
+    @classmethod
+    def setUpTestData(cls):
+        club = Club.objects.create(name='Club Test', slug='club-test', type='SPORT', description='Test')
+        cls.activity = Activity.objects.create(
+            club=club, title='Activité', description='Test', theme='Test',
+            date=datetime.date(2025, 3, 1), location='Campus', status='ONGOING'
+        )
+        cls.organizer = User.objects.create_user(email='orga@example.com', password='secret', is_staff=True)
+        cls.form = DynamicParticipationForm.objects.create(
+            activity=cls.activity, created_by=cls.organizer, otp_code='123456',
+            otp_expires_at=timezone.now() + datetime.timedelta(hours=3), form_link='test-form'
+        )
+        cls.alice = User.objects.create_user(email='alice@example.com', password='secret')
+        cls.bob = User.objects.create_user(email='bob@example.com', password='secret')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+
+    def sync(self, checkins):
+        response = self.client.post(
+            reverse('sync_checkins_api'), {'activity_id': self.activity.id, 'checkins': checkins},
+            format='json', HTTP_HOST='localhost'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_replay_is_idempotent(self):
+        checked_in_at = timezone.now().isoformat()
+        checkins = [
+            {'key': 'k-alice', 'user_id': self.alice.id, 'checked_in_at': checked_in_at},
+            {'key': 'k-bob', 'email': 'BOB@example.com', 'checked_in_at': checked_in_at},
+        ]
+        first = self.sync(checkins)
+        self.assertEqual((first['created'], first['verified'], first['duplicates']), (2, 0, []))
+
+        replay = self.sync(checkins)
+        self.assertEqual((replay['created'], replay['verified']), (0, 0))
+        self.assertEqual(replay['duplicates'], ['k-alice', 'k-bob'])
+        self.assertEqual(Participation.objects.filter(activity=self.activity, otp_verified=True).count(), 2)
+
+    def test_existing_unverified_row_is_verified(self):
+        Participation.objects.create(activity=self.activity, user=self.alice)
+        checkins = [{'key': 'k-alice', 'user_id': self.alice.id, 'checked_in_at': timezone.now().isoformat()}]
+
+        result = self.sync(checkins)
+        self.assertEqual((result['created'], result['verified']), (0, 1))
+        participation = Participation.objects.get(activity=self.activity, user=self.alice)
+        self.assertTrue(participation.otp_verified)
+        self.assertEqual(participation.sync_key, 'k-alice')
+        self.assertEqual(self.sync(checkins)['duplicates'], ['k-alice'])
+
+    def test_invalid_items_reported_individually(self):
+        now = timezone.now()
+        result = self.sync([
+            {'key': 'k-alice', 'user_id': self.alice.id, 'checked_in_at': now.isoformat()},
+            {'key': 'k-nobody', 'checked_in_at': now.isoformat()},
+            {'key': 'k-unknown', 'email': 'inconnu@example.com', 'checked_in_at': now.isoformat()},
+            {'key': 'k-late', 'user_id': self.bob.id, 'checked_in_at': (now + datetime.timedelta(hours=1)).isoformat()},
+        ])
+        self.assertEqual(result['created'], 1)
+        rejected = {item['key']: item['errors'] for item in result['rejected']}
+        self.assertEqual(set(rejected), {'k-nobody', 'k-unknown', 'k-late'})
+        self.assertEqual(rejected['k-unknown'], ['Unknown participant'])
+        self.assertEqual(rejected['k-late'], ['Check-in outside the form window'])
+
+
+class FormFunnelTests(TestCase):
+    """The per-minute funnel is only kept in a cache shared by the workers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        club = Club.objects.create(name='Club Test', slug='club-test', type='SPORT', description='Test')
+        cls.activity = Activity.objects.create(
+            club=club, title='Activité', description='Test', theme='Test',
+            date=datetime.date(2025, 3, 1), location='Campus', status='ONGOING'
+        )
+        cls.organizer = User.objects.create_user(email='orga@example.com', password='secret', is_staff=True)
+        DynamicParticipationForm.objects.create(
+            activity=cls.activity, created_by=cls.organizer, otp_code='123456',
+            otp_expires_at=timezone.now() + datetime.timedelta(hours=3), form_link='test-form'
+        )
+
+    def funnel(self):
+        cache.clear()
+        record_form_event(self.activity.id, 'access')
+        record_form_event(self.activity.id, 'access')
+        record_form_event(self.activity.id, 'submission')
+        client = APIClient()
+        client.force_authenticate(self.organizer)
+        response = client.get(reverse('form_funnel_api', args=[self.activity.id]), {'minutes': 5}, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_per_process_cache(self):
+        funnel = self.funnel()
+        self.assertEqual(funnel['totals'], {'access': 2, 'submission': 1})
+        self.assertEqual((funnel['series_available'], funnel['series']), (False, []))
+
+    @override_settings(CACHE_IS_SHARED=True)
+    def test_shared_cache(self):
+        funnel = self.funnel()
+        self.assertEqual(funnel['totals'], {'access': 2, 'submission': 1})
+        self.assertTrue(funnel['series_available'])
+        self.assertEqual(len(funnel['series']), 5)
+        self.assertEqual(sum(minute['access'] for minute in funnel['series']), 2)
+        self.assertEqual(sum(minute['submission'] for minute in funnel['series']), 1)
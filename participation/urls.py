@@ -1,20 +1,28 @@
 """
 URL configuration for participation app
 """
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
 
 app_name = 'participation'
 
+# Check-in views: async versions when the platform is served by an ASGI server
+checkin_views = async_views if settings.PARTICIPATION_ASYNC_VIEWS else views
+
 urlpatterns = [
     # OTP generation and verification
     path('generate-otp/<int:activity_id>/', views.generate_otp_view, name='generate_otp'),
-    path('verify-otp/<int:activity_id>/', views.verify_otp_view, name='verify_otp'),
+    path('verify-otp/<int:activity_id>/', checkin_views.verify_otp_view, name='verify_otp'),
+    path('checkin/<str:token>/', checkin_views.checkin_token_view, name='checkin_token'),
     
     # Participation form
-    path('form/<int:activity_id>/', views.participation_form, name='participation_form'),
-    path('submit/<int:activity_id>/', views.submit_participation, name='submit_participation'),
+    path('form/<int:activity_id>/', checkin_views.participation_form, name='participation_form'),
+    path('submit/<int:activity_id>/', checkin_views.submit_participation, name='submit_participation'),
     
     # Participant list
     path('list/<int:activity_id>/', views.participant_list, name='participant_list'),
+    
+    # Live participant counter (server-sent events, ASGI only)
+    path('live/<int:activity_id>/', async_views.live_activity, name='live_activity'),
 ]
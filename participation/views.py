@@ -1,19 +1,27 @@
 """
 Views for participation app
 """
+import time
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
 from django.http import JsonResponse
+from datetime import timedelta
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from clubs.models import Activity
-from core.utils import generate_otp, store_otp, verify_otp, get_otp_expiry
+from core.utils import (
+    generate_otp, store_otp, verify_otp, get_otp_expiry,
+    mark_otp_verified, is_otp_verified, clear_otp_verified, read_checkin_token
+)
 from .models import Participation
-from .serializers import ParticipationSerializer
+from .counters import record_form_event
+from .serializers import ParticipationSerializer, CheckinSyncSerializer, CheckinSyncItemSerializer
 from .forms import ParticipationForm
 
 
@@ -41,6 +49,7 @@ def generate_otp_view(request, activity_id):
     return render(request, 'participation/otp_generated.html', context)
 
 
+@login_required
 def verify_otp_view(request, activity_id):
     """Verify OTP and allow access to participation form"""
     activity = get_object_or_404(Activity, id=activity_id)
@@ -51,9 +60,9 @@ def verify_otp_view(request, activity_id):
         is_valid, message = verify_otp(activity_id, otp_code)
         
         if is_valid:
-            # Store in session that OTP is verified
-            request.session[f'otp_verified_{activity_id}'] = True
-            return redirect('participation:participation_form', activity_id=activity_id)
+            # Remember that OTP is verified (signed cookie or session)
+            response = redirect('participation:participation_form', activity_id=activity_id)
+            return mark_otp_verified(request, response, activity_id)
         else:
             messages.error(request, message)
     
@@ -67,13 +76,29 @@ def verify_otp_view(request, activity_id):
     return render(request, 'participation/verify_otp.html', context)
 
 
+@login_required
+def checkin_token_view(request, token):
+    """Check in by scanning the activity QR code (signed token instead of OTP)"""
+    checkin = read_checkin_token(token)
+    
+    if checkin is None:
+        messages.error(request, "QR code expiré ou invalide. Demandez le code OTP à l'organisateur.")
+        return redirect('core:home')
+    
+    # The flag does not outlive the QR code
+    activity_id, expires_at = checkin
+    max_age = expires_at - time.time()
+    response = redirect('participation:participation_form', activity_id=activity_id)
+    return mark_otp_verified(request, response, activity_id, max_age)
+
+
 @login_required
 def participation_form(request, activity_id):
     """Participation form (requires OTP verification)"""
     activity = get_object_or_404(Activity, id=activity_id)
     
     # Check if OTP is verified
-    if not request.session.get(f'otp_verified_{activity_id}', False):
+    if not is_otp_verified(request, activity_id):
         messages.error(request, "Veuillez d'abord vérifier le code OTP.")
         return redirect('participation:verify_otp', activity_id=activity_id)
     
@@ -87,6 +112,8 @@ def participation_form(request, activity_id):
         messages.info(request, "Vous avez déjà soumis votre participation pour cette activité.")
         return redirect('clubs:activity_detail', pk=activity_id)
     
+    record_form_event(activity_id, 'access')
+    
     context = {
         'activity': activity,
         'participation': participation,
@@ -101,7 +128,7 @@ def submit_participation(request, activity_id):
     activity = get_object_or_404(Activity, id=activity_id)
     
     # Check if OTP is verified
-    if not request.session.get(f'otp_verified_{activity_id}', False):
+    if not is_otp_verified(request, activity_id):
         messages.error(request, "Veuillez d'abord vérifier le code OTP.")
         return redirect('participation:verify_otp', activity_id=activity_id)
     
@@ -119,12 +146,13 @@ def submit_participation(request, activity_id):
             participation.otp_verified_at = timezone.now()
             participation.submitted_at = timezone.now()
             participation.save()
-            
-            # Clear OTP verification from session
-            del request.session[f'otp_verified_{activity_id}']
+            record_form_event(activity_id, 'submission')
             
             messages.success(request, "Votre participation a été enregistrée avec succès!")
-            return redirect('clubs:activity_detail', pk=activity_id)
+            
+            # Clear OTP verification flag
+            response = redirect('clubs:activity_detail', pk=activity_id)
+            return clear_otp_verified(request, response, activity_id)
     else:
         form = ParticipationForm(instance=participation)
     
@@ -139,8 +167,6 @@ def submit_participation(request, activity_id):
 @login_required
 def participant_list(request, activity_id):
     """List of participants for an activity"""
-    import csv
-    from django.http import HttpResponse
     
     activity = get_object_or_404(Activity, id=activity_id)
     
@@ -163,35 +189,19 @@ def participant_list(request, activity_id):
         otp_verified=True
     ).dates('activity__date', 'year', order='DESC')
     
-    # Export to CSV if requested
-    if request.GET.get('export') == 'csv':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="participants_{activity.title}_{timezone.now().strftime("%Y%m%d")}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['#', 'Nom', 'Prénom', 'Email', 'Filière', 'Niveau', 'Sexe', 'Téléphone', 'Note', 'Date de participation'])
-        
-        for idx, participation in enumerate(participants, 1):
-            writer.writerow([
-                idx,
-                participation.user.last_name,
-                participation.user.first_name,
-                participation.user.email,
-                participation.user.get_filiere_display() or '-',
-                participation.user.get_niveau_display() or '-',
-                participation.user.get_gender_display() or '-',
-                participation.user.phone or '-',
-                participation.rating or '-',
-                participation.submitted_at.strftime('%d/%m/%Y %H:%M') if participation.submitted_at else '-'
-            ])
-        
-        return response
+    # Export (CSV, XLSX or NDJSON) if requested
+    if request.GET.get('export'):
+        from core.exports import export_response
+        return export_response(
+            request, 'activity_participants', {'activity': activity.id, 'year': year_filter}, request.GET['export']
+        )
     
     context = {
         'activity': activity,
         'participants': participants,
         'available_years': available_years,
         'year_filter': year_filter,
+        'live_updates': settings.PARTICIPATION_ASYNC_VIEWS,
     }
     
     return render(request, 'participation/participant_list.html', context)
@@ -249,6 +259,187 @@ def verify_otp_api(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+# Tolerated clock drift of organizer devices
+CHECKIN_SYNC_CLOCK_SKEW = timedelta(minutes=5)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def sync_checkins_api(request):
+    """
+    Upload check-ins recorded offline by an organizer device
+    
+    Each check-in carries a client-generated idempotency key: keys already
+    synced are skipped before any write, so replaying a batch is a no-op.
+    """
+    from django.db import transaction
+    from django.db.models.functions import Lower
+    from users.models import User
+    from core.background import enqueue
+    from .models import DynamicParticipationForm
+    from .live import publish_snapshot
+    from .tasks import refresh_participation_stats
+    
+    serializer = CheckinSyncSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    activity = get_object_or_404(
+        Activity.objects.select_related('club'),
+        id=serializer.validated_data['activity_id']
+    )
+    
+    if not request.user.can_manage_club(activity.club):
+        return Response(
+            {'error': 'Permission denied'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    dynamic_form = DynamicParticipationForm.objects.filter(activity=activity).first()
+    if dynamic_form is None:
+        return Response(
+            {'error': 'No participation form for this activity'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Validate items one by one: a bad check-in must not reject the batch
+    rejected = []
+    items = []
+    for raw in serializer.validated_data['checkins']:
+        item = CheckinSyncItemSerializer(data=raw)
+        if item.is_valid():
+            items.append(item.validated_data)
+        else:
+            rejected.append({'key': raw.get('key'), 'errors': item.errors})
+    
+    # Keys already synced by a previous upload (one indexed lookup)
+    keys = {item['key'] for item in items}
+    duplicates = set(
+        Participation.objects.filter(sync_key__in=keys).values_list('sync_key', flat=True)
+    )
+    items = [item for item in items if item['key'] not in duplicates]
+    
+    if not items:
+        return Response({
+            'created': 0,
+            'verified': 0,
+            'duplicates': sorted(duplicates),
+            'rejected': rejected,
+        })
+    
+    # Resolve participants with two queries instead of one per check-in
+    ids = {item['user_id'] for item in items if item.get('user_id')}
+    emails = {item['email'].lower() for item in items if not item.get('user_id')}
+    users_by_id = set(User.objects.filter(id__in=ids).values_list('id', flat=True))
+    users_by_email = {
+        email.lower(): user_id
+        for user_id, email in User.objects.annotate(email_lower=Lower('email'))
+        .filter(email_lower__in=emails).values_list('id', 'email')
+    }
+    
+    window_end = min(dynamic_form.otp_expires_at, timezone.now() + CHECKIN_SYNC_CLOCK_SKEW)
+    to_create = {}
+    
+    for item in items:
+        user_id = item.get('user_id') or users_by_email.get(item['email'].lower())
+        
+        if user_id is None or (item.get('user_id') and user_id not in users_by_id):
+            rejected.append({'key': item['key'], 'errors': ['Unknown participant']})
+        elif not dynamic_form.otp_generated_at <= item['checked_in_at'] <= window_end:
+            rejected.append({'key': item['key'], 'errors': ['Check-in outside the form window']})
+        elif user_id in to_create:
+            duplicates.add(item['key'])
+        else:
+            to_create[user_id] = Participation(
+                activity=activity,
+                user_id=user_id,
+                otp_verified=True,
+                otp_verified_at=item['checked_in_at'],
+                sync_key=item['key'],
+            )
+    
+    # One transaction: a failure leaves none of the keys applied
+    with transaction.atomic():
+        # (activity, user) is unique: students who already checked in are skipped
+        Participation.objects.bulk_create(to_create.values(), ignore_conflicts=True)
+        created = set(
+            Participation.objects.filter(
+                sync_key__in=[p.sync_key for p in to_create.values()]
+            ).values_list('user_id', flat=True)
+        )
+        
+        # Rows opened online but never verified get verified by the organizer
+        skipped = set(to_create) - created
+        verified = set(
+            Participation.objects.filter(
+                activity=activity, user_id__in=skipped, otp_verified=False
+            ).values_list('user_id', flat=True)
+        )
+        for user_id in verified:
+            # Keep the key so that replaying the batch skips this row too
+            checkin = to_create[user_id]
+            Participation.objects.filter(
+                activity=activity, user_id=user_id, otp_verified=False
+            ).update(
+                otp_verified=True, otp_verified_at=checkin.otp_verified_at, sync_key=checkin.sync_key,
+                # update() skips auto_now: the profile summary version reads it
+                updated_at=timezone.now()
+            )
+        duplicates.update(to_create[user_id].sync_key for user_id in skipped - verified)
+        
+        # bulk_create / update() do not send signals
+        if created or verified:
+            enqueue(refresh_participation_stats, sorted(created | verified))
+            transaction.on_commit(lambda: publish_snapshot(activity.id))
+    
+    return Response({
+        'created': len(created),
+        'verified': len(verified),
+        'duplicates': sorted(duplicates),
+        'rejected': rejected,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def form_funnel_api(request, activity_id):
+    """
+    Live check-in funnel of an activity form: totals, and per-minute
+    accesses/submissions when the cache is shared by the workers
+    (series_available, see participation.counters)
+    """
+    from .counters import form_funnel, pending_counts
+    from .models import DynamicParticipationForm
+    
+    activity = get_object_or_404(Activity.objects.select_related('club'), id=activity_id)
+    
+    if not request.user.can_manage_club(activity.club):
+        return Response(
+            {'error': 'Permission denied'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    try:
+        minutes = min(max(int(request.query_params.get('minutes', 60)), 1), 360)
+    except ValueError:
+        minutes = 60
+    
+    totals = {'access': 0, 'submission': 0}
+    dynamic_form = DynamicParticipationForm.objects.filter(activity=activity).first()
+    if dynamic_form:
+        pending = pending_counts([activity.id]).get(activity.id, {})
+        totals = {
+            'access': dynamic_form.access_count + pending.get('access', 0),
+            'submission': dynamic_form.submission_count + pending.get('submission', 0),
+        }
+    
+    return Response({
+        'activity': activity.title,
+        'totals': totals,
+        'series_available': settings.CACHE_IS_SHARED,
+        'series': form_funnel(activity.id, minutes),
+    })
+
+
 class ParticipationViewSet(viewsets.ModelViewSet):
     """ViewSet for Participation model"""
     queryset = Participation.objects.all()
@@ -256,7 +447,7 @@ class ParticipationViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        queryset = Participation.objects.all()
+        queryset = Participation.objects.select_related('user', 'activity__club')
         
         # Filter by activity
         activity_id = self.request.query_params.get('activity', None)
@@ -270,7 +461,6 @@ class ParticipationViewSet(viewsets.ModelViewSet):
         
         # Only show verified participations for non-executives
         if not (self.request.user.is_club_executive or 
-                self.
                 self.request.user.is_staff):
             queryset = queryset.filter(otp_verified=True)
         
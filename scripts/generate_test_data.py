@@ -770,19 +770,8 @@ def create_participation_stats():
     """Créer et mettre à jour les statistiques de participation"""
     print_header("MISE À JOUR DES STATISTIQUES DE PARTICIPATION")
     
-    users_with_participations = User.objects.filter(
-        participations__otp_verified=True
-    ).distinct()
-    
-    updated = []
-    
-    for user in users_with_participations:
-        stats, created = ParticipationStats.objects.get_or_create(
-            user=user
-        )
-        
-        stats.update_stats()
-        updated.append(stats)
+    ParticipationStats.refresh_for_users()
+    updated = list(ParticipationStats.objects.all())
     
     print_success(f"{len(updated)} statistiques de participation mises à jour")
     return updated
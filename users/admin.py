@@ -1,9 +1,13 @@
 """
 Admin configuration for users app
 """
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils.translation import gettext_lazy as _
+from .forms import RosterImportForm
 from .models import User
 
 
@@ -33,3 +37,46 @@ class UserAdmin(BaseUserAdmin):
     )
     
     readonly_fields = ['created_at', 'updated_at', 'last_login']
+    change_list_template = 'admin/users/user/change_list.html'
+    
+    def get_urls(self):
+        return [
+            path('import-roster/', self.admin_site.admin_view(self.import_roster), name='users_user_import_roster'),
+        ] + super().get_urls()
+    
+    def import_roster(self, request):
+        """Create the student accounts of a roster CSV (see users.roster)"""
+        from .roster import RosterError, import_roster
+        
+        if not self.has_add_permission(request):
+            messages.error(request, "Vous n'avez pas la permission d'ajouter des utilisateurs.")
+            return redirect('admin:users_user_changelist')
+        
+        result = None
+        form = RosterImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            try:
+                result = import_roster(
+                    form.cleaned_data['file'],
+                    encoding=form.cleaned_data['encoding'],
+                    invite=form.cleaned_data['invite'],
+                    dry_run=form.cleaned_data['dry_run'],
+                )
+            except RosterError as exc:
+                form.add_error('file', str(exc))
+            else:
+                if form.cleaned_data['dry_run']:
+                    messages.info(request, f"Aperçu : {result['created']} compte(s) seraient créé(s).")
+                elif result['created']:
+                    messages.success(request, f"{result['created']} compte(s) étudiant créé(s).")
+                    if not result['error_count']:
+                        return redirect('admin:users_user_changelist')
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Importer une liste d\'étudiants',
+            'form': form,
+            'result': result,
+        }
+        return TemplateResponse(request, 'admin/users/user/import_roster.html', context)
@@ -0,0 +1,155 @@
+"""
+JWT authentication backed by a per-token cache
+
+Issued tokens carry signed claims for the role, staff flag and executive
+club of the user, with the version of the user's authorization data they
+were built from. Each access token then gets a short-lived snapshot of the
+user row and of that club id in the cache, keyed by the token id. Older
+snapshots and claims are ignored and the user is reloaded.
+
+With a cache shared by the workers (settings.CACHE_IS_SHARED), the version
+lives in the cache and is bumped when a user or a club membership is saved
+or deleted (see users.signals): an API call is authenticated and authorized
+from one get_many, with no query. Changes made without signals
+(QuerySet.update()) are only seen when the snapshot expires, after
+SNAPSHOT_TIMEOUT at most.
+
+A per-process cache cannot be invalidated by the other workers: the version
+is then read from the database on every API call, in one query that also
+filters out inactive and deleted users (deactivations through
+QuerySet.update() included).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .models import User
+
+
+SNAPSHOT_TIMEOUT = 5 * 60
+
+# Not cached: loaded on access like a deferred field (and never written back by save())
+UNCACHED_FIELDS = {'password'}
+
+
+def _version_key(user_id):
+    return f'auth_version_{user_id}'
+
+
+def _snapshot_key(token_id):
+    return f'auth_snapshot_{token_id}'
+
+
+def bump_auth_version(user_id):
+    """Invalidate the cached snapshots and token claims of a user (shared cache)"""
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Time based, so that an evicted version never falls back on old snapshots
+        cache.set(key, time.time_ns(), None)
+
+
+def _timestamp(value):
+    return value.timestamp() if value is not None else None
+
+
+def auth_version(user_id):
+    """Version of the authorization data of a user (see module docstring)"""
+    if not settings.CACHE_IS_SHARED:
+        return _database_version(user_id)
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _database_version(user_id):
+    """
+    Version of the authorization data of an active user, None when the user
+    is inactive or deleted
+
+    Built from the modification dates of the user and of their club
+    memberships, with the number of memberships for the deleted ones.
+    """
+    row = User.objects.filter(pk=user_id, is_active=True).annotate(
+        membership_changed=Max('club_member__updated_at'),
+        memberships=Count('club_member'),
+    ).values_list('updated_at', 'membership_changed', 'memberships').first()
+    if row is None:
+        return None
+    updated_at, membership_changed, memberships = row
+    return f'{_timestamp(updated_at)}:{_timestamp(membership_changed)}:{memberships}'
+
+
+class ClubTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Token pair with the role and executive club of the user as claims"""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['role'] = user.role
+        token['is_staff'] = user.is_staff
+        token['club_id'] = user.get_user_club_id()
+        token['auth_version'] = auth_version(user.pk)
+        return token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication reading the user from a snapshot cached per token id
+
+    The snapshot holds the concrete fields of the user except the password
+    hash, plus its executive club id (see User.get_user_club_id).
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        token_id = validated_token.get(api_settings.JTI_CLAIM)
+        if user_id is None or token_id is None:
+            return super().get_user(validated_token)
+
+        snapshot_key = _snapshot_key(token_id)
+        if settings.CACHE_IS_SHARED:
+            version_key = _version_key(user_id)
+            cached = cache.get_many([version_key, snapshot_key])
+            version = cached.get(version_key)
+            if version is None:
+                version = auth_version(user_id)
+            snapshot = cached.get(snapshot_key)
+        else:
+            version = _database_version(user_id)
+            if version is None:
+                # Raises the "user not found" or "user inactive" error
+                return super().get_user(validated_token)
+            snapshot = cache.get(snapshot_key)
+
+        if snapshot is not None and snapshot['version'] == version:
+            return self._user_from_snapshot(snapshot)
+
+        user = super().get_user(validated_token)
+        if validated_token.get('auth_version') == version and 'club_id' in validated_token:
+            # Claims issued since the last change: no membership query
+            user._user_club_id = validated_token['club_id']
+
+        fields = [field.attname for field in User._meta.concrete_fields if field.attname not in UNCACHED_FIELDS]
+        snapshot = {
+            'version': version,
+            'fields': fields,
+            'values': [getattr(user, name) for name in fields],
+            'club_id': user.get_user_club_id(),
+        }
+        timeout = min(SNAPSHOT_TIMEOUT, max(int(validated_token['exp'] - time.time()), 1))
+        cache.set(snapshot_key, snapshot, timeout)
+        return user
+
+    def _user_from_snapshot(self, snapshot):
+        user = User.from_db(User.objects.db, snapshot['fields'], snapshot['values'])
+        user._user_club_id = snapshot['club_id']
+        return user
@@ -111,3 +111,32 @@ class UserProfileForm(forms.ModelForm):
         widgets = {
             'bio': forms.Textarea(attrs={'rows': 4}),
         }
+
+
+class RosterImportForm(forms.Form):
+    """Admin form for importing a student roster (CSV, see users.roster)"""
+    
+    ENCODING_CHOICES = [
+        ('utf-8-sig', 'UTF-8'),
+        ('cp1252', 'Windows (Excel)'),
+        ('latin-1', 'ISO-8859-1'),
+    ]
+    
+    file = forms.FileField(
+        label='Liste CSV',
+        help_text='Colonnes : email, nom, prénom, filière, niveau, sexe, téléphone (facultatif)',
+        widget=forms.FileInput(attrs={'accept': '.csv,text/csv'})
+    )
+    encoding = forms.ChoiceField(label='Encodage', choices=ENCODING_CHOICES, initial='utf-8-sig')
+    invite = forms.BooleanField(
+        label='Envoyer les invitations à choisir un mot de passe',
+        required=False,
+        initial=True
+    )
+    dry_run = forms.BooleanField(label='Aperçu seulement (ne rien enregistrer)', required=False)
+    
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        if not file.name.lower().endswith(('.csv', '.txt')):
+            raise forms.ValidationError('La liste doit être un fichier CSV.')
+        return file
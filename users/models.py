@@ -29,6 +29,71 @@ class UserManager(BaseUserManager):
             raise ValueError(_('Superuser doit avoir is_superuser=True.'))
 
         return self.create_user(email, password, **extra_fields)
+    
+    def _attendance_filter(self, club=None, year=None, prefix=''):
+        from django.db.models import Q
+        
+        condition = Q(**{f'{prefix}otp_verified': True})
+        if club:
+            condition &= Q(**{f'{prefix}activity__club': club})
+        if year:
+            condition &= Q(**{f'{prefix}activity__date__year': year})
+        return condition
+    
+    def completed_activities(self, club=None, year=None):
+        """Number of completed activities: the denominator of attendance percentages"""
+        from clubs.models import Activity
+        
+        activities = Activity.objects.filter(status='COMPLETED')
+        if club:
+            activities = activities.filter(club=club)
+        if year:
+            activities = activities.filter(date__year=year)
+        return activities.count()
+    
+    def attendance(self, users, club=None, year=None):
+        """
+        Attendance of several users (users, ids or a queryset of either), by
+        user id: attended (verified participations), total (completed
+        activities) and percentage. Two queries whatever the number of users.
+        """
+        from django.db.models import Count, QuerySet
+        
+        if not isinstance(users, QuerySet):
+            users = [getattr(user, 'pk', user) for user in users]
+        total = self.completed_activities(club, year)
+        rows = self.filter(pk__in=users).annotate(
+            attended=Count('participations', filter=self._attendance_filter(club, year, 'participations__'))
+        ).values_list('pk', 'attended').order_by()
+        return {
+            pk: {'attended': attended, 'total': total, 'percentage': attendance_percentage(attended, total)}
+            for pk, attended in rows
+        }
+    
+    def top_attendance(self, club=None, year=None, limit=10):
+        """
+        Users with the most verified participations, with their attendance:
+        list of dicts (user, participation_count, attendance_percentage)
+        """
+        from django.db.models import Count
+        
+        total = self.completed_activities(club, year)
+        users = self.annotate(
+            participation_count=Count('participations', filter=self._attendance_filter(club, year, 'participations__'))
+        ).filter(participation_count__gt=0).order_by('-participation_count', 'last_name', 'first_name')[:limit]
+        return [
+            {
+                'user': user,
+                'participation_count': user.participation_count,
+                'attendance_percentage': attendance_percentage(user.participation_count, total),
+            }
+            for user in users
+        ]
+
+
+def attendance_percentage(attended, total):
+    """Percentage of the completed activities attended (0 without activities)"""
+    return round(attended / total * 100, 2) if total else 0
 
 
 class User(AbstractUser):
@@ -141,20 +206,36 @@ class User(AbstractUser):
     
     def get_user_club(self):
         """
-        Get the club this user is a member of (if any)
+        Get the club this user is an active executive of (if any), memoized
         Returns: Club object or None
         """
+        from clubs.models import Club, ClubMember
+        
+        if '_user_club' not in self.__dict__:
+            if '_user_club_id' in self.__dict__:
+                # Id already known (JWT snapshot, see users.authentication)
+                self._user_club = Club.objects.filter(pk=self._user_club_id).first() if self._user_club_id else None
+            else:
+                club_member = ClubMember.objects.filter(
+                    user=self,
+                    is_active=True,
+                    position__in=ClubMember.EXECUTIVE_POSITIONS
+                ).select_related('club').first()
+                self._user_club = club_member.club if club_member else None
+                self._user_club_id = self._user_club.id if self._user_club else None
+        return self._user_club
+    
+    def get_user_club_id(self):
+        """Id of the club returned by get_user_club(), memoized without loading the club"""
         from clubs.models import ClubMember
-        try:
-            # Get club member - ClubMember uses OneToOneField so we can use club_member directly
-            club_member = ClubMember.objects.filter(
+        
+        if '_user_club_id' not in self.__dict__:
+            self._user_club_id = ClubMember.objects.filter(
                 user=self,
                 is_active=True,
-                position__in=['PRESIDENT', 'VICE_PRESIDENT', 'SECRETARY', 'TREASURER', 'COMMUNICATION']
-            ).first()
-            return club_member.club if club_member else None
-        except:
-            return None
+                position__in=ClubMember.EXECUTIVE_POSITIONS
+            ).values_list('club_id', flat=True).first()
+        return self._user_club_id
     
     def can_manage_club(self, club):
         """
@@ -176,9 +257,9 @@ class User(AbstractUser):
         
         # Club executives can only manage their own club
         if self.is_club_executive:
-            user_club = self.get_user_club()
-            if user_club and club:
-                return user_club.id == club.id
+            user_club_id = self.get_user_club_id()
+            if user_club_id and club:
+                return user_club_id == club.id
         
         # Students cannot manage
         return False
@@ -205,9 +286,9 @@ class User(AbstractUser):
         if self.is_club_executive:
             if club is None:
                 return False
-            user_club = self.get_user_club()
-            if user_club:
-                return user_club.id == club.id
+            user_club_id = self.get_user_club_id()
+            if user_club_id:
+                return user_club_id == club.id
         
         # Students cannot view finances
         return False
@@ -234,9 +315,9 @@ class User(AbstractUser):
         if self.is_club_executive:
             if club is None:
                 return False
-            user_club = self.get_user_club()
-            if user_club:
-                return user_club.id == club.id
+            user_club_id = self.get_user_club_id()
+            if user_club_id:
+                return user_club_id == club.id
         
         # Students cannot modify finances
         return False
@@ -256,19 +337,5 @@ class User(AbstractUser):
         return participations.count()
     
     def get_attendance_percentage(self, club=None):
-        """Calculate attendance percentage based on total activities"""
-        from clubs.models import Activity
-        
-        # Get total completed activities
-        total_activities_query = Activity.objects.filter(status='COMPLETED')
-        
-        if club:
-            total_activities_query = total_activities_query.filter(club=club)
-        
-        total_activities = total_activities_query.count()
-        
-        if total_activities == 0:
-            return 0
-        
-        attended = self.get_attendance_rate(club)
-        return round((attended / total_activities) * 100, 2)
+        """Attendance percentage based on the completed activities (see UserManager.attendance)"""
+        return User.objects.attendance([self.pk], club)[self.pk]['percentage']
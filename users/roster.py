@@ -0,0 +1,212 @@
+"""
+Import of student rosters (CSV)
+
+At the start of the academic year the administration loads the class lists
+instead of letting hundreds of students sign up one by one. Accounts are
+created with bulk_create and an unusable password: nothing is hashed during
+the import. Each student then receives an invitation to choose a password
+(the allauth password reset link), sent in batches by a background task.
+
+Emails already registered are skipped, so the same roster can be imported
+again after a correction.
+"""
+import csv
+import io
+import re
+import unicodedata
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+from core.background import enqueue
+from .models import User
+from .tasks import send_roster_invitations
+
+
+BATCH_SIZE = 500
+INVITATION_BATCH_SIZE = 100
+MAX_ERRORS = 50
+
+# Usual header names of each column (lower case, without accents or punctuation)
+COLUMN_ALIASES = {
+    'email': ('email', 'e mail', 'mail', 'adresse email', 'adresse e mail', 'courriel'),
+    'last_name': ('nom', 'last name', 'nom de famille'),
+    'first_name': ('prenom', 'prenoms', 'first name'),
+    'filiere': ('filiere', 'programme', 'formation'),
+    'niveau': ('niveau', 'annee', 'classe', 'level'),
+    'gender': ('sexe', 'genre', 'gender'),
+    'phone': ('telephone', 'tel', 'phone', 'contact'),
+}
+REQUIRED_COLUMNS = ('email', 'last_name', 'first_name')
+
+GENDER_VALUES = {'m': 'M', 'h': 'M', 'masculin': 'M', 'homme': 'M', 'f': 'F', 'feminin': 'F', 'femme': 'F'}
+
+
+class RosterError(ValueError):
+    """The file cannot be read as a roster"""
+
+
+def _normalize(text):
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text.lower()).split())
+
+
+def _choice(value, choices, message):
+    """Key of a choice from its key or its label ("IDA", "1", "1ère année"...)"""
+    normalized = _normalize(value)
+    if not normalized:
+        return ''
+    for key, text in choices:
+        if normalized in (_normalize(key), _normalize(text)):
+            return key
+    # "1ere annee", "L1", "niveau 2"...
+    digits = re.findall(r'\d', normalized)
+    if len(digits) == 1:
+        for key, _ in choices:
+            if key == digits[0]:
+                return key
+    raise RosterError(f"{message} : {value}")
+
+
+def detect_columns(headers):
+    """Index of each known column in the header row"""
+    normalized = {_normalize(header): index for index, header in reversed(list(enumerate(headers)))}
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in normalized:
+                mapping[field] = normalized[alias]
+                break
+
+    missing = [field for field in REQUIRED_COLUMNS if field not in mapping]
+    if missing:
+        raise RosterError("Colonnes manquantes : " + ', '.join(missing))
+    return mapping
+
+
+def parse_row(row, mapping):
+    """Field values of a roster line; raises RosterError when invalid"""
+    def cell(field):
+        index = mapping.get(field)
+        return row[index].strip() if index is not None and index < len(row) else ''
+
+    email = cell('email').lower()
+    try:
+        validate_email(email)
+    except ValidationError:
+        raise RosterError(f"Email invalide : {email or '(vide)'}")
+    if not cell('last_name') or not cell('first_name'):
+        raise RosterError("Nom ou prénom manquant")
+
+    gender = cell('gender')
+    if gender and _normalize(gender) not in GENDER_VALUES:
+        raise RosterError(f"Sexe inconnu : {gender}")
+
+    return {
+        'email': email,
+        'last_name': cell('last_name')[:150],
+        'first_name': cell('first_name')[:150],
+        'filiere': _choice(cell('filiere'), User.FILIERE_CHOICES, 'Filière inconnue'),
+        'niveau': _choice(cell('niveau'), User.NIVEAU_CHOICES, 'Niveau inconnu'),
+        'gender': GENDER_VALUES.get(_normalize(gender), ''),
+        'phone': cell('phone')[:20],
+    }
+
+
+def _reader(file, encoding):
+    if isinstance(file, (bytes, bytearray)):
+        file = io.BytesIO(file)
+    file.seek(0)
+    text = io.TextIOWrapper(file, encoding=encoding, errors='replace', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=';,\t')
+    except csv.Error:
+        dialect = csv.excel
+    return text, csv.reader(text, dialect)
+
+
+def import_roster(file, encoding='utf-8-sig', invite=True, dry_run=False):
+    """
+    Create the student accounts of a roster CSV (email, nom, prénom, filière,
+    niveau, sexe, téléphone)
+
+    Lines with an email already registered are counted as existing, invalid
+    lines are skipped and reported. With ``invite``, the new students are
+    emailed a link to choose their password once the import is committed.
+    Returns a dict: created, existing, errors (line, message), error_count.
+    """
+    from allauth.account.models import EmailAddress
+
+    result = {'created': 0, 'existing': 0, 'errors': [], 'error_count': 0}
+
+    def error(line, message):
+        result['error_count'] += 1
+        if len(result['errors']) < MAX_ERRORS:
+            result['errors'].append((line, message))
+
+    text, reader = _reader(file, encoding)
+    students = {}
+    try:
+        mapping = None
+        for line, row in enumerate(reader, 1):
+            if not any(cell.strip() for cell in row):
+                continue
+            if mapping is None:
+                mapping = detect_columns(row)
+                continue
+            try:
+                data = parse_row(row, mapping)
+            except RosterError as exc:
+                error(line, str(exc))
+                continue
+            if data['email'] in students:
+                error(line, f"Email en double dans le fichier : {data['email']}")
+                continue
+            students[data['email']] = data
+    except csv.Error as exc:
+        # E.g. an unterminated quote: the rest of the file is one huge field
+        raise RosterError(f"Fichier CSV illisible (ligne {reader.line_num}) : {exc}")
+    finally:
+        # The uploaded file stays open for Django to close
+        text.detach()
+
+    if mapping is None:
+        raise RosterError("Le fichier est vide")
+
+    existing = set()
+    emails = list(students)
+    for start in range(0, len(emails), BATCH_SIZE):
+        existing.update(
+            User.objects.annotate(lower_email=Lower('email'))
+            .filter(lower_email__in=emails[start:start + BATCH_SIZE])
+            .values_list('lower_email', flat=True)
+        )
+    result['existing'] = len(existing)
+
+    # make_password(None): an unusable password, without any hashing
+    users = [
+        User(role='STUDENT', password=make_password(None), **data)
+        for email, data in students.items() if email not in existing
+    ]
+    result['created'] = len(users)
+    if dry_run or not users:
+        return result
+
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        # Primary keys are not returned by bulk_create on every backend
+        user_ids = list(User.objects.filter(email__in=[user.email for user in users]).values_list('id', 'email'))
+        EmailAddress.objects.bulk_create(
+            [EmailAddress(user_id=user_id, email=email, primary=True, verified=False) for user_id, email in user_ids],
+            batch_size=BATCH_SIZE
+        )
+        if invite:
+            ids = [user_id for user_id, _ in user_ids]
+            for start in range(0, len(ids), INVITATION_BATCH_SIZE):
+                enqueue(send_roster_invitations, ids[start:start + INVITATION_BATCH_SIZE])
+
+    return result
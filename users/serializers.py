@@ -2,6 +2,7 @@
 Serializers for users app
 """
 from rest_framework import serializers
+from core.serializers import ImageRenditionsField
 from .models import User
 
 
@@ -24,8 +25,9 @@ class UserMinimalSerializer(serializers.ModelSerializer):
     """Minimal serializer for User model (for nested representations)"""
     
     full_name = serializers.CharField(source='get_full_name', read_only=True)
+    profile_picture_renditions = ImageRenditionsField(source='profile_picture')
     
     class Meta:
         model = User
-        fields = ['id', 'full_name', 'email', 'profile_picture']
+        fields = ['id', 'full_name', 'email', 'profile_picture', 'profile_picture_renditions']
         read_only_fields = ['id']
@@ -0,0 +1,29 @@
+"""
+Signal handlers for users app
+
+Invalidate the cached JWT snapshots of a user (see users.authentication)
+when the user or one of their club memberships changes, for the versions
+kept in a shared cache.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .authentication import bump_auth_version
+from .models import User
+
+
+@receiver(post_save, sender=User, dispatch_uid='auth_user_save')
+@receiver(post_delete, sender=User, dispatch_uid='auth_user_delete')
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    """Role, flags or profile changed: the next API call reloads the user"""
+    # Logins only touch last_login
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(lambda: bump_auth_version(instance.pk))
+
+
+@receiver(post_save, sender='clubs.ClubMember', dispatch_uid='auth_member_save')
+@receiver(post_delete, sender='clubs.ClubMember', dispatch_uid='auth_member_delete')
+def membership_changed(sender, instance, **kwargs):
+    """Executive club changed"""
+    transaction.on_commit(lambda: bump_auth_version(instance.user_id))
@@ -0,0 +1,39 @@
+"""
+Background tasks for users app
+"""
+from core.background import shared_task
+
+
+@shared_task(ignore_result=True)
+def send_roster_invitations(user_ids):
+    """
+    Email imported students a link to choose their password (see
+    users.roster), over a single mail connection; returns the number sent
+    """
+    from allauth.account.forms import default_token_generator
+    from allauth.account.utils import user_pk_to_url_str
+    from allauth.utils import build_absolute_uri
+    from django.conf import settings
+    from django.core.mail import EmailMessage, get_connection
+    from django.template.loader import render_to_string
+    from django.urls import reverse
+    from .models import User
+
+    messages = []
+    # Students who already chose a password are not invited again
+    for user in User.objects.filter(id__in=user_ids, is_active=True, password__startswith='!'):
+        path = reverse(
+            'account_reset_password_from_key',
+            kwargs={'uidb36': user_pk_to_url_str(user), 'key': default_token_generator.make_token(user)}
+        )
+        context = {'user': user, 'invitation_url': build_absolute_uri(None, path)}
+        messages.append(EmailMessage(
+            render_to_string('users/email/roster_invitation_subject.txt', context).strip(),
+            render_to_string('users/email/roster_invitation_message.txt', context),
+            settings.DEFAULT_FROM_EMAIL,
+            [user.email],
+        ))
+
+    if not messages:
+        return 0
+    return get_connection().send_messages(messages) or 0
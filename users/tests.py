@@ -1,3 +1,184 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from clubs.models import Activity, Club, ClubMember
+from participation.models import Participation
+from participation.summary import profile_summary
+from .authentication import CachedJWTAuthentication, ClubTokenObtainPairSerializer
+from .models import User
+from .roster import RosterError, import_roster
+
+
+class AttendanceTests(TestCase):
+    """Attendance of many users comes from one grouped query, profile summaries from the cache"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.club = Club.objects.create(name='Club Test', slug='club-test', type='SPORT', description='Test')
+        other = Club.objects.create(name='Autre club', slug='autre-club', type='SPORT', description='Test')
+
+        def activity(club, status='COMPLETED', day=1):
+            return Activity.objects.create(
+                club=club,
+                title=f'Activité {day}',
+                description='Test',
+                theme='Test',
+                date=datetime.date(2025, 3, day),
+                location='Campus',
+                status=status
+            )
+
+        completed = [activity(cls.club, day=day) for day in range(1, 5)]
+        planned = activity(cls.club, status='PLANNED', day=10)
+        elsewhere = activity(other, day=11)
+
+        cls.users = [
+            User.objects.create_user(email=f'etudiant{index}@example.com', password='secret')
+            for index in range(3)
+        ]
+        first, second, _ = cls.users
+        for item in completed[:3] + [elsewhere]:
+            Participation.objects.create(activity=item, user=first, otp_verified=True)
+        Participation.objects.create(activity=completed[0], user=second, otp_verified=True)
+        Participation.objects.create(activity=completed[1], user=second, otp_verified=False)
+        Participation.objects.create(activity=planned, user=second, otp_verified=True)
+
+    def test_attendance_is_batched(self):
+        with self.assertNumQueries(2):
+            attendance = User.objects.attendance(self.users, club=self.club)
+
+        first, second, third = self.users
+        self.assertEqual(attendance[first.pk], {'attended': 3, 'total': 4, 'percentage': 75.0})
+        self.assertEqual(attendance[second.pk]['attended'], 2)
+        self.assertEqual(attendance[third.pk], {'attended': 0, 'total': 4, 'percentage': 0.0})
+        for user in self.users:
+            self.assertEqual(attendance[user.pk]['percentage'], user.get_attendance_percentage(self.club))
+
+    def test_top_attendance(self):
+        with self.assertNumQueries(2):
+            top = User.objects.top_attendance(self.club, limit=10)
+
+        self.assertEqual([item['user'] for item in top], self.users[:2])
+        self.assertEqual(top[0]['participation_count'], 3)
+        self.assertEqual(top[0]['attendance_percentage'], 75.0)
+
+    def test_profile_summary_is_cached_until_a_change(self):
+        cache.clear()
+        first = self.users[0]
+        summary = profile_summary(first.pk)
+        self.assertEqual(summary['total_participations'], 4)
+        self.assertEqual([club['count'] for club in summary['clubs']], [3, 1])
+        self.assertEqual(summary['longest_streak'], 1)
+
+        # Only the version, read from the database
+        with self.assertNumQueries(1):
+            self.assertEqual(profile_summary(first.pk), summary)
+
+        Participation.objects.filter(user=first, otp_verified=True).first().delete()
+        self.assertEqual(profile_summary(first.pk)['total_participations'], 3)
+
+        activity = Activity.objects.get(pk=profile_summary(first.pk)['recent'][0]['activity_id'])
+        activity.title = 'Activité renommée'
+        activity.save()
+        self.assertEqual(profile_summary(first.pk)['recent'][0]['title'], 'Activité renommée')
+
+
+class RosterImportTests(TestCase):
+    """Students of a roster are created in bulk, without password, and invited"""
+
+    def test_import_roster(self):
+        User.objects.create_user(email='deja@example.com', password='secret')
+        roster = (
+            'Email;Nom;Prénom;Filière;Niveau;Sexe\n'
+            'Awa.Diallo@example.com;Diallo;Awa;IDA;1ère année;F\n'
+            'koffi@example.com;Mensah;Koffi;Ingénieur Economiste Statisticien(ne);2;Masculin\n'
+            'DEJA@example.com;Deja;Inscrit;;;\n'
+            'pas-un-email;X;Y;;;\n'
+        ).encode('utf-8')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = import_roster(roster)
+
+        self.assertEqual((result['created'], result['existing'], result['error_count']), (2, 1, 1))
+        student = User.objects.get(email='awa.diallo@example.com')
+        self.assertEqual((student.role, student.filiere, student.niveau, student.gender), ('STUDENT', 'IDA', '1', 'F'))
+        self.assertFalse(student.has_usable_password())
+        self.assertEqual(User.objects.get(email='koffi@example.com').filiere, 'ITS')
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['awa.diallo@example.com', 'koffi@example.com'])
+
+        self.assertEqual(import_roster(roster)['created'], 0)
+
+    def test_unreadable_csv(self):
+        roster = ('Email;Nom;Prénom\n"awa@example.com;Diallo;Awa\n' + 'x' * 200000).encode('utf-8')
+        with self.assertRaises(RosterError):
+            import_roster(roster)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """API calls are authenticated from the token snapshot and one version query until the user changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.club = Club.objects.create(name='Club Test', slug='club-test', type='SPORT', description='Test')
+        self.user = User.objects.create_user(email='tresorier@example.com', password='secret', role='CLUB_EXECUTIVE')
+        self.member = ClubMember.objects.create(
+            club=self.club, user=self.user, position='TREASURER', start_date=datetime.date(2025, 1, 1)
+        )
+        self.authentication = CachedJWTAuthentication()
+
+    def test_snapshot_until_a_change(self):
+        token = AccessToken.for_user(self.user)
+
+        self.assertEqual(self.authentication.get_user(token).get_user_club_id(), self.club.pk)
+        with self.assertNumQueries(1):
+            cached = self.authentication.get_user(token)
+            self.assertEqual(cached.get_user_club_id(), self.club.pk)
+            self.assertTrue(cached.can_modify_finances(self.club))
+
+        self.member.is_active = False
+        self.member.save()
+        self.assertIsNone(self.authentication.get_user(token).get_user_club_id())
+
+        self.member.delete()
+        self.assertIsNone(self.authentication.get_user(token).get_user_club_id())
+
+    def test_claims(self):
+        token = ClubTokenObtainPairSerializer.get_token(self.user).access_token
+        with self.assertNumQueries(2):
+            self.assertEqual(self.authentication.get_user(token).get_user_club_id(), self.club.pk)
+
+    def test_deactivated_user(self):
+        token = AccessToken.for_user(self.user)
+        self.authentication.get_user(token)
+
+        # No signal, and the snapshot is still cached
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(token)
+
+        User.objects.filter(pk=self.user.pk).delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(token)
+
+    @override_settings(CACHE_IS_SHARED=True)
+    def test_shared_cache_version(self):
+        token = AccessToken.for_user(self.user)
+
+        self.assertEqual(self.authentication.get_user(token).get_user_club_id(), self.club.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authentication.get_user(token).get_user_club_id(), self.club.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member.is_active = False
+            self.member.save()
+        self.assertIsNone(self.authentication.get_user(token).get_user_club_id())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(token)
@@ -16,6 +16,7 @@ urlpatterns = [
     path('profile/', views.profile, name='profile'),
     path('profile/edit/', views.edit_profile, name='edit_profile'),
     path('profile/change-password/', views.change_password, name='change_password'),
+    path('me/stats/', views.my_stats_api, name='my_stats_api'),
     
     # Custom signup
     path('signup/', views.custom_signup, name='custom_signup'),
@@ -6,29 +6,47 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import update_session_auth_hash, login
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib import messages
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from .forms import UserProfileForm
-from .models import User
+from .models import User, attendance_percentage
 
 
 @login_required
 def profile(request):
     """
-    User profile page
+    User profile page, rendered from the cached profile summary
     """
-    from participation.models import Participation
+    from participation.summary import profile_summary
     
-    participations = Participation.objects.filter(
-        user=request.user,
-        otp_verified=True
-    ).select_related('activity', 'activity__club').order_by('-created_at')[:10]
+    summary = profile_summary(request.user.pk)
+    total = User.objects.completed_activities()
     
     context = {
         'user': request.user,
-        'participations': participations,
+        'summary': summary,
+        'participations': summary['recent'],
+        'attendance': {
+            'attended': summary['total_participations'],
+            'total': total,
+            'percentage': attendance_percentage(summary['total_participations'], total),
+        },
     }
     return render(request, 'users/profile.html', context)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def my_stats_api(request):
+    """
+    Profile summary of the current user (see participation.summary)
+    """
+    from participation.summary import profile_summary
+    
+    return Response(profile_summary(request.user.pk))
+
+
 @login_required
 def edit_profile(request):
     """